@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Scalability benchmark harness for the platform driver.
+
+Runs real DriverAgent instances in process against the simulated interface, with the platform driver
+as their parent and an in-memory message bus that serializes every publish the way the platform
+would. Scrape rounds are triggered directly instead of waiting for wall clock scrape slots, so a
+benchmark of thousands of devices takes seconds.
+
+Per-device scrape latency (device transaction), publish latency (one bus message) and cycle latency
+(scrape plus all publishes of a device) are measured with a monotonic clock and reported as
+percentiles. Results can be written as JSON to compare releases:
+
+    python benchmarks/harness.py --devices 1000 --points 50 --latency 0.005 --output results.json
+
+With --batch-publish the all publishes of a round are coalesced into batches of --batch-size
+devices, and the message count shows the reduced message rate. --encoding columnar publishes the
+values in the columnar encoding, compare the bytes serialized with the default json encoding.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+import gevent
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+for path in (BENCHMARK_DIR, BENCHMARK_DIR.parent / "src"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from volttron.client.messaging.topics import DRIVER_TOPIC_ALL
+from volttron.client.vip.agent import Agent
+from volttron.driver.base.driver_locks import configure_publish_lock, configure_socket_lock
+from volttron.utils import get_aware_utc_now
+from volttron.utils.jsonapi import dumps
+from volttrontesting.utils import AgentMock
+
+from platform_driver.agent import PlatformDriverAgent, __version__
+from platform_driver.driver import DriverAgent
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, q):
+    """Linear interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(values):
+    values = sorted(values)
+    summary = {"count": len(values)}
+    if values:
+        summary["mean"] = sum(values) / len(values)
+        summary["max"] = values[-1]
+    for q in PERCENTILES:
+        summary["p{}".format(q)] = percentile(values, q)
+    return summary
+
+
+class _Published:
+
+    def get(self, timeout=None):
+        return None
+
+
+class InMemoryBus:
+    """Stands in for vip.pubsub. Every message is serialized as the platform would do."""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self._published = _Published()
+
+    def publish(self, peer, topic, headers=None, message=None, bus=''):
+        self.messages += 1
+        self.bytes += len(dumps(message)) + len(dumps(headers))
+        return self._published
+
+
+class Benchmark:
+    """In process platform driver with simulated devices.
+
+    :param devices: number of simulated devices
+    :param points: number of points per device
+    :param latency: seconds every device transaction takes
+    :param jitter: additional random latency per transaction in seconds
+    :param groups: number of device groups the devices are spread over
+    :param driver_scrape_interval: seconds between the scrape slots of a group
+    :param agent_config: additional PlatformDriverAgent settings
+    :param driver_config: additional simulated interface settings
+    """
+
+    def __init__(self,
+                 devices=100,
+                 points=10,
+                 latency=0.0,
+                 jitter=0.0,
+                 groups=1,
+                 driver_scrape_interval=0.0,
+                 agent_config=None,
+                 driver_config=None):
+        self.parameters = {
+            "devices": devices,
+            "points": points,
+            "latency": latency,
+            "jitter": jitter,
+            "groups": groups,
+            "driver_scrape_interval": driver_scrape_interval,
+            "agent_config": agent_config or {},
+            "driver_config": driver_config or {}
+        }
+        _configure_locks()
+        if not issubclass(PlatformDriverAgent, AgentMock):
+            PlatformDriverAgent.__bases__ = (AgentMock.imitate(Agent, Agent()), )
+
+        config = {
+            "driver_scrape_interval": driver_scrape_interval,
+            "publish_depth_first_all": True,
+            "publish_breadth_first_all": False,
+            "publish_depth_first": False,
+            "publish_breadth_first": False
+        }
+        config.update(agent_config or {})
+        self.agent = PlatformDriverAgent(None, **config)
+        self.agent._override_patterns = set()
+        self.bus = InMemoryBus()
+        self.agent.vip.pubsub.publish = self.bus.publish
+
+        self.scrape_latency = []
+        self.publish_latency = []
+        self.cycle_latency = []
+        self.round_times = []
+
+        interface_config = {
+            "driver_module": "simulated_interface",
+            "point_count": points,
+            "latency": latency,
+            "jitter": jitter
+        }
+        interface_config.update(driver_config or {})
+        for i in range(devices):
+            group = i % groups
+            self.add_device("campus/building{}/device{}".format(i // 100, i), {
+                "driver_config": interface_config,
+                "driver_type": "simulated",
+                "interval": 60,
+                "group": group
+            })
+
+    def add_device(self, topic, config):
+        """Build, start and instrument a driver the way update_driver does, without running its core."""
+        agent = self.agent
+        group = int(config.get("group", 0))
+        slot = agent._slot_allocator.allocate(group, topic)
+        driver = DriverAgent(agent,
+                             config,
+                             slot,
+                             agent.driver_scrape_interval,
+                             topic,
+                             group,
+                             agent.group_offset_interval,
+                             agent.publish_depth_first_all,
+                             agent.publish_breadth_first_all,
+                             agent.publish_depth_first,
+                             agent.publish_breadth_first,
+                             default_publish_deadband=agent.publish_deadband,
+                             default_publish_full_interval=agent.publish_full_interval)
+        driver.setup_device()
+        driver.all_path_depth, driver.all_path_breadth = driver.get_paths_for_point(
+            DRIVER_TOPIC_ALL)
+        agent._register_instance(topic, driver)
+        self._instrument(driver)
+        return driver
+
+    def _instrument(self, driver):
+        interface = driver.interface
+        scrape_all = interface.scrape_all
+        publish = driver._publish_wrapper
+        periodic_read = driver.periodic_read
+
+        def timed_scrape_all():
+            start = time.perf_counter()
+            try:
+                return scrape_all()
+            finally:
+                self.scrape_latency.append(time.perf_counter() - start)
+
+        def timed_publish(topic, headers, message):
+            start = time.perf_counter()
+            try:
+                publish(topic, headers=headers, message=message)
+            finally:
+                self.publish_latency.append(time.perf_counter() - start)
+
+        def timed_periodic_read(now):
+            start = time.perf_counter()
+            try:
+                periodic_read(now)
+            finally:
+                self.cycle_latency.append(time.perf_counter() - start)
+                # The next scrape is triggered by the benchmark, drop the one the driver scheduled.
+                if driver.periodic_read_event is not None:
+                    driver.periodic_read_event.cancel()
+
+        interface.scrape_all = timed_scrape_all
+        driver._publish_wrapper = timed_publish
+        driver.timed_periodic_read = timed_periodic_read
+
+    def run_round(self):
+        """Scrape every device once, honouring the scrape slot offsets, and return the round time."""
+        now = get_aware_utc_now()
+        start = time.perf_counter()
+        greenlets = [
+            gevent.spawn_later(driver.time_slot_offset, driver.timed_periodic_read, now)
+            for driver in self.agent.instances.values()
+        ]
+        gevent.joinall(greenlets)
+        # Publish what is left in the batches of this round instead of waiting for the window.
+        self.agent._publish_batcher.flush()
+        elapsed = time.perf_counter() - start
+        self.round_times.append(elapsed)
+        return elapsed
+
+    def run(self, rounds=3):
+        for _ in range(rounds):
+            self.run_round()
+        return self.results()
+
+    def results(self):
+        return {
+            "version": __version__,
+            "python": platform.python_version(),
+            "timestamp": time.time(),
+            "parameters": self.parameters,
+            "rounds": self.round_times,
+            "scrape_latency": summarize(self.scrape_latency),
+            "publish_latency": summarize(self.publish_latency),
+            "cycle_latency": summarize(self.cycle_latency),
+            "messages": self.bus.messages,
+            "messages_per_round": self.bus.messages / len(self.round_times) if self.round_times else 0,
+            "bytes": self.bus.bytes
+        }
+
+
+def _configure_locks():
+    # The locks are process wide and may only be configured once.
+    for configure in (configure_socket_lock, configure_publish_lock):
+        try:
+            configure()
+        except RuntimeError:
+            pass
+
+
+def write_results(results, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, sort_keys=True))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--points", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--groups", type=int, default=1)
+    parser.add_argument("--scrape-interval", type=float, default=0.0)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--batch-publish", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=0)
+    parser.add_argument("--encoding", choices=("json", "columnar"), default="json")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    agent_config = {"publish_encoding": args.encoding}
+    if args.batch_publish:
+        agent_config.update({
+            "batch_publish": True,
+            "batch_publish_window": 60.0,
+            "batch_publish_size": args.batch_size
+        })
+    benchmark = Benchmark(args.devices, args.points, args.latency, args.jitter, args.groups,
+                          args.scrape_interval, agent_config)
+    results = benchmark.run(args.rounds)
+    if args.output:
+        write_results(results, args.output)
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
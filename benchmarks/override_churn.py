@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Benchmark override set/expire churn.
+
+Applies building level override patterns to a synthetic fleet and then expires them one at a time,
+comparing the platform driver against the full rescan it used before the override indexes were
+introduced.
+
+    python benchmarks/override_churn.py --devices 10000 --patterns 50
+"""
+
+import argparse
+import fnmatch
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from volttron.client.vip.agent import Agent
+from volttrontesting.utils import AgentMock
+
+from platform_driver.agent import PlatformDriverAgent
+
+PlatformDriverAgent.__bases__ = (AgentMock.imitate(Agent, Agent()), )
+
+
+def fleet(device_count, buildings):
+    per_building = max(device_count // buildings, 1)
+    return [
+        f"campus/building{i // per_building}/device{i % per_building}" for i in range(device_count)
+    ]
+
+
+def legacy_churn(devices, patterns):
+    """The scan performed by _set_override_on and _set_override_off prior to the indexes."""
+    override_patterns = set()
+    override_devices = set()
+    for pattern in patterns:
+        override_patterns.add(pattern)
+        for name in devices:
+            if fnmatch.fnmatch(name, pattern):
+                override_devices.add(name)
+    for pattern in patterns:
+        override_patterns.discard(pattern)
+        override_devices.clear()
+        for pat in override_patterns:
+            for device in devices:
+                if fnmatch.fnmatch(device, pat):
+                    override_devices.add(device)
+    return override_devices
+
+
+class _Device:
+
+    def __init__(self, device_path):
+        self.device_path = device_path
+
+    def revert_all(self, **kwargs):
+        pass
+
+
+def agent_churn(agent, patterns):
+    for pattern in patterns:
+        agent.set_override_on(pattern, failsafe_revert=False)
+    for pattern in patterns:
+        agent.set_override_off(pattern)
+    return agent.get_override_devices()
+
+
+def build_agent(devices):
+    agent = PlatformDriverAgent(None)
+    agent._override_patterns = set()
+    for device in devices:
+        agent._register_instance(device, _Device(device))
+    return agent
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=10000)
+    parser.add_argument("--patterns", type=int, default=50)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args(argv)
+
+    devices = fleet(args.devices, args.patterns)
+    patterns = [f"campus/building{i}/*" for i in range(args.patterns)]
+
+    agent = build_agent(devices)
+    start = time.perf_counter()
+    remaining = agent_churn(agent, patterns)
+    indexed = time.perf_counter() - start
+    assert not remaining
+    print(f"indexed: {args.patterns} overrides over {args.devices} devices set and expired in "
+          f"{indexed:.4f} s")
+
+    if not args.skip_legacy:
+        start = time.perf_counter()
+        remaining = legacy_churn(devices, patterns)
+        legacy = time.perf_counter() - start
+        assert not remaining
+        print(f"legacy:  {args.patterns} overrides over {args.devices} devices set and expired in "
+              f"{legacy:.4f} s ({legacy / indexed:.1f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
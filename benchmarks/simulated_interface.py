@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Simulated driver interface for benchmarking the platform driver without devices.
+
+Select it in a device configuration with ``"driver_config": {"driver_module": "simulated_interface"}``
+while this directory is importable. Supported driver_config settings:
+
+point_count
+    Number of float points on the device (default 10).
+latency
+    Seconds every device transaction takes (default 0.0).
+jitter
+    Additional uniformly distributed latency in seconds (default 0.0).
+change_probability
+    Probability that a point changes value between two scrapes (default 1.0).
+failure_rate
+    Probability that a device transaction raises an error (default 0.0).
+"""
+
+import random
+
+import gevent
+from volttron.driver.base.interfaces import BaseInterface, BaseRegister
+
+
+class SimulatedRegister(BaseRegister):
+
+    def __init__(self, point_name, value):
+        super(SimulatedRegister, self).__init__("byte", False, point_name, "units")
+        self.python_type = float
+        self.value = value
+
+
+class Interface(BaseInterface):
+
+    def configure(self, config_dict, registry_config_str):
+        self.latency = float(config_dict.get("latency", 0.0))
+        self.jitter = float(config_dict.get("jitter", 0.0))
+        self.change_probability = float(config_dict.get("change_probability", 1.0))
+        self.failure_rate = float(config_dict.get("failure_rate", 0.0))
+        for i in range(int(config_dict.get("point_count", 10))):
+            self.insert_register(SimulatedRegister("point{}".format(i), float(i)))
+
+    def _transaction(self):
+        delay = self.latency + (random.uniform(0.0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            gevent.sleep(delay)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise IOError("simulated device failure")
+
+    def get_point(self, point_name, **kwargs):
+        self._transaction()
+        return self.get_register_by_name(point_name).value
+
+    def set_point(self, point_name, value, **kwargs):
+        self._transaction()
+        self.get_register_by_name(point_name).value = value
+        return value
+
+    def scrape_all(self):
+        self._transaction()
+        results = {}
+        for name, register in self.point_map.items():
+            if self.change_probability >= 1.0 or random.random() < self.change_probability:
+                register.value += random.uniform(-1.0, 1.0)
+            results[name] = register.value
+        return results
+
+    def revert_all(self, **kwargs):
+        self._transaction()
+
+    def revert_point(self, point_name, **kwargs):
+        self._transaction()
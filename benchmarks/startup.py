@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Startup benchmark for the platform driver.
+
+Feeds synthetic device configurations for the simulated interface through update_driver, the way
+the configuration store does at startup, and starts every driver. Each run happens in a fresh
+process and reports:
+
+import_time
+    Seconds to import the platform driver agent module.
+register_time
+    Seconds until every driver was created, registered and started.
+rss_registered_mb
+    Peak resident set size once every driver was registered.
+setup_time
+    With --lazy, seconds the deferred interface setup of every driver takes afterwards; it runs
+    right before the first scrape of each device in a real deployment.
+peak_rss_mb
+    Peak resident set size of the run.
+
+Lazy setup only defers the interfaces, the drivers themselves are created eagerly, so it lowers
+register_time and rss_registered_mb but not peak_rss_mb once every interface is set up.
+
+    python benchmarks/startup.py --devices 1000 5000 10000 --lazy --output startup.json
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+for path in (BENCHMARK_DIR, BENCHMARK_DIR.parent / "src"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def measure_startup(devices, points=20, groups=1, lazy=False):
+    """Register devices through update_driver and start them in this process.
+
+    Driver cores are not run; the onstart handler of every driver is called directly, which is
+    what running the core would do first.
+    """
+    from volttron.client.vip.agent import Agent
+    from volttrontesting.utils import AgentMock
+
+    from harness import _configure_locks
+    from platform_driver.agent import PlatformDriverAgent
+
+    _configure_locks()
+    if not issubclass(PlatformDriverAgent, AgentMock):
+        PlatformDriverAgent.__bases__ = (AgentMock.imitate(Agent, Agent()), )
+    agent = PlatformDriverAgent(None, lazy_driver_setup=lazy, driver_scrape_interval=0.0)
+    agent._override_patterns = set()
+    agent._startup_scheduler._start = lambda topic, driver: driver.starting(agent)
+
+    driver_config = {"driver_module": "simulated_interface", "point_count": points}
+    start = time.perf_counter()
+    for i in range(devices):
+        agent.update_driver(
+            "devices/campus/building{}/device{}".format(i // 100, i), "NEW", {
+                "driver_config": driver_config,
+                "driver_type": "simulated",
+                "interval": 60,
+                "group": i % groups
+            })
+    results = {
+        "devices": devices,
+        "points": points,
+        "lazy": lazy,
+        "register_time": time.perf_counter() - start,
+        "drivers": len(agent.instances),
+        "drivers_set_up": sum(driver.is_set_up for driver in agent.instances.values()),
+        "rss_registered_mb": peak_rss_mb()
+    }
+    if lazy:
+        start = time.perf_counter()
+        for driver in agent.instances.values():
+            driver.ensure_setup()
+        results["setup_time"] = time.perf_counter() - start
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def run_child(devices, points, groups, lazy):
+    """Measure one startup in a fresh interpreter."""
+    command = [
+        sys.executable,
+        str(Path(__file__).resolve()), "--child", "--devices",
+        str(devices), "--points",
+        str(points), "--groups",
+        str(groups)
+    ]
+    if lazy:
+        command.append("--lazy")
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, universal_newlines=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--points", type=int, default=20)
+    parser.add_argument("--groups", type=int, default=1)
+    parser.add_argument("--lazy", action="store_true", help="also measure lazy driver setup")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        import logging
+        logging.disable(logging.INFO)
+        start = time.perf_counter()
+        import platform_driver.agent    # noqa: F401
+        import_time = time.perf_counter() - start
+        results = measure_startup(args.devices[0], args.points, args.groups, args.lazy)
+        results["import_time"] = import_time
+        print(json.dumps(results))
+        return
+
+    results = []
+    for devices in args.devices:
+        for lazy in ((False, True) if args.lazy else (False, )):
+            results.append(run_child(devices, args.points, args.groups, lazy))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, sort_keys=True))
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
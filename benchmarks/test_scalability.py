@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Scalability benchmark runnable under pytest, no platform needed.
+
+    pytest benchmarks/
+
+The size of the run is taken from the environment: BENCHMARK_DEVICES, BENCHMARK_POINTS,
+BENCHMARK_LATENCY, BENCHMARK_ROUNDS. Results are written as JSON to BENCHMARK_OUTPUT, or to the
+pytest temporary directory when it is not set.
+"""
+
+import json
+import os
+
+import override_churn
+from harness import Benchmark, write_results
+from startup import measure_startup
+
+
+def test_scrape_and_publish_latency(tmp_path):
+    devices = int(os.environ.get("BENCHMARK_DEVICES", 50))
+    points = int(os.environ.get("BENCHMARK_POINTS", 10))
+    latency = float(os.environ.get("BENCHMARK_LATENCY", 0.001))
+    rounds = int(os.environ.get("BENCHMARK_ROUNDS", 2))
+    output = os.environ.get("BENCHMARK_OUTPUT", str(tmp_path / "benchmark.json"))
+
+    results = Benchmark(devices, points, latency).run(rounds)
+    write_results(results, output)
+
+    assert results["scrape_latency"]["count"] == devices * rounds
+    assert results["messages"] == devices * rounds
+    for metric in ("scrape_latency", "publish_latency", "cycle_latency"):
+        summary = results[metric]
+        assert summary["p50"] <= summary["p95"] <= summary["p99"] <= summary["max"]
+    assert results["scrape_latency"]["p50"] >= latency
+    with open(output) as f:
+        assert json.load(f)["parameters"]["devices"] == devices
+
+
+def test_batch_publish_message_rate():
+    devices = int(os.environ.get("BENCHMARK_DEVICES", 50))
+    points = int(os.environ.get("BENCHMARK_POINTS", 10))
+    rounds = int(os.environ.get("BENCHMARK_ROUNDS", 2))
+
+    unbatched = Benchmark(devices, points).run(rounds)
+    batched = Benchmark(devices,
+                        points,
+                        agent_config={
+                            "batch_publish": True,
+                            "batch_publish_window": 60.0,
+                            "batch_publish_size": 20
+                        }).run(rounds)
+
+    assert unbatched["messages_per_round"] == devices
+    assert batched["messages_per_round"] == -(-devices // 20)
+
+
+def test_override_churn(capsys):
+    override_churn.main(["--devices", "50", "--patterns", "3"])
+
+    assert "indexed: 3 overrides over 50 devices" in capsys.readouterr().out
+
+
+def test_lazy_driver_setup_startup():
+    devices = int(os.environ.get("BENCHMARK_DEVICES", 50))
+
+    eager = measure_startup(devices)
+    lazy = measure_startup(devices, lazy=True)
+
+    assert eager["drivers"] == lazy["drivers"] == devices
+    assert eager["drivers_set_up"] == devices
+    assert lazy["drivers_set_up"] == 0
+    assert lazy["setup_time"] > 0.0
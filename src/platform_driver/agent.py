@@ -22,23 +22,22 @@
 # ===----------------------------------------------------------------------===
 # }}}
 
-import bisect
-import fnmatch
+import functools
+import inspect
 import logging
+import os
 import resource
 import sys
-from collections import defaultdict
+import time
 from datetime import datetime, timedelta
 
 import gevent
+from gevent.pool import Pool
 from volttron.client.known_identities import PLATFORM_DRIVER
-from volttron.client.vip.agent import Agent
+from volttron.client.messaging import headers as headers_mod
+from volttron.client.vip.agent import Agent, Core
 from volttron.client.vip.agent.subsystems.rpc import RPC
-from volttron.driver.base.driver import DriverAgent
-from volttron.driver.base.driver_locks import (
-    configure_publish_lock,
-    configure_socket_lock,
-)
+from volttron.driver.base.driver_locks import configure_publish_lock, publish_lock
 from volttron.driver.base.interfaces import DriverInterfaceError
 from volttron.utils import (
     format_timestamp,
@@ -50,17 +49,152 @@ from volttron.utils import (
 )
 from volttron.utils.jsonapi import dumps, loads
 from volttron.utils.math_utils import mean, stdev
+from volttron.utils.scheduling import periodic
+
+from .breaker import CLOSED, CircuitBreaker
+from .cache import ValueCache
+from .coalesce import WriteCoalescer
+from .deadband import DEFAULT_FULL_INTERVAL, parse_deadband
+from .driver import DriverAgent
+from .encoding import (
+    DEFAULT_HEADER_INTERVAL,
+    ENCODING_COLUMNAR,
+    ENCODING_JSON,
+    PUBLISH_ENCODINGS,
+    ColumnarEncoder,
+)
+from .locks import (
+    configure_socket_lock,
+    in_priority_lane,
+    priority_lane,
+    socket_lock_status,
+)
+from .publish import DEFAULT_BATCH_TOPIC, PublishBatcher
+from .revert import RevertJob
+from .scheduling import (
+    ExpiryScheduler,
+    ScrapeIntervalController,
+    SlotAllocator,
+    StartupScheduler,
+)
+from .sharding import (
+    ROUTE_ALL,
+    ROUTE_COV,
+    ROUTE_DEVICE,
+    ROUTE_EACH,
+    ROUTE_PATHS,
+    COORDINATOR_CONFIG_KEYS,
+    SHARD_BY_GROUP,
+    SHARD_COORDINATOR_ENV,
+    SHARD_INDEX_ENV,
+    SHARD_MAX_OPEN_SOCKETS_ENV,
+    SHARD_STRATEGIES,
+    WORKER_CHECK_INTERVAL,
+    ShardCoordinator,
+    ShardWorkers,
+    merge_revert_status,
+    merge_sorted,
+    agent_credentials,
+    shard_identity,
+    split_socket_limit,
+)
+from .stats import DriverStats
+from .topic_index import DeviceTree, PatternIndex
 
 setup_logging()
 _log = logging.getLogger(__name__)
 __version__ = '4.0'
 
+# Number of devices contacted at once by the bulk RPC methods when the caller does not set a limit.
+DEFAULT_BULK_CONCURRENCY = 50
+
+# Device configuration settings that can be applied to a running driver. A change to any other setting
+# (driver_type, driver_config, registry_config, timezone, ...) rebuilds the driver.
+PUBLISH_CONFIG_KEYS = frozenset(
+    ("publish_depth_first_all", "publish_breadth_first_all", "publish_depth_first",
+     "publish_breadth_first", "publish_deadband", "publish_deadband_points", "publish_full_interval"))
+IN_PLACE_CONFIG_KEYS = PUBLISH_CONFIG_KEYS | {
+    "interval", "group", "heart_beat_point", "cache_max_age"
+}
+
+DEFAULT_STATS_TOPIC = "platform_driver/stats"
+
 
 class OverrideError(DriverInterfaceError):
     """Error raised when the user tries to set/revert point when global override is set."""
     pass
 
 
+def timed_rpc(method):
+    """Record the call count, error count and latency of an RPC method in the driver statistics. Calls whose first
+    argument is the path of a registered device are also counted against that device."""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        path = args[0] if args else kwargs.get("path")
+        path = self._resolve_device(path) if isinstance(path, str) else None
+        if path not in self.instances:
+            path = None
+        start = time.perf_counter()
+        error = True
+        try:
+            result = method(self, *args, **kwargs)
+            error = False
+            return result
+        finally:
+            self._stats.record_rpc(name, path, time.perf_counter() - start, error)
+
+    return wrapper
+
+
+def sharded(route, merge=None, local=False):
+    """Forward calls of an RPC method to the worker shards, as set by route, when the agent coordinates
+    them. The results of the workers are combined with merge, see ShardCoordinator.call. With local set the
+    coordinator also runs the method itself first, to keep its own copy of the state the call changes."""
+
+    def decorator(method):
+        name = method.__name__
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self._shards is None:
+                return method(self, *args, **kwargs)
+            if local:
+                method(self, *args, **kwargs)
+            if route == ROUTE_PATHS:
+                # The coordinator splits the device paths of the call by name.
+                arguments = signature.bind(self, *args, **kwargs).arguments
+                arguments.pop("self")
+                extra = arguments.pop("kwargs", {})
+                args, kwargs = (), dict(arguments, **extra)
+            return self._shards.call(name, route, args, kwargs, merge)
+
+        return wrapper
+
+    return decorator
+
+
+def control_rpc(method):
+    """Run a control RPC method in the priority lane of the socket lock, so its device writes are not
+    queued behind scrapes, and record its latency in the write statistics of the driver."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        error = True
+        try:
+            with priority_lane():
+                result = method(self, *args, **kwargs)
+            error = False
+            return result
+        finally:
+            self._stats.writes.record(time.perf_counter() - start, error)
+
+    return wrapper
+
+
 def initialize_agent(config_path, **kwargs):
 
     config = load_config(config_path)
@@ -116,6 +250,63 @@ def initialize_agent(config_path, **kwargs):
 
     group_offset_interval = get_config("group_offset_interval", 0.0)
 
+    max_concurrent_reverts = get_config("max_concurrent_reverts", 10)
+    revert_stagger_interval = get_config("revert_stagger_interval", 0.05)
+
+    slot_rebalance_threshold = get_config("slot_rebalance_threshold", 0.0)
+
+    startup_wave_size = get_config("startup_wave_size", 0)
+    startup_wave_interval = get_config("startup_wave_interval", 1.0)
+    startup_wave_by_group = bool(get_config("startup_wave_by_group", False))
+
+    stats_publish_interval = get_config("stats_publish_interval", 0.0)
+    stats_topic = get_config("stats_topic", DEFAULT_STATS_TOPIC)
+
+    value_cache_size = get_config("value_cache_size", 0)
+    value_cache_max_age = get_config("value_cache_max_age", 0.0)
+
+    batch_publish = bool(get_config("batch_publish", False))
+    batch_publish_window = get_config("batch_publish_window", 1.0)
+    batch_publish_size = get_config("batch_publish_size", 0)
+    batch_publish_by_group = bool(get_config("batch_publish_by_group", False))
+    batch_publish_topic = get_config("batch_publish_topic", DEFAULT_BATCH_TOPIC)
+
+    publish_encoding = get_config("publish_encoding", ENCODING_JSON)
+    publish_encoding_header_interval = get_config("publish_encoding_header_interval",
+                                                  DEFAULT_HEADER_INTERVAL)
+
+    override_persist_interval = get_config("override_persist_interval", 1.0)
+
+    heartbeat_concurrency = get_config("heartbeat_concurrency", DEFAULT_BULK_CONCURRENCY)
+    heartbeat_timeout = get_config("heartbeat_timeout", 5.0)
+    heartbeat_backoff = get_config("heartbeat_backoff", 10.0)
+
+    scrape_breaker_threshold = get_config("scrape_breaker_threshold", 5)
+    scrape_breaker_max_backoff = get_config("scrape_breaker_max_backoff", 3600.0)
+
+    adaptive_scrape_interval = bool(get_config("adaptive_scrape_interval", False))
+    adaptive_scrape_min_interval = get_config("adaptive_scrape_min_interval", 0.0)
+    adaptive_scrape_max_interval = get_config("adaptive_scrape_max_interval", 1.0)
+    adaptive_scrape_period = get_config("adaptive_scrape_period", 60.0)
+
+    write_coalesce_window = get_config("write_coalesce_window", 0.0)
+    write_coalesce_size = get_config("write_coalesce_size", 0)
+
+    publish_deadband = get_config("publish_deadband")
+    publish_full_interval = get_config("publish_full_interval", DEFAULT_FULL_INTERVAL)
+
+    lazy_driver_setup = bool(get_config("lazy_driver_setup", False))
+    lazy_driver_setup_lead = get_config("lazy_driver_setup_lead", 5.0)
+
+    shard_workers = get_config("shard_workers", 0)
+    shard_by = get_config("shard_by", SHARD_BY_GROUP)
+    shard_rebalance_threshold = get_config("shard_rebalance_threshold", 0.25)
+    shard_rpc_timeout = get_config("shard_rpc_timeout", 30.0)
+    # Set by the coordinator in the environment of its workers.
+    shard_index = os.environ.get(SHARD_INDEX_ENV)
+    shard_coordinator = os.environ.get(SHARD_COORDINATOR_ENV)
+    shard_max_open_sockets = os.environ.get(SHARD_MAX_OPEN_SOCKETS_ENV)
+
     return PlatformDriverAgent(driver_config_list,
                                scalability_test,
                                scalability_test_iterations,
@@ -128,6 +319,46 @@ def initialize_agent(config_path, **kwargs):
                                publish_breadth_first_all,
                                publish_depth_first,
                                publish_breadth_first,
+                               max_concurrent_reverts=max_concurrent_reverts,
+                               revert_stagger_interval=revert_stagger_interval,
+                               slot_rebalance_threshold=slot_rebalance_threshold,
+                               startup_wave_size=startup_wave_size,
+                               startup_wave_interval=startup_wave_interval,
+                               startup_wave_by_group=startup_wave_by_group,
+                               stats_publish_interval=stats_publish_interval,
+                               stats_topic=stats_topic,
+                               value_cache_size=value_cache_size,
+                               value_cache_max_age=value_cache_max_age,
+                               batch_publish=batch_publish,
+                               batch_publish_window=batch_publish_window,
+                               batch_publish_size=batch_publish_size,
+                               batch_publish_by_group=batch_publish_by_group,
+                               batch_publish_topic=batch_publish_topic,
+                               publish_encoding=publish_encoding,
+                               publish_encoding_header_interval=publish_encoding_header_interval,
+                               override_persist_interval=override_persist_interval,
+                               heartbeat_concurrency=heartbeat_concurrency,
+                               heartbeat_timeout=heartbeat_timeout,
+                               heartbeat_backoff=heartbeat_backoff,
+                               scrape_breaker_threshold=scrape_breaker_threshold,
+                               scrape_breaker_max_backoff=scrape_breaker_max_backoff,
+                               adaptive_scrape_interval=adaptive_scrape_interval,
+                               adaptive_scrape_min_interval=adaptive_scrape_min_interval,
+                               adaptive_scrape_max_interval=adaptive_scrape_max_interval,
+                               adaptive_scrape_period=adaptive_scrape_period,
+                               write_coalesce_window=write_coalesce_window,
+                               write_coalesce_size=write_coalesce_size,
+                               publish_deadband=publish_deadband,
+                               publish_full_interval=publish_full_interval,
+                               lazy_driver_setup=lazy_driver_setup,
+                               lazy_driver_setup_lead=lazy_driver_setup_lead,
+                               shard_workers=shard_workers,
+                               shard_by=shard_by,
+                               shard_rebalance_threshold=shard_rebalance_threshold,
+                               shard_rpc_timeout=shard_rpc_timeout,
+                               shard_index=shard_index,
+                               shard_coordinator=shard_coordinator,
+                               shard_max_open_sockets=shard_max_open_sockets,
                                heartbeat_autostart=True,
                                **kwargs)
 
@@ -147,6 +378,46 @@ class PlatformDriverAgent(Agent):
                  publish_breadth_first_all=False,
                  publish_depth_first=False,
                  publish_breadth_first=False,
+                 max_concurrent_reverts=10,
+                 revert_stagger_interval=0.05,
+                 slot_rebalance_threshold=0.0,
+                 startup_wave_size=0,
+                 startup_wave_interval=1.0,
+                 startup_wave_by_group=False,
+                 stats_publish_interval=0.0,
+                 stats_topic=DEFAULT_STATS_TOPIC,
+                 value_cache_size=0,
+                 value_cache_max_age=0.0,
+                 batch_publish=False,
+                 batch_publish_window=1.0,
+                 batch_publish_size=0,
+                 batch_publish_by_group=False,
+                 batch_publish_topic=DEFAULT_BATCH_TOPIC,
+                 publish_encoding=ENCODING_JSON,
+                 publish_encoding_header_interval=DEFAULT_HEADER_INTERVAL,
+                 override_persist_interval=1.0,
+                 heartbeat_concurrency=DEFAULT_BULK_CONCURRENCY,
+                 heartbeat_timeout=5.0,
+                 heartbeat_backoff=10.0,
+                 scrape_breaker_threshold=5,
+                 scrape_breaker_max_backoff=3600.0,
+                 adaptive_scrape_interval=False,
+                 adaptive_scrape_min_interval=0.0,
+                 adaptive_scrape_max_interval=1.0,
+                 adaptive_scrape_period=60.0,
+                 write_coalesce_window=0.0,
+                 write_coalesce_size=0,
+                 publish_deadband=None,
+                 publish_full_interval=DEFAULT_FULL_INTERVAL,
+                 lazy_driver_setup=False,
+                 lazy_driver_setup_lead=5.0,
+                 shard_workers=0,
+                 shard_by=SHARD_BY_GROUP,
+                 shard_rebalance_threshold=0.25,
+                 shard_rpc_timeout=30.0,
+                 shard_index=None,
+                 shard_coordinator=None,
+                 shard_max_open_sockets=None,
                  **kwargs):
         super(PlatformDriverAgent, self).__init__(**kwargs)
         self.instances = {}
@@ -164,18 +435,191 @@ class PlatformDriverAgent(Agent):
             _log.warning("Invalid group_offset_interval, setting to default value.")
             self.group_offset_interval = 0.0
 
+        try:
+            self.max_concurrent_reverts = int(max_concurrent_reverts)
+        except ValueError:
+            _log.warning("Invalid max_concurrent_reverts, setting to default value.")
+            self.max_concurrent_reverts = 10
+
+        try:
+            self.revert_stagger_interval = float(revert_stagger_interval)
+        except ValueError:
+            _log.warning("Invalid revert_stagger_interval, setting to default value.")
+            self.revert_stagger_interval = 0.05
+
+        try:
+            self.slot_rebalance_threshold = float(slot_rebalance_threshold)
+        except ValueError:
+            _log.warning("Invalid slot_rebalance_threshold, setting to default value.")
+            self.slot_rebalance_threshold = 0.0
+
+        try:
+            startup_wave_size = int(startup_wave_size)
+            startup_wave_interval = float(startup_wave_interval)
+        except ValueError:
+            _log.warning("Invalid startup wave settings, starting all drivers at once.")
+            startup_wave_size, startup_wave_interval = 0, 1.0
+
+        try:
+            self.stats_publish_interval = float(stats_publish_interval)
+        except ValueError:
+            _log.warning("Invalid stats_publish_interval, setting to default value.")
+            self.stats_publish_interval = 0.0
+        self.stats_topic = stats_topic
+        self._stats = DriverStats()
+        self._stats_publish_event = None
+
+        try:
+            value_cache_size = int(value_cache_size)
+        except ValueError:
+            _log.warning("Invalid value_cache_size, disabling the value cache.")
+            value_cache_size = 0
+        self._value_cache = ValueCache(value_cache_size)
+        try:
+            self.value_cache_max_age = float(value_cache_max_age)
+        except ValueError:
+            _log.warning("Invalid value_cache_max_age, setting to default value.")
+            self.value_cache_max_age = 0.0
+
+        try:
+            batch_publish_window = float(batch_publish_window)
+            batch_publish_size = int(batch_publish_size)
+        except ValueError:
+            _log.warning("Invalid batch publish settings, setting to default values.")
+            batch_publish_window, batch_publish_size = 1.0, 0
+        self._publish_batcher = PublishBatcher(self._publish_batch, bool(batch_publish),
+                                               batch_publish_window, batch_publish_size,
+                                               bool(batch_publish_by_group), batch_publish_topic)
+
+        if publish_encoding not in PUBLISH_ENCODINGS:
+            _log.warning("Invalid publish_encoding, setting to default value.")
+            publish_encoding = ENCODING_JSON
+        self.publish_encoding = publish_encoding
+        self._publish_batcher.encoding = publish_encoding
+        try:
+            self.publish_encoding_header_interval = int(publish_encoding_header_interval)
+        except ValueError:
+            _log.warning("Invalid publish_encoding_header_interval, setting to default value.")
+            self.publish_encoding_header_interval = DEFAULT_HEADER_INTERVAL
+
+        try:
+            self.override_persist_interval = float(override_persist_interval)
+        except ValueError:
+            _log.warning("Invalid override_persist_interval, setting to default value.")
+            self.override_persist_interval = 1.0
+        self._override_persist_event = None
+
+        try:
+            self.heartbeat_concurrency = int(heartbeat_concurrency)
+            self.heartbeat_timeout = float(heartbeat_timeout)
+            self.heartbeat_backoff = float(heartbeat_backoff)
+        except ValueError:
+            _log.warning("Invalid heartbeat settings, setting to default values.")
+            self.heartbeat_concurrency = DEFAULT_BULK_CONCURRENCY
+            self.heartbeat_timeout = 5.0
+            self.heartbeat_backoff = 10.0
+
+        try:
+            self.scrape_breaker_threshold = int(scrape_breaker_threshold)
+            self.scrape_breaker_max_backoff = float(scrape_breaker_max_backoff)
+        except ValueError:
+            _log.warning("Invalid scrape breaker settings, setting to default values.")
+            self.scrape_breaker_threshold = 5
+            self.scrape_breaker_max_backoff = 3600.0
+
+        self.adaptive_scrape_interval = bool(adaptive_scrape_interval)
+        try:
+            self._interval_controller = ScrapeIntervalController(
+                float(adaptive_scrape_min_interval), float(adaptive_scrape_max_interval))
+            self.adaptive_scrape_period = float(adaptive_scrape_period)
+        except ValueError:
+            _log.warning("Invalid adaptive scrape interval settings, setting to default values.")
+            self._interval_controller = ScrapeIntervalController()
+            self.adaptive_scrape_period = 60.0
+        # Slot spacing chosen by the controller per device group, driver_scrape_interval for other groups.
+        self._group_scrape_intervals = {}
+        self._adaptive_scrape_event = None
+
+        try:
+            write_coalesce_window = float(write_coalesce_window)
+            write_coalesce_size = int(write_coalesce_size)
+        except ValueError:
+            _log.warning("Invalid write coalescing settings, disabling write coalescing.")
+            write_coalesce_window, write_coalesce_size = 0.0, 0
+        self._write_coalescer = WriteCoalescer(lambda path: self.instances[path], self._check_write_override,
+                                               write_coalesce_window, write_coalesce_size)
+
         self.system_socket_limit = system_socket_limit
-        self.freed_time_slots = defaultdict(list)
-        self.group_counts = defaultdict(int)
-        self._name_map = {}
+        self._slot_allocator = SlotAllocator()
+        self._startup_scheduler = StartupScheduler(self._start_driver_greenlet, startup_wave_size,
+                                                   startup_wave_interval,
+                                                   bool(startup_wave_by_group))
 
         self.publish_depth_first_all = bool(publish_depth_first_all)
         self.publish_breadth_first_all = bool(publish_breadth_first_all)
         self.publish_depth_first = bool(publish_depth_first)
         self.publish_breadth_first = bool(publish_breadth_first)
-        self._override_devices = set()
+        try:
+            parse_deadband(publish_deadband)
+            self.publish_deadband = publish_deadband
+            self.publish_full_interval = int(publish_full_interval)
+        except (TypeError, ValueError):
+            _log.warning("Invalid publish deadband settings, setting to default values.")
+            self.publish_deadband = None
+            self.publish_full_interval = DEFAULT_FULL_INTERVAL
+        # Overridden device -> override patterns covering it, and the reverse mapping. A device stays
+        # overridden for as long as at least one pattern covers it.
+        self._override_devices = {}
+        self._override_pattern_devices = {}
         self._override_patterns = None
+        self._pattern_index = PatternIndex()
+        self._device_tree = DeviceTree()
+        self._device_path_index = {}
+        # Override pattern -> end time of the override, None for an indefinite override. The end times are
+        # served by a single timer.
         self._override_interval_events = {}
+        self._override_expiry = ExpiryScheduler(self.core.schedule, self._cancel_override)
+        self._revert_jobs = {}
+
+        # Only the interface setup of a driver is deferred; driver objects are still created, registered and started
+        # as the device configurations arrive, so memory is saved until the interfaces are set up, not at the peak.
+        self.lazy_driver_setup = bool(lazy_driver_setup)
+        try:
+            self.lazy_driver_setup_lead = float(lazy_driver_setup_lead)
+        except ValueError:
+            _log.warning("Invalid lazy_driver_setup_lead, setting to default value.")
+            self.lazy_driver_setup_lead = 5.0
+
+        # A worker runs the drivers of the devices handed to it by its coordinator, a coordinator runs no drivers
+        # itself and routes devices and RPC calls to its workers.
+        self.shard_index = None if shard_index is None else int(shard_index)
+        self.shard_coordinator = shard_coordinator
+        try:
+            self.shard_max_open_sockets = None if shard_max_open_sockets is None else int(shard_max_open_sockets)
+        except ValueError:
+            _log.warning("Invalid shard socket limit, using max_open_sockets instead.")
+            self.shard_max_open_sockets = None
+        self._shards = None
+        self._shard_workers = None
+        self._shard_check_event = None
+        try:
+            shard_workers = int(shard_workers)
+            shard_rebalance_threshold = float(shard_rebalance_threshold)
+            self.shard_rpc_timeout = float(shard_rpc_timeout)
+            if shard_by not in SHARD_STRATEGIES:
+                raise ValueError(shard_by)
+        except ValueError:
+            _log.warning("Invalid shard settings, running all drivers in this process.")
+            shard_workers, shard_by, shard_rebalance_threshold = 0, SHARD_BY_GROUP, 0.25
+            self.shard_rpc_timeout = 30.0
+        if shard_workers > 0 and self.shard_index is None:
+            identities = [shard_identity(self.core.identity, shard) for shard in range(shard_workers)]
+            self._shards = ShardCoordinator(self._call_shard, identities, shard_by,
+                                            shard_rebalance_threshold, self._override_state)
+            self._shard_workers = ShardWorkers(identities, self.core.identity)
+        self.shard_workers = shard_workers if self._shards is not None else 0
+        self.shard_by = shard_by
+        self.shard_rebalance_threshold = shard_rebalance_threshold
 
         if scalability_test:
             self.waiting_to_finish = set()
@@ -193,15 +637,54 @@ class PlatformDriverAgent(Agent):
             "publish_depth_first_all": self.publish_depth_first_all,
             "publish_breadth_first_all": self.publish_breadth_first_all,
             "publish_depth_first": self.publish_depth_first,
-            "publish_breadth_first": self.publish_breadth_first
+            "publish_breadth_first": self.publish_breadth_first,
+            "max_concurrent_reverts": self.max_concurrent_reverts,
+            "revert_stagger_interval": self.revert_stagger_interval,
+            "slot_rebalance_threshold": self.slot_rebalance_threshold,
+            "startup_wave_size": self._startup_scheduler.wave_size,
+            "startup_wave_interval": self._startup_scheduler.wave_interval,
+            "startup_wave_by_group": self._startup_scheduler.by_group,
+            "stats_publish_interval": self.stats_publish_interval,
+            "stats_topic": self.stats_topic,
+            "value_cache_size": self._value_cache.max_devices,
+            "value_cache_max_age": self.value_cache_max_age,
+            "batch_publish": self._publish_batcher.enabled,
+            "batch_publish_window": self._publish_batcher.window,
+            "batch_publish_size": self._publish_batcher.max_size,
+            "batch_publish_by_group": self._publish_batcher.by_group,
+            "batch_publish_topic": self._publish_batcher.topic,
+            "publish_encoding": self.publish_encoding,
+            "publish_encoding_header_interval": self.publish_encoding_header_interval,
+            "override_persist_interval": self.override_persist_interval,
+            "heartbeat_concurrency": self.heartbeat_concurrency,
+            "heartbeat_timeout": self.heartbeat_timeout,
+            "heartbeat_backoff": self.heartbeat_backoff,
+            "scrape_breaker_threshold": self.scrape_breaker_threshold,
+            "scrape_breaker_max_backoff": self.scrape_breaker_max_backoff,
+            "adaptive_scrape_interval": self.adaptive_scrape_interval,
+            "adaptive_scrape_min_interval": self._interval_controller.min_interval,
+            "adaptive_scrape_max_interval": self._interval_controller.max_interval,
+            "adaptive_scrape_period": self.adaptive_scrape_period,
+            "write_coalesce_window": self._write_coalescer.window,
+            "write_coalesce_size": self._write_coalescer.max_size,
+            "publish_deadband": self.publish_deadband,
+            "publish_full_interval": self.publish_full_interval,
+            "lazy_driver_setup": self.lazy_driver_setup,
+            "lazy_driver_setup_lead": self.lazy_driver_setup_lead,
+            "shard_workers": self.shard_workers,
+            "shard_by": self.shard_by,
+            "shard_rebalance_threshold": self.shard_rebalance_threshold,
+            "shard_rpc_timeout": self.shard_rpc_timeout
         }
 
         self.vip.config.set_default("config", self.default_config)
         self.vip.config.subscribe(self.configure_main, actions=["NEW", "UPDATE"], pattern="config")
-        self.vip.config.subscribe(self.update_driver,
-                                  actions=["NEW", "UPDATE"],
-                                  pattern="devices/*")
-        self.vip.config.subscribe(self.remove_driver, actions="DELETE", pattern="devices/*")
+        if self.shard_index is None:
+            # Workers get their devices from the coordinator.
+            self.vip.config.subscribe(self.update_driver,
+                                      actions=["NEW", "UPDATE"],
+                                      pattern="devices/*")
+            self.vip.config.subscribe(self.remove_driver, actions="DELETE", pattern="devices/*")
 
     def configure_main(self, config_name, action, contents):
         config = self.default_config.copy()
@@ -210,7 +693,13 @@ class PlatformDriverAgent(Agent):
         if action == "NEW":
             try:
                 self.max_open_sockets = config["max_open_sockets"]
-                if self.max_open_sockets is not None:
+                if self.shard_max_open_sockets is not None:
+                    # A worker gets its share of the limit of its coordinator.
+                    max_open_sockets = self.shard_max_open_sockets
+                    configure_socket_lock(max_open_sockets)
+                    _log.info("maximum concurrently open sockets limited to " +
+                              str(max_open_sockets) + " (share of the coordinator limit)")
+                elif self.max_open_sockets is not None:
                     max_open_sockets = int(self.max_open_sockets)
                     configure_socket_lock(max_open_sockets)
                     _log.info("maximum concurrently open sockets limited to " +
@@ -221,6 +710,7 @@ class PlatformDriverAgent(Agent):
                               str(max_open_sockets) + " (derived from system limits)")
                     configure_socket_lock(max_open_sockets)
                 else:
+                    max_open_sockets = None
                     configure_socket_lock()
                     _log.warning(
                         "No limit set on the maximum number of concurrently open sockets. "
@@ -248,6 +738,9 @@ class PlatformDriverAgent(Agent):
                     self.test_results = []
                     self.current_test_start = None
 
+                if self._shard_workers is not None:
+                    self._start_shard_workers(max_open_sockets)
+
             except ValueError as e:
                 _log.error(
                     "ERROR PROCESSING STARTUP CRITICAL CONFIGURATION SETTINGS: {}".format(e))
@@ -255,7 +748,8 @@ class PlatformDriverAgent(Agent):
                 sys.exit(1)
 
         else:
-            if self.max_open_sockets != config["max_open_sockets"]:
+            # Workers get their socket limit from the coordinator when they are started.
+            if self.shard_coordinator is None and self.max_open_sockets != config["max_open_sockets"]:
                 _log.info(
                     "The platform driver must be restarted for changes to the max_open_sockets setting to take "
                     "effect")
@@ -265,6 +759,9 @@ class PlatformDriverAgent(Agent):
                     "The platform driver must be restarted for changes to the max_concurrent_publishes setting to "
                     "take effect")
 
+            if any(self.default_config[key] != config[key] for key in COORDINATOR_CONFIG_KEYS):
+                _log.info("The platform driver must be restarted for changes to the shard settings to take effect")
+
             if self.scalability_test != bool(config["scalability_test"]):
                 if not self.scalability_test:
                     _log.info(
@@ -284,7 +781,10 @@ class PlatformDriverAgent(Agent):
                 pass
 
         # update override patterns
-        if self._override_patterns is None:
+        if self._override_patterns is None and self.shard_coordinator is not None:
+            # Workers get the override state from their coordinator, see shard_set_overrides.
+            self._override_patterns = set()
+        elif self._override_patterns is None:
             try:
                 values = self.vip.config.get("override_patterns")
                 values = loads(values)
@@ -339,75 +839,439 @@ class PlatformDriverAgent(Agent):
                       str(driver_scrape_interval))
 
             # Reset all scrape schedules
-            self.freed_time_slots.clear()
-            self.group_counts.clear()
-            for driver in self.instances.values():
-                time_slot = self.group_counts[driver.group]
+            self._group_scrape_intervals.clear()
+            self._slot_allocator.clear()
+            for topic, driver in self.instances.items():
+                time_slot = self._slot_allocator.allocate(driver.group, topic)
                 driver.update_scrape_schedule(time_slot, self.driver_scrape_interval, driver.group,
                                               self.group_offset_interval)
-                self.group_counts[driver.group] += 1
+
+        try:
+            self.max_concurrent_reverts = int(config["max_concurrent_reverts"])
+            self.revert_stagger_interval = float(config["revert_stagger_interval"])
+            self.slot_rebalance_threshold = float(config["slot_rebalance_threshold"])
+            self._startup_scheduler.wave_size = int(config["startup_wave_size"])
+            self._startup_scheduler.wave_interval = float(config["startup_wave_interval"])
+            self._startup_scheduler.by_group = bool(config["startup_wave_by_group"])
+        except ValueError as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver revert settings unchanged")
+
+        try:
+            stats_publish_interval = float(config["stats_publish_interval"])
+        except ValueError as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver stats publish settings unchanged")
+        else:
+            self.stats_topic = config["stats_topic"]
+            if action == "NEW" or stats_publish_interval != self.stats_publish_interval:
+                self.stats_publish_interval = stats_publish_interval
+                self._schedule_stats_publish()
+
+        try:
+            value_cache_size = int(config["value_cache_size"])
+            self.value_cache_max_age = float(config["value_cache_max_age"])
+        except ValueError as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver value cache settings unchanged")
+        else:
+            if value_cache_size != self._value_cache.max_devices:
+                self._value_cache.resize(value_cache_size)
+
+        try:
+            batch_publish_window = float(config["batch_publish_window"])
+            batch_publish_size = int(config["batch_publish_size"])
+        except ValueError as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver batch publish settings unchanged")
+        else:
+            batcher = self._publish_batcher
+            if batcher.enabled and not bool(config["batch_publish"]):
+                # Do not strand results collected before batching was turned off.
+                batcher.flush()
+            batcher.enabled = bool(config["batch_publish"])
+            batcher.window = batch_publish_window
+            batcher.max_size = batch_publish_size
+            batcher.by_group = bool(config["batch_publish_by_group"])
+            batcher.topic = config["batch_publish_topic"]
+
+        try:
+            publish_encoding = config["publish_encoding"]
+            if publish_encoding not in PUBLISH_ENCODINGS:
+                raise ValueError("Unknown publish_encoding {}, expected one of {}".format(
+                    publish_encoding, ", ".join(PUBLISH_ENCODINGS)))
+            header_interval = int(config["publish_encoding_header_interval"])
+        except ValueError as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver publish encoding settings unchanged")
+        else:
+            if (publish_encoding != self.publish_encoding
+                    or header_interval != self.publish_encoding_header_interval):
+                self.publish_encoding = publish_encoding
+                self.publish_encoding_header_interval = header_interval
+                self._publish_batcher.encoding = publish_encoding
+                for driver in self.instances.values():
+                    driver.encoder = self._new_encoder()
+
+        try:
+            self.override_persist_interval = float(config["override_persist_interval"])
+        except ValueError as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver override persistence settings unchanged")
+
+        try:
+            heartbeat_concurrency = int(config["heartbeat_concurrency"])
+            heartbeat_timeout = float(config["heartbeat_timeout"])
+            heartbeat_backoff = float(config["heartbeat_backoff"])
+        except ValueError as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver heartbeat settings unchanged")
+        else:
+            self.heartbeat_concurrency = heartbeat_concurrency
+            self.heartbeat_timeout = heartbeat_timeout
+            self.heartbeat_backoff = heartbeat_backoff
+
+        try:
+            scrape_breaker_threshold = int(config["scrape_breaker_threshold"])
+            scrape_breaker_max_backoff = float(config["scrape_breaker_max_backoff"])
+        except ValueError as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver scrape breaker settings unchanged")
+        else:
+            self.scrape_breaker_threshold = scrape_breaker_threshold
+            self.scrape_breaker_max_backoff = scrape_breaker_max_backoff
+            for driver in self.instances.values():
+                driver.breaker.threshold = scrape_breaker_threshold
+                driver.breaker.max_backoff = scrape_breaker_max_backoff
+
+        try:
+            adaptive_scrape_min_interval = float(config["adaptive_scrape_min_interval"])
+            adaptive_scrape_max_interval = float(config["adaptive_scrape_max_interval"])
+            adaptive_scrape_period = float(config["adaptive_scrape_period"])
+        except ValueError as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver adaptive scrape interval settings unchanged")
+        else:
+            self._interval_controller.min_interval = adaptive_scrape_min_interval
+            self._interval_controller.max_interval = adaptive_scrape_max_interval
+            adaptive_scrape_interval = bool(config["adaptive_scrape_interval"])
+            if (action == "NEW" or adaptive_scrape_interval != self.adaptive_scrape_interval
+                    or adaptive_scrape_period != self.adaptive_scrape_period):
+                self.adaptive_scrape_interval = adaptive_scrape_interval
+                self.adaptive_scrape_period = adaptive_scrape_period
+                self._schedule_scrape_interval_adjustment()
+
+        try:
+            write_coalesce_window = float(config["write_coalesce_window"])
+            write_coalesce_size = int(config["write_coalesce_size"])
+        except ValueError as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver write coalescing settings unchanged")
+        else:
+            self._write_coalescer.window = write_coalesce_window
+            self._write_coalescer.max_size = write_coalesce_size
+            if not self._write_coalescer.enabled:
+                # Do not strand writes collected before coalescing was turned off.
+                self._write_coalescer.flush()
 
         self.publish_depth_first_all = bool(config["publish_depth_first_all"])
         self.publish_breadth_first_all = bool(config["publish_breadth_first_all"])
         self.publish_depth_first = bool(config["publish_depth_first"])
         self.publish_breadth_first = bool(config["publish_breadth_first"])
+        try:
+            parse_deadband(config["publish_deadband"])
+            publish_full_interval = int(config["publish_full_interval"])
+        except (TypeError, ValueError) as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver publish deadband settings unchanged")
+        else:
+            self.publish_deadband = config["publish_deadband"]
+            self.publish_full_interval = publish_full_interval
 
         # Update the publish settings on running devices.
         for driver in self.instances.values():
-            driver.update_publish_types(self.publish_depth_first_all,
-                                        self.publish_breadth_first_all, self.publish_depth_first,
-                                        self.publish_breadth_first)
+            self._update_publish_types(driver)
+
+        try:
+            self.lazy_driver_setup_lead = float(config["lazy_driver_setup_lead"])
+        except ValueError as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Platform driver lazy driver setup settings unchanged")
+        else:
+            # Applies to the drivers started from now on.
+            self.lazy_driver_setup = bool(config["lazy_driver_setup"])
+
+        if self._shards is not None:
+            self._shards.configure(config)
+
+    def _update_publish_types(self, driver):
+        driver.update_publish_types(self.publish_depth_first_all, self.publish_breadth_first_all,
+                                    self.publish_depth_first, self.publish_breadth_first,
+                                    self.publish_deadband, self.publish_full_interval)
 
     def derive_device_topic(self, config_name):
         _, topic = config_name.split('/', 1)
         return topic
 
     def stop_driver(self, device_topic):
-        real_name = self._name_map.pop(device_topic.lower(), device_topic)
+        real_name = self._resolve_device(device_topic)
 
-        driver = self.instances.pop(real_name, None)
+        driver = self._unregister_instance(real_name)
 
         if driver is None:
             return
 
         _log.info("Stopping driver: {}".format(real_name))
 
-        try:
-            driver.core.stop(timeout=5.0)
-        except Exception as e:
-            _log.error("Failure during {} driver shutdown: {}".format(real_name, e))
+        if not self._startup_scheduler.cancel(real_name):
+            try:
+                driver.core.stop(timeout=5.0)
+            except Exception as e:
+                _log.error("Failure during {} driver shutdown: {}".format(real_name, e))
 
-        bisect.insort(self.freed_time_slots[driver.group], driver.time_slot)
-        self.group_counts[driver.group] -= 1
+        self._slot_allocator.release(driver.group, driver.time_slot)
 
     def update_driver(self, config_name, action, contents):
         _log.info("In update_driver")
         topic = self.derive_device_topic(config_name)
+
+        if self._shards is not None:
+            self._shards.update_device(topic, contents)
+            return
+
+        driver = self.instances.get(topic)
+        if driver is not None and self._update_driver_in_place(topic, driver, contents):
+            return
+
         self.stop_driver(topic)
 
         group = int(contents.get("group", 0))
 
-        slot = self.group_counts[group]
-
-        if self.freed_time_slots[group]:
-            slot = self.freed_time_slots[group].pop(0)
+        slot = self._slot_allocator.allocate(group, topic)
 
         _log.info("Starting driver: {}".format(topic))
-        driver = DriverAgent(self, contents, slot, self.driver_scrape_interval, topic, group,
-                             self.group_offset_interval, self.publish_depth_first_all,
-                             self.publish_breadth_first_all, self.publish_depth_first,
-                             self.publish_breadth_first)
+        driver = DriverAgent(self,
+                             contents,
+                             slot,
+                             self._group_scrape_interval(group),
+                             topic,
+                             group,
+                             self.group_offset_interval,
+                             self.publish_depth_first_all,
+                             self.publish_breadth_first_all,
+                             self.publish_depth_first,
+                             self.publish_breadth_first,
+                             default_publish_deadband=self.publish_deadband,
+                             default_publish_full_interval=self.publish_full_interval)
+        self._register_instance(topic, driver)
+        self._update_override_state(topic, 'add')
+        self._startup_scheduler.submit(topic, driver, group)
+
+    def _update_driver_in_place(self, topic, driver, contents):
+        """
+        Apply a device configuration update to a running driver when only settings in IN_PLACE_CONFIG_KEYS changed.
+        The driver keeps its interface connection and, unless its group changed, its scrape time slot.
+        :param topic: device topic
+        :type topic: str
+        :param driver: running driver for the device
+        :type driver: DriverAgent
+        :param contents: new device configuration
+        :type contents: dict
+        :return: False if the update requires the driver to be rebuilt.
+        """
+        old = driver.config
+        changed = {key for key in set(old) | set(contents) if old.get(key) != contents.get(key)}
+        if changed - IN_PLACE_CONFIG_KEYS:
+            return False
+
+        driver.config = contents
+        if not changed:
+            _log.debug("Configuration of {} unchanged".format(topic))
+            return True
+
+        if changed & PUBLISH_CONFIG_KEYS:
+            self._update_publish_types(driver)
+
+        if "heart_beat_point" in changed:
+            driver.heart_beat_point = contents.get("heart_beat_point")
+
+        if changed & {"interval", "group"}:
+            if "interval" in changed:
+                driver.interval = self._device_scrape_interval(contents)
+            group = int(contents.get("group", 0))
+            time_slot = driver.time_slot
+            if group != driver.group:
+                self._slot_allocator.release(driver.group, driver.time_slot)
+                time_slot = self._slot_allocator.allocate(group, topic)
+            driver.update_scrape_schedule(time_slot, self._group_scrape_interval(group), group,
+                                          self.group_offset_interval)
+
+        _log.info("Updated driver {} in place: {}".format(topic, ", ".join(sorted(changed))))
+        return True
+
+    @staticmethod
+    def _device_scrape_interval(config):
+        # Same validation DriverAgent applies when it is created.
+        try:
+            interval = int(config.get("interval", 60))
+            if interval < 1.0:
+                raise ValueError
+        except (TypeError, ValueError):
+            _log.warning("Invalid device scrape interval {}. Defaulting to 60 seconds.".format(
+                config.get("interval")))
+            interval = 60
+        return interval
+
+    def _start_driver_greenlet(self, topic, driver):
         _log.debug("SPAWNING GREENLET....")
         gevent.spawn(driver.core.run)
+
+    @RPC.export
+    @sharded(ROUTE_EACH)
+    def get_startup_status(self):
+        """RPC method
+
+        Get the progress of bringing the configured drivers up: drivers submitted, still queued, started and still
+        waiting for their first scrape, along with the seconds it took for all drivers to be started and for all of
+        them to complete their first scrape.
+        """
+        return self._startup_scheduler.status()
+
+    def _register_instance(self, topic, driver):
+        """Add a running driver to self.instances and to the topic indexes built over it."""
         self.instances[topic] = driver
-        self.group_counts[group] += 1
-        self._name_map[topic.lower()] = topic
-        self._update_override_state(topic, 'add')
+        self._device_tree.add(topic)
+        driver.stats = self._stats.device(topic)
+        driver.value_cache = self._value_cache
+        driver.publish_batcher = self._publish_batcher
+        driver.encoder = self._new_encoder()
+        driver.breaker = CircuitBreaker(self.scrape_breaker_threshold,
+                                        self.scrape_breaker_max_backoff)
+        driver.setup_lead = self.lazy_driver_setup_lead if self.lazy_driver_setup else None
+        self._device_path_index[driver.device_path] = driver
+
+    def _new_encoder(self):
+        if self.publish_encoding == ENCODING_COLUMNAR:
+            return ColumnarEncoder(self.publish_encoding_header_interval)
+        return None
+
+    def _resolve_device(self, path):
+        """
+        Return the topic under which the driver for a device path is registered. Paths are resolved case
+        insensitively; unknown paths are returned unchanged.
+        """
+        if path in self.instances:
+            return path
+        return self._device_tree.resolve(path) or path
+
+    def _unregister_instance(self, topic):
+        """Remove a driver from self.instances and the topic indexes.
+
+        :return: The removed driver or None if no driver is registered for the topic.
+        """
+        driver = self.instances.pop(topic, None)
+        if driver is not None:
+            self._device_tree.remove(topic)
+            self._stats.remove(topic)
+            self._value_cache.remove(topic)
+            if self._device_path_index.get(driver.device_path) is driver:
+                del self._device_path_index[driver.device_path]
+        return driver
 
     def remove_driver(self, config_name, action, contents):
         topic = self.derive_device_topic(config_name)
+        if self._shards is not None:
+            self._shards.remove_device(topic)
+            return
+        real_name = self._resolve_device(topic)
+        driver = self.instances.get(real_name)
         self.stop_driver(topic)
-        self._update_override_state(topic, 'remove')
+        self._update_override_state(real_name, 'remove')
+
+        if driver is not None and self.slot_rebalance_threshold > 0.0 and \
+                self._slot_allocator.fragmentation(driver.group) > self.slot_rebalance_threshold:
+            self._rebalance_group(driver.group)
+
+    def _group_scrape_interval(self, group):
+        return self._group_scrape_intervals.get(group, self.driver_scrape_interval)
+
+    def _schedule_scrape_interval_adjustment(self):
+        if self._adaptive_scrape_event is not None:
+            self._adaptive_scrape_event.cancel()
+            self._adaptive_scrape_event = None
+        if self.adaptive_scrape_interval and self.adaptive_scrape_period > 0.0:
+            self._adaptive_scrape_event = self.core.schedule(periodic(self.adaptive_scrape_period),
+                                                             self._adjust_scrape_intervals)
+        elif self._group_scrape_intervals:
+            # Controller turned off, go back to the configured spacing.
+            self._group_scrape_intervals.clear()
+            for driver in self.instances.values():
+                driver.update_scrape_schedule(driver.time_slot, self.driver_scrape_interval,
+                                              driver.group, self.group_offset_interval)
+
+    def _adjust_scrape_intervals(self):
+        """
+        Set the slot spacing of every device group to what its devices' last scrape durations call for and
+        reschedule the devices of the groups whose spacing changed.
+        :return: dictionary of group to the new spacing for the groups that changed
+        """
+        groups = {}
+        for driver in self.instances.values():
+            groups.setdefault(driver.group, []).append(driver)
+
+        changed = {}
+        for group, drivers in groups.items():
+            durations = [
+                driver.stats.scrape.last for driver in drivers
+                if driver.stats.scrape.last is not None
+            ]
+            # Every slot of the group has to start within the scrape interval of its devices.
+            slots = max(driver.time_slot for driver in drivers) + 1
+            limit = (min(driver.interval for driver in drivers) -
+                     group * self.group_offset_interval) / slots
+            current = self._group_scrape_interval(group)
+            spacing = self._interval_controller.recommend(current, durations, max(limit, 0.0))
+            if spacing is None:
+                continue
+
+            self._group_scrape_intervals[group] = spacing
+            for driver in drivers:
+                driver.update_scrape_schedule(driver.time_slot, spacing, group,
+                                              self.group_offset_interval)
+            changed[group] = spacing
+            durations.sort()
+            _log.info("Scrape slot spacing of group {} changed from {:.3f}s to {:.3f}s: p90 scrape "
+                      "{:.3f}s over {} devices, {:.1f} scrapes/s".format(
+                          group, current, spacing, durations[int(0.9 * (len(durations) - 1))],
+                          len(drivers), 1.0 / spacing if spacing else float("inf")))
+            if spacing >= limit > 0.0:
+                _log.warning("Scrapes of group {} do not fit in the scrape interval at the measured "
+                             "scrape duration, increase the scrape interval".format(group))
+        return changed
+
+    @RPC.export
+    @sharded(ROUTE_EACH)
+    def rebalance_scrape_slots(self, group=None):
+        """RPC method
+
+        Compact the scrape time slots of a device group so that its devices are evenly spaced by
+        driver_scrape_interval again after devices have been removed. Only devices whose slot changes are rescheduled.
+        :param group: device group to rebalance. If not set, all groups are rebalanced.
+        :type group: int
+        :return: dictionary of group to the number of devices that were moved to a new slot.
+        """
+        groups = self._slot_allocator.groups() if group is None else [int(group)]
+        return {grp: self._rebalance_group(grp) for grp in groups}
+
+    def _rebalance_group(self, group):
+        moved = self._slot_allocator.compact(group)
+        for topic, time_slot in moved:
+            self.instances[topic].update_scrape_schedule(time_slot,
+                                                         self._group_scrape_interval(group), group,
+                                                         self.group_offset_interval)
+        if moved:
+            _log.info("Rebalanced scrape slots of group {}: {} devices moved".format(group, len(moved)))
+        return len(moved)
 
     # def device_startup_callback(self, topic, driver):
     #     _log.debug("Driver hooked up for "+topic)
@@ -428,7 +1292,13 @@ class PlatformDriverAgent(Agent):
                 f"{topic} started twice before test finished, increase the length of scrape interval and rerun test"
             )
 
+    def scrape_failed(self, topic):
+        """Called by a driver whose scrape failed or was skipped."""
+        self._startup_scheduler.scrape_completed(topic, error=True)
+
     def scrape_ending(self, topic):
+        self._startup_scheduler.scrape_completed(topic)
+
         if not self.scalability_test:
             return
 
@@ -458,24 +1328,43 @@ class PlatformDriverAgent(Agent):
                 sys.exit(0)
 
     @RPC.export
-    def get_point(self, path, point_name, **kwargs):
+    @sharded(ROUTE_DEVICE)
+    @timed_rpc
+    def get_point(self, path, point_name, max_age=None, **kwargs):
         """RPC method
 
-        Return value of specified device set point
+        Return value of specified device set point. When the value cache is enabled, a value read by a scrape of
+        the device no more than max_age seconds ago is returned without contacting the device.
         :param path: device path
         :type path: str
         :param point_name: set point
         :type point_name: str
+        :param max_age: maximum age in seconds of a cached value. Defaults to the cache_max_age setting of the
+            device, or else value_cache_max_age. 0 always reads from the device.
+        :type max_age: float
         :param kwargs: additional arguments for the device
         :type kwargs: arguments pointer
         """
-        return self.instances[path].get_point(point_name, **kwargs)
+        path = self._resolve_device(path)
+        driver = self.instances[path]
+        max_age = self._cache_max_age(driver, max_age, kwargs)
+        if max_age > 0.0:
+            cached = self._value_cache.lookup(path, (point_name, ), max_age)
+            if cached:
+                return cached[point_name]
+        return driver.get_point(point_name, **kwargs)
 
     @RPC.export
+    @sharded(ROUTE_DEVICE)
+    @timed_rpc
+    @control_rpc
     def set_point(self, path, point_name, value, **kwargs):
         """RPC method
 
         Set value on specified device set point. If global override is condition is set, raise OverrideError exception.
+        With write_coalesce_window set, calls without kwargs are merged with the other writes to the device arriving
+        within the window into one device transaction. The value returned is the one set_point returns, or the value
+        read back after the transaction for interfaces writing many points at once, see WriteCoalescer.
         :param path: device path
         :type path: str
         :param point_name: set point
@@ -485,21 +1374,191 @@ class PlatformDriverAgent(Agent):
         :param kwargs: additional arguments for the device
         :type kwargs: arguments pointer
         """
+        path = self._resolve_device(path)
+        self._check_write_override(path)
+        driver = self.instances[path]
+        if self._write_coalescer.enabled and not kwargs:
+            return self._write_coalescer.set_point(path, point_name, value)
+        return driver.set_point(point_name, value, **kwargs)
+
+    def _check_write_override(self, path):
         if path in self._override_devices:
             raise OverrideError(
                 "Cannot set point on device {} since global override is set".format(path))
-        else:
-            return self.instances[path].set_point(point_name, value, **kwargs)
 
     @RPC.export
+    @sharded(ROUTE_DEVICE)
+    @timed_rpc
     def scrape_all(self, path):
-        return self.instances[path].scrape_all()
+        return self.instances[self._resolve_device(path)].scrape_all()
+
+    @RPC.export
+    @sharded(ROUTE_DEVICE)
+    @timed_rpc
+    def get_multiple_points(self, path, point_names, max_age=None, **kwargs):
+        """RPC method
+
+        Get multiple points of a device. Points with a cached value that is not older than max_age are served from
+        the value cache; only the remaining points are read from the device.
+        :param path: device path
+        :type path: str
+        :param point_names: points to read
+        :type point_names: list
+        :param max_age: maximum age in seconds of a cached value, see get_point
+        :type max_age: float
+        :param kwargs: additional arguments for the device
+        :type kwargs: arguments pointer
+        :return: tuple of dictionaries of device path/point name to value and to error
+        """
+        path = self._resolve_device(path)
+        return self._read_points(path, self.instances[path], point_names, max_age, **kwargs)
+
+    def _read_points(self, path, driver, point_names, max_age=None, **kwargs):
+        max_age = self._cache_max_age(driver, max_age, kwargs)
+        cached = self._value_cache.lookup(path, point_names, max_age) if max_age > 0.0 else None
+        if not cached:
+            return driver.get_multiple_points(point_names, **kwargs)
+
+        results = {path + '/' + point_name: value for point_name, value in cached.items()}
+        errors = {}
+        missing = [point_name for point_name in point_names if point_name not in cached]
+        if missing:
+            device_results, errors = driver.get_multiple_points(missing, **kwargs)
+            results.update(device_results)
+        return results, errors
+
+    def _cache_max_age(self, driver, max_age, kwargs):
+        """
+        Maximum age of cached values acceptable for a read, 0.0 when the read must go to the device.
+        Reads with interface specific arguments always go to the device.
+        """
+        if not self._value_cache.enabled or kwargs:
+            return 0.0
+        if max_age is None:
+            max_age = driver.config.get("cache_max_age", self.value_cache_max_age)
+        try:
+            return float(max_age)
+        except (TypeError, ValueError):
+            _log.warning("Invalid cache max age {} for {}".format(max_age, driver.device_path))
+            return 0.0
 
     @RPC.export
-    def get_multiple_points(self, path, point_names, **kwargs):
-        return self.instances[path].get_multiple_points(point_names, **kwargs)
+    @sharded(ROUTE_PATHS)
+    @timed_rpc
+    def scrape_many(self, paths=None, pattern=None, concurrency=None):
+        """RPC method
+
+        Scrape all points of many devices in one call. Devices are scraped in parallel and a failure on one device
+        does not fail the call.
+        :param paths: device paths to scrape
+        :type paths: list
+        :param pattern: bash style filename pattern selecting additional devices, for example campus/building1/*
+        :type pattern: str
+        :param concurrency: maximum number of devices scraped at the same time
+        :type concurrency: int
+        :return: dictionary with 'results' mapping device paths to scraped values and 'errors' mapping device paths
+            to the error raised for that device.
+        """
+        return self._fan_out(self._resolve_paths(paths, pattern),
+                             lambda path, driver: driver.scrape_all(), concurrency)
+
+    @RPC.export
+    @sharded(ROUTE_PATHS)
+    @timed_rpc
+    def get_multiple_points_bulk(self,
+                                 point_names,
+                                 paths=None,
+                                 pattern=None,
+                                 concurrency=None,
+                                 max_age=None,
+                                 **kwargs):
+        """RPC method
+
+        Get multiple points on many devices in one call. Devices are read in parallel and a failure on one device
+        does not fail the call.
+        :param point_names: point names to read on every device, or a dictionary of device path to point names
+        :type point_names: list or dict
+        :param paths: device paths to read. Defaults to the keys of point_names when it is a dictionary.
+        :type paths: list
+        :param pattern: bash style filename pattern selecting additional devices
+        :type pattern: str
+        :param concurrency: maximum number of devices read at the same time
+        :type concurrency: int
+        :param max_age: maximum age in seconds of a cached value, see get_point
+        :type max_age: float
+        :param kwargs: additional arguments for the devices
+        :type kwargs: arguments pointer
+        :return: dictionary with 'results' mapping device paths to the (results, errors) returned by
+            get_multiple_points and 'errors' mapping device paths to the error raised for that device.
+        """
+        if isinstance(point_names, dict):
+            point_names = {self._resolve_device(path): names for path, names in point_names.items()}
+            if paths is None and pattern is None:
+                paths = list(point_names)
+
+            def read(path, driver):
+                return self._read_points(path, driver, point_names.get(path, []), max_age,
+                                         **kwargs)
+        else:
+
+            def read(path, driver):
+                return self._read_points(path, driver, point_names, max_age, **kwargs)
+
+        return self._fan_out(self._resolve_paths(paths, pattern), read, concurrency)
+
+    def _resolve_paths(self, paths=None, pattern=None):
+        """
+        Combine explicit device paths and the devices matching a pattern, without duplicates. Explicit paths are
+        resolved case insensitively.
+        :param paths: device paths
+        :type paths: list
+        :param pattern: bash style filename pattern
+        :type pattern: str
+        :return: list of device paths
+        """
+        resolved = dict.fromkeys(self._resolve_device(path) for path in paths or ())
+        if pattern is not None:
+            resolved.update(dict.fromkeys(self._device_tree.match(pattern)))
+        return list(resolved)
+
+    def _fan_out(self, paths, operation, concurrency=None):
+        """
+        Run an operation against many devices in parallel greenlets and collect the outcome of each device.
+        :param paths: device paths
+        :type paths: list
+        :param operation: callable taking the device path and its driver
+        :param concurrency: maximum number of concurrent operations, DEFAULT_BULK_CONCURRENCY if not set
+        :type concurrency: int
+        :return: dictionary with 'results' and 'errors' keyed by device path
+        """
+        results = {}
+        errors = {}
+        priority = in_priority_lane()
+
+        def run(path):
+            try:
+                with priority_lane(priority):
+                    results[path] = operation(path, self.instances[path])
+            except (Exception, gevent.Timeout) as e:
+                errors[path] = repr(e)
+
+        try:
+            concurrency = int(concurrency) if concurrency is not None else DEFAULT_BULK_CONCURRENCY
+        except (TypeError, ValueError):
+            _log.warning("Invalid bulk concurrency {!r}, setting to default value.".format(concurrency))
+            concurrency = DEFAULT_BULK_CONCURRENCY
+        if concurrency < 1:
+            concurrency = DEFAULT_BULK_CONCURRENCY
+        pool = Pool(concurrency)
+        for path in paths:
+            pool.spawn(run, path)
+        pool.join()
+        return {"results": results, "errors": errors}
 
     @RPC.export
+    @sharded(ROUTE_DEVICE)
+    @timed_rpc
+    @control_rpc
     def set_multiple_points(self, path, point_names_values, **kwargs):
         """RPC method
 
@@ -511,6 +1570,7 @@ class PlatformDriverAgent(Agent):
         :param kwargs: additional arguments for the device
         :type kwargs: arguments pointer
         """
+        path = self._resolve_device(path)
         if path in self._override_devices:
             raise OverrideError(
                 "Cannot set point on device {} since global override is set".format(path))
@@ -518,16 +1578,292 @@ class PlatformDriverAgent(Agent):
             return self.instances[path].set_multiple_points(point_names_values, **kwargs)
 
     @RPC.export
+    @sharded(ROUTE_PATHS)
+    @timed_rpc
+    @control_rpc
+    def set_multiple_points_bulk(self,
+                                 point_names_values,
+                                 paths=None,
+                                 pattern=None,
+                                 concurrency=None,
+                                 **kwargs):
+        """RPC method
+
+        Set multiple points on many devices in one call. The override state of every target device is checked once up
+        front; overridden devices are reported as errors and are not written. The remaining devices are written in
+        parallel and a failure on one device does not fail the call.
+        :param point_names_values: list of points and corresponding values to set on every device, or a dictionary
+            of device path to its list of points and values
+        :type point_names_values: list of tuples or dict
+        :param paths: device paths to write. Defaults to the keys of point_names_values when it is a dictionary.
+        :type paths: list
+        :param pattern: bash style filename pattern selecting additional devices
+        :type pattern: str
+        :param concurrency: maximum number of devices written at the same time
+        :type concurrency: int
+        :param kwargs: additional arguments for the devices
+        :type kwargs: arguments pointer
+        :return: dictionary with 'results' mapping device paths to the result of set_multiple_points and 'errors'
+            mapping device paths to the error raised for that device.
+        """
+        if isinstance(point_names_values, dict):
+            point_names_values = {
+                self._resolve_device(path): values
+                for path, values in point_names_values.items()
+            }
+            if paths is None and pattern is None:
+                paths = list(point_names_values)
+
+            def write(path, driver):
+                return driver.set_multiple_points(point_names_values.get(path, []), **kwargs)
+        else:
+
+            def write(path, driver):
+                return driver.set_multiple_points(point_names_values, **kwargs)
+
+        targets = []
+        overridden = {}
+        for path in self._resolve_paths(paths, pattern):
+            if path in self._override_devices:
+                overridden[path] = repr(
+                    OverrideError(
+                        "Cannot set point on device {} since global override is set".format(path)))
+            else:
+                targets.append(path)
+
+        outcome = self._fan_out(targets, write, concurrency)
+        outcome["errors"].update(overridden)
+        return outcome
+
+    @RPC.export
+    @sharded(ROUTE_ALL, merge_sorted)
+    def list_devices(self, prefix=""):
+        """RPC method
+
+        List the devices at or below a topic prefix. The prefix is matched segment by segment and case
+        insensitively, so campus/building1 lists campus/building1/ahu1 but not campus/building10/ahu1.
+        :param prefix: topic prefix, for example campus/building1. An empty prefix lists every device.
+        :type prefix: str
+        :return: sorted list of device paths
+        """
+        return sorted(self._device_tree.subtree(prefix))
+
+    @RPC.export
+    @sharded(ROUTE_ALL)
+    @timed_rpc
+    def scrape_subtree(self, prefix, concurrency=None):
+        """RPC method
+
+        Scrape all points of every device at or below a topic prefix, see list_devices and scrape_many.
+        :param prefix: topic prefix, for example campus/building1
+        :type prefix: str
+        :param concurrency: maximum number of devices scraped at the same time
+        :type concurrency: int
+        :return: dictionary with 'results' mapping device paths to scraped values and 'errors' mapping device paths
+            to the error raised for that device.
+        """
+        return self._fan_out(list(self._device_tree.subtree(prefix)),
+                             lambda path, driver: driver.scrape_all(), concurrency)
+
+    @RPC.export
+    @sharded(ROUTE_ALL)
+    @timed_rpc
+    @control_rpc
+    def revert_subtree(self, prefix, concurrency=None, **kwargs):
+        """RPC method
+
+        Revert all the set point values of every device at or below a topic prefix to default state/values.
+        Devices under a global override are reported as errors and are not reverted.
+        :param prefix: topic prefix, for example campus/building1
+        :type prefix: str
+        :param concurrency: maximum number of devices reverted at the same time
+        :type concurrency: int
+        :param kwargs: additional arguments for the devices
+        :type kwargs: arguments pointer
+        :return: dictionary with 'results' mapping reverted device paths to None and 'errors' mapping device paths
+            to the error raised for that device.
+        """
+        targets = []
+        overridden = {}
+        for path in self._device_tree.subtree(prefix):
+            if path in self._override_devices:
+                overridden[path] = repr(
+                    OverrideError(
+                        "Cannot revert device {} since global override is set".format(path)))
+            else:
+                targets.append(path)
+
+        outcome = self._fan_out(targets, lambda path, driver: driver.revert_all(**kwargs),
+                                concurrency)
+        outcome["errors"].update(overridden)
+        return outcome
+
+    @RPC.export
+    @sharded(ROUTE_ALL)
+    def get_breaker_status(self, path=None, pattern=None):
+        """RPC method
+
+        Get the scrape circuit breaker state of devices: closed, open (scheduled scrapes are skipped) or half_open (a
+        probe scrape is running), with the consecutive failures, the number of times the circuit opened and the
+        scrapes left until the next probe.
+        :param path: device path. If neither path nor pattern is set, the devices whose circuit is not closed are
+            returned.
+        :type path: str
+        :param pattern: bash style filename pattern selecting the devices
+        :type pattern: str
+        :return: dictionary of device path to breaker state
+        """
+        if path is None and pattern is None:
+            return {
+                topic: driver.breaker.as_dict()
+                for topic, driver in self.instances.items() if driver.breaker.state != CLOSED
+            }
+        return {
+            topic: self.instances[topic].breaker.as_dict()
+            for topic in self._resolve_paths([path] if path else None, pattern)
+            if topic in self.instances
+        }
+
+    @RPC.export
+    @sharded(ROUTE_ALL)
+    def reset_breaker(self, path=None, pattern=None):
+        """RPC method
+
+        Close the scrape circuit breaker of devices so they are scraped on their next slot again.
+        :param path: device path
+        :type path: str
+        :param pattern: bash style filename pattern selecting the devices
+        :type pattern: str
+        :return: list of device paths whose breaker was reset
+        """
+        reset = []
+        for topic in self._resolve_paths([path] if path else None, pattern):
+            driver = self.instances.get(topic)
+            if driver is not None:
+                driver.breaker.reset()
+                reset.append(topic)
+        return reset
+
+    @RPC.export
+    @sharded(ROUTE_EACH)
+    def get_driver_stats(self, path=None, pattern=None):
+        """RPC method
+
+        Get the runtime statistics of the platform driver. Per device: scrape count, errors and duration (last,
+        mean, max, p95), scrape overruns, consecutive scrape errors, publish latency and RPC count and latency.
+        :param path: device path to report on. If neither path nor pattern is set, a fleet summary along with the
+            statistics of every device and RPC method is returned.
+        :type path: str
+        :param pattern: bash style filename pattern selecting the devices to report on
+        :type pattern: str
+        :return: dictionary of statistics
+        """
+        if path is not None or pattern is not None:
+            return {
+                topic: self._stats.devices[topic].as_dict()
+                for topic in self._resolve_paths([path] if path else None, pattern)
+                if topic in self._stats.devices
+            }
+        stats = self._stats.summary()
+        stats["value_cache"] = self._value_cache.status()
+        stats["batch_publish"] = self._publish_batcher.status()
+        stats["socket_lock"] = socket_lock_status()
+        stats["write_coalescing"] = self._write_coalescer.status()
+        stats["drivers_set_up"] = sum(
+            getattr(driver, "is_set_up", True) for driver in self.instances.values())
+        filters = [
+            driver.publish_filter for driver in self.instances.values()
+            if getattr(driver, "publish_filter", None) is not None
+        ]
+        stats["publish_filter"] = {
+            "devices": len(filters),
+            "published": sum(f.published for f in filters),
+            "suppressed": sum(f.suppressed for f in filters)
+        }
+        stats["scrape_intervals"] = {
+            group: self._group_scrape_interval(group)
+            for group in self._slot_allocator.groups()
+        }
+        stats["device_stats"] = {
+            topic: device.as_dict()
+            for topic, device in self._stats.devices.items()
+        }
+        return stats
+
+    def _schedule_stats_publish(self):
+        if self._stats_publish_event is not None:
+            self._stats_publish_event.cancel()
+            self._stats_publish_event = None
+        if self.stats_publish_interval > 0.0:
+            self._stats_publish_event = self.core.schedule(periodic(self.stats_publish_interval),
+                                                           self._publish_stats)
+
+    def _publish_stats(self):
+        """Publish the fleet summary of the driver statistics on the stats topic."""
+        now = format_timestamp(get_aware_utc_now())
+        headers = {headers_mod.DATE: now, headers_mod.TIMESTAMP: now}
+        try:
+            self.vip.pubsub.publish('pubsub', self.stats_topic, headers=headers,
+                                    message=self._stats.summary()).get(timeout=10.0)
+        except (Exception, gevent.Timeout) as e:
+            _log.warning("Failed to publish driver statistics: {}".format(e))
+
+    def _publish_batch(self, topic, headers, message):
+        """Publish a batch of device results collected by the PublishBatcher."""
+        try:
+            with publish_lock():
+                self.vip.pubsub.publish('pubsub', topic, headers=headers,
+                                        message=message).get(timeout=10.0)
+        except gevent.Timeout:
+            _log.warning("Did not receive confirmation of publish to " + topic)
+
+    @RPC.export
+    @sharded(ROUTE_ALL)
     def heart_beat(self):
         """RPC method
 
-        Sends heartbeat to all devices
+        Sends heartbeat to all devices with a heartbeat point. Heartbeats are sent in parallel, at most
+        heartbeat_concurrency at a time, and each one is given heartbeat_timeout seconds. A device whose heartbeat
+        failed is skipped for heartbeat_backoff seconds, doubled for every consecutive failure.
+        :return: dictionary with the number of heartbeats 'sent' and the device paths that 'failed' or were
+            'skipped' because of an earlier failure.
         """
         _log.debug("sending heartbeat")
-        for device in self.instances.values():
-            device.heart_beat()
+        targets = []
+        skipped = []
+        for topic, device in self.instances.items():
+            if device.heart_beat_point is None:
+                continue
+            if device.stats.heartbeat_due():
+                targets.append(topic)
+            else:
+                skipped.append(topic)
+
+        def send(topic, device):
+            start = time.perf_counter()
+            error = True
+            try:
+                # Heartbeats are writes, they go ahead of queued scrapes like the control RPC methods.
+                with gevent.Timeout(self.heartbeat_timeout or None), priority_lane():
+                    device.heart_beat()
+                error = False
+            finally:
+                device.stats.heartbeat_completed(time.perf_counter() - start, error,
+                                                 self.heartbeat_backoff)
+
+        outcome = self._fan_out(targets, send, self.heartbeat_concurrency)
+        for topic, error in outcome["errors"].items():
+            _log.warning("Heartbeat of {} failed: {}".format(topic, error))
+        return {
+            "sent": len(outcome["results"]),
+            "failed": sorted(outcome["errors"]),
+            "skipped": sorted(skipped)
+        }
 
     @RPC.export
+    @sharded(ROUTE_DEVICE)
+    @timed_rpc
+    @control_rpc
     def revert_point(self, path, point_name, **kwargs):
         """RPC method
 
@@ -540,6 +1876,7 @@ class PlatformDriverAgent(Agent):
         :param kwargs: additional arguments for the device
         :type kwargs: arguments pointer
         """
+        path = self._resolve_device(path)
         if path in self._override_devices:
             raise OverrideError(
                 "Cannot revert point on device {} since global override is set".format(path))
@@ -547,6 +1884,9 @@ class PlatformDriverAgent(Agent):
             self.instances[path].revert_point(point_name, **kwargs)
 
     @RPC.export
+    @sharded(ROUTE_DEVICE)
+    @timed_rpc
+    @control_rpc
     def revert_device(self, path, **kwargs):
         """RPC method
 
@@ -557,6 +1897,7 @@ class PlatformDriverAgent(Agent):
         :param kwargs: additional arguments for the device
         :type kwargs: arguments pointer
         """
+        path = self._resolve_device(path)
         if path in self._override_devices:
             raise OverrideError(
                 "Cannot revert device {} since global override is set".format(path))
@@ -564,6 +1905,7 @@ class PlatformDriverAgent(Agent):
             self.instances[path].revert_all(**kwargs)
 
     @RPC.export
+    @sharded(ROUTE_ALL, local=True)
     def set_override_on(self, pattern, duration=0.0, failsafe_revert=True, staggered_revert=False):
         """RPC method
 
@@ -578,9 +1920,11 @@ class PlatformDriverAgent(Agent):
         duration.
         :type duration: float
         :param failsafe_revert: Flag to indicate if all the devices falling under the override condition has to be set
-         to its default state/value immediately.
+         to its default state/value immediately. Reverts run in the background, at most max_concurrent_reverts at a
+         time; use get_revert_status to follow their progress.
         :type failsafe_revert: boolean
-        :param staggered_revert: If this flag is set, reverting of devices will be staggered.
+        :param staggered_revert: If this flag is set, reverting of devices will be staggered by revert_stagger_interval
+         between devices and between device groups.
         :type staggered_revert: boolean
         """
         self._set_override_on(pattern, duration, failsafe_revert, staggered_revert)
@@ -606,37 +1950,33 @@ class PlatformDriverAgent(Agent):
         :param from_config_store: Flag to indicate if this function is called from config store callback
         :type from_config_store: boolean
         """
-        stagger_interval = 0.05    # sec
         # Add to override patterns set
         self._override_patterns.add(pattern)
-        i = 0
-        for name in self.instances.keys():
-            i += 1
-            if fnmatch.fnmatch(name, pattern):
-                # If revert to default state is needed
-                if failsafe_revert:
-                    if staggered_revert:
-                        self.core.spawn_later(i * stagger_interval,
-                                              self.instances[name].revert_all())
-                    else:
-                        self.core.spawn(self.instances[name].revert_all())
-                # Set override
-                self._override_devices.add(name)
+        compiled = self._pattern_index.add(pattern)
+        matched = list(self._device_tree.match(compiled))
+        for name in matched:
+            # Set override
+            self._add_override_coverage(pattern, name)
+        # If revert to default state is needed
+        if failsafe_revert and matched:
+            job = RevertJob(pattern, [(name, self.instances[name]) for name in matched],
+                            self.max_concurrent_reverts,
+                            self.revert_stagger_interval if staggered_revert else 0.0, self._revert_completed)
+            self._revert_jobs[pattern] = job
+            self.core.spawn(job.run)
         # Set timer for interval of override condition
         config_update = self._update_override_interval(duration, pattern)
         if config_update and not from_config_store:
             # Update config store
-            patterns = dict()
-            for pat in self._override_patterns:
-                if self._override_interval_events[pat] is None:
-                    patterns[pat] = str(0.0)
-                else:
-                    evt, end_time = self._override_interval_events[pat]
-                    patterns[pat] = format_timestamp(end_time)
+            self._persist_overrides()
 
-            self.vip.config.set("override_patterns", dumps(patterns))
+    def _revert_completed(self, job):
+        # The revert of an override turned off while it was running is not reported any more.
+        if job.pattern not in self._override_patterns and self._revert_jobs.get(job.pattern) is job:
+            del self._revert_jobs[job.pattern]
 
     @RPC.export
+    @sharded(ROUTE_ALL, local=True)
     def set_override_off(self, pattern):
         """RPC method
 
@@ -649,6 +1989,7 @@ class PlatformDriverAgent(Agent):
 
     # Get a list of all the devices with override condition.
     @RPC.export
+    @sharded(ROUTE_ALL)
     def get_override_devices(self):
         """RPC method
 
@@ -657,21 +1998,41 @@ class PlatformDriverAgent(Agent):
         return list(self._override_devices)
 
     @RPC.export
+    @sharded(ROUTE_ALL, local=True)
     def clear_overrides(self):
         """RPC method
 
         Clear all overrides.
         """
         # Cancel all pending override timer events
-        for pattern, evt in self._override_interval_events.items():
-            if evt is not None:
-                evt[0].cancel()
+        self._override_expiry.clear()
         self._override_interval_events.clear()
         self._override_devices.clear()
+        self._override_pattern_devices.clear()
         self._override_patterns.clear()
-        self.vip.config.set("override_patterns", {})
+        for pattern in [pat for pat, job in self._revert_jobs.items() if job.complete]:
+            del self._revert_jobs[pattern]
+        self._pattern_index.clear()
+        self._persist_overrides()
 
     @RPC.export
+    @sharded(ROUTE_ALL, merge_revert_status)
+    def get_revert_status(self, pattern=None):
+        """RPC method
+
+        Get the progress of the failsafe reverts started by set_override_on: number of devices done, failed and
+        pending, and the elapsed time in seconds.
+        :param pattern: Override pattern to report on. If not set, all known reverts are reported.
+        :type pattern: str
+        :return: dictionary of override pattern to revert status
+        """
+        if pattern is not None:
+            job = self._revert_jobs.get(pattern)
+            return {} if job is None else {pattern: job.status()}
+        return {pat: job.status() for pat, job in self._revert_jobs.items()}
+
+    @RPC.export
+    @sharded(ROUTE_ALL)
     def get_override_patterns(self):
         """RPC method
 
@@ -681,36 +2042,193 @@ class PlatformDriverAgent(Agent):
 
     def _set_override_off(self, pattern):
         """Turn off override condition on all devices matching the pattern. It removes the pattern from the override
-        patterns set, clears the list of overridden devices  and reevaluates the state of devices. It then cancels the
-        pending override event and removes pattern from the config store.
+        patterns set and releases the devices it covered; devices still covered by another pattern stay overridden.
+        It then cancels the pending override event and removes pattern from the config store.
         :param pattern: Override pattern to be removed.
         :type pattern: str
         """
         # If pattern exactly matches
         if pattern in self._override_patterns:
             self._override_patterns.discard(pattern)
+            self._pattern_index.discard(pattern)
+            job = self._revert_jobs.get(pattern)
+            if job is not None and job.complete:
+                del self._revert_jobs[pattern]
             # Cancel any pending override events
             self._cancel_override_events(pattern)
-            self._override_devices.clear()
-            patterns = dict()
-            # Build override devices list again
-            for pat in self._override_patterns:
-                for device in self.instances:
-                    if fnmatch.fnmatch(device, pat):
-                        self._override_devices.add(device)
-
-                if self._override_interval_events[pat] is None:
-                    patterns[pat] = str(0.0)
-                else:
-                    evt, end_time = self._override_interval_events[pat]
-                    patterns[pat] = format_timestamp(end_time)
-
-            self.vip.config.set("override_patterns", dumps(patterns))
+            self._remove_override_coverage(pattern)
+            self._persist_overrides()
         else:
             _log.error("Override Pattern did not match!")
             raise OverrideError(
                 "Pattern {} does not exist in list of override patterns".format(pattern))
 
+    def _persist_overrides(self):
+        """
+        Save the override patterns to the config store. Changes are written behind: the first change schedules a
+        write override_persist_interval seconds later, and all changes made until then go out with that one write.
+        """
+        if self.shard_coordinator is not None:
+            # The coordinator persists the override state of its workers.
+            return
+        if self.override_persist_interval <= 0.0:
+            self._flush_overrides()
+        elif self._override_persist_event is None:
+            self._override_persist_event = self.core.schedule(
+                get_aware_utc_now() + timedelta(seconds=self.override_persist_interval),
+                self._flush_overrides)
+
+    def _flush_overrides(self):
+        """Write the current override patterns and their end times to the config store."""
+        if self._override_persist_event is not None:
+            self._override_persist_event.cancel()
+            self._override_persist_event = None
+        patterns = dict()
+        for pat in self._override_patterns:
+            end_time = self._override_interval_events.get(pat)
+            if end_time is None:
+                patterns[pat] = str(0.0)
+            else:
+                patterns[pat] = format_timestamp(end_time)
+
+        self.vip.config.set("override_patterns", dumps(patterns))
+
+    @Core.receiver("onstop")
+    def _flush_overrides_on_stop(self, sender, **kwargs):
+        if self._override_persist_event is not None:
+            self._flush_overrides()
+
+    @Core.receiver("onstop")
+    def _flush_publishes_on_stop(self, sender, **kwargs):
+        # Scrape results waiting in an open batch window are published rather than lost.
+        self._publish_batcher.flush()
+
+    def _start_shard_workers(self, max_open_sockets):
+        # Started once the main configuration is known, the workers share the open socket limit of the host.
+        self._shard_workers.max_open_sockets = split_socket_limit(max_open_sockets, self.shard_workers)
+        # Workers authenticate with the keys of the coordinator, see platform_driver.sharding.
+        self._shard_workers.credentials = agent_credentials(self.core)
+        if "AGENT_PUBLICKEY" not in self._shard_workers.credentials:
+            _log.warning("No keys to hand to the shard workers, they need auth entries of their own.")
+        self._shard_workers.start()
+        self._shard_check_event = self.core.schedule(periodic(WORKER_CHECK_INTERVAL), self._check_shards)
+
+    @Core.receiver("onstart")
+    def _announce_shard(self, sender, **kwargs):
+        if self.shard_coordinator is not None:
+            try:
+                self.vip.rpc.call(self.shard_coordinator, "shard_ready",
+                                  self.shard_index).get(timeout=self.shard_rpc_timeout)
+            except (Exception, gevent.Timeout) as e:
+                _log.error("Failed to announce shard {} to {}: {}".format(
+                    self.shard_index, self.shard_coordinator, e))
+
+    @Core.receiver("onstop")
+    def _stop_shards(self, sender, **kwargs):
+        if self._shard_workers is not None:
+            if self._shard_check_event is not None:
+                self._shard_check_event.cancel()
+                self._shard_check_event = None
+            self._shard_workers.stop()
+
+    def _check_shards(self):
+        for shard in self._shard_workers.check():
+            # Nothing is sent to a restarted worker until it announces itself again.
+            self._shards.shard_down(shard)
+
+    def _override_state(self):
+        """Return the override patterns and their remaining durations in seconds, 0.0 for indefinite overrides."""
+        now = get_aware_utc_now()
+        overrides = {}
+        for pattern in self._override_patterns or ():
+            end_time = self._override_interval_events.get(pattern)
+            if end_time is None:
+                overrides[pattern] = 0.0
+            elif end_time > now:
+                overrides[pattern] = (end_time - now).total_seconds()
+        return overrides
+
+    def _call_shard(self, identity, method, *args, **kwargs):
+        return self.vip.rpc.call(identity, method, *args, **kwargs).get(timeout=self.shard_rpc_timeout)
+
+    @RPC.export
+    def shard_ready(self, shard):
+        """RPC method
+
+        Called by a worker once it is connected; the coordinator answers by sending it the main configuration and the
+        devices it owns.
+        :param shard: index of the worker
+        :type shard: int
+        """
+        if self._shards is None:
+            raise RuntimeError("Platform driver is not coordinating worker shards")
+        # Do not hold up the RPC reply of the worker with the configuration of all its devices.
+        gevent.spawn(self._shards.shard_ready, int(shard))
+
+    @RPC.export
+    def get_shard_status(self):
+        """RPC method
+
+        Get the process and readiness of every worker and the number of devices assigned to it.
+        :return: dictionary keyed by worker identity, empty when the agent is not coordinating workers
+        """
+        if self._shards is None:
+            return {}
+        status = self._shards.status()
+        for identity, process in self._shard_workers.status().items():
+            status[identity].update(process)
+        return status
+
+    @RPC.export
+    def shard_update_devices(self, configs):
+        """RPC method
+
+        Called by the coordinator on a worker to create or update the drivers of devices.
+        :param configs: device configuration keyed by device topic
+        :type configs: dict
+        """
+        for topic, contents in configs.items():
+            try:
+                self.update_driver("devices/" + topic, "UPDATE", contents)
+            except Exception as e:
+                _log.error("Failed to start driver {}: {}".format(topic, e))
+
+    @RPC.export
+    def shard_remove_devices(self, topics):
+        """RPC method
+
+        Called by the coordinator on a worker to stop the drivers of devices.
+        :param topics: device topics
+        :type topics: list
+        """
+        for topic in topics:
+            self.remove_driver("devices/" + topic, "DELETE", None)
+
+    @RPC.export
+    def shard_set_overrides(self, overrides):
+        """RPC method
+
+        Called by the coordinator on a worker to replace its override state with the one of the coordinator. No
+        failsafe reverts are run for the devices covered.
+        :param overrides: remaining override duration in seconds, 0.0 for indefinite, keyed by override pattern
+        :type overrides: dict
+        """
+        if self._override_patterns is None:
+            self._override_patterns = set()
+        self.clear_overrides()
+        for pattern, duration in overrides.items():
+            self._set_override_on(pattern, duration, failsafe_revert=False, from_config_store=True)
+
+    @RPC.export
+    def shard_configure(self, config):
+        """RPC method
+
+        Called by the coordinator on a worker to apply the main configuration of the coordinator.
+        :param config: main configuration
+        :type config: dict
+        """
+        self.configure_main("config", "UPDATE", config)
+
     def _update_override_interval(self, interval, pattern):
         """Schedules a new override event for the specified interval and pattern. If the pattern already exists and new
         end time is greater than old one, the event is cancelled and new event is scheduled.
@@ -728,24 +2246,20 @@ class PlatformDriverAgent(Agent):
                     return False
                 else:
                     # Cancel the old event
-                    evt = self._override_interval_events.pop(pattern)
-                    evt[0].cancel()
+                    self._override_expiry.cancel(pattern)
             self._override_interval_events[pattern] = None
             return True
         else:
             override_start = get_aware_utc_now()
             override_end = override_start + timedelta(seconds=interval)
             if pattern in self._override_interval_events:
-                evt = self._override_interval_events[pattern]
+                end_time = self._override_interval_events[pattern]
                 # If event is indefinite or greater than new end time, do nothing
-                if evt is None or override_end < evt[1]:
+                if end_time is None or override_end < end_time:
                     return False
-                else:
-                    evt = self._override_interval_events.pop(pattern)
-                    evt[0].cancel()
-            # Schedule new override event
-            event = self.core.schedule(override_end, self._cancel_override, pattern)
-            self._override_interval_events[pattern] = (event, override_end)
+            # Schedule new override event, an existing one is moved in O(log n)
+            self._override_expiry.schedule(pattern, override_end)
+            self._override_interval_events[pattern] = override_end
             return True
 
     def _cancel_override_events(self, pattern):
@@ -756,9 +2270,8 @@ class PlatformDriverAgent(Agent):
         """
         if pattern in self._override_interval_events:
             # Cancel the override cancellation timer event
-            evt = self._override_interval_events.pop(pattern, None)
-            if evt is not None:
-                evt[0].cancel()
+            self._override_interval_events.pop(pattern, None)
+            self._override_expiry.cancel(pattern)
 
     def _cancel_override(self, pattern):
         """
@@ -778,20 +2291,40 @@ class PlatformDriverAgent(Agent):
         :param state: 'add' or 'remove'
         :type state: str
         """
-        device = device.lower()
-
         if state == 'add':
             # If device falls under the existing overridden patterns, then add it to list of overridden devices.
-            for pattern in self._override_patterns:
-                if fnmatch.fnmatch(device, pattern):
-                    self._override_devices.add(device)
-                    return
+            for pattern in self._pattern_index.covering(device):
+                self._add_override_coverage(pattern, device)
         else:
             # If device is in list of overridden devices, remove it.
-            if device in self._override_devices:
-                self._override_devices.remove(device)
+            for pattern in self._override_devices.pop(device, ()):
+                self._override_pattern_devices[pattern].discard(device)
+
+    def _add_override_coverage(self, pattern, device):
+        """
+        Record that the override pattern covers the device.
+        :param pattern: override pattern
+        :type pattern: str
+        :param device: device topic
+        :type device: str
+        """
+        self._override_pattern_devices.setdefault(pattern, set()).add(device)
+        self._override_devices.setdefault(device, set()).add(pattern)
+
+    def _remove_override_coverage(self, pattern):
+        """
+        Release the devices covered by the override pattern. Only the devices the pattern covered are visited.
+        :param pattern: override pattern
+        :type pattern: str
+        """
+        for device in self._override_pattern_devices.pop(pattern, ()):
+            covering = self._override_devices[device]
+            covering.discard(pattern)
+            if not covering:
+                del self._override_devices[device]
 
     @RPC.export
+    @sharded(ROUTE_COV)
     def forward_bacnet_cov_value(self, source_address, point_name, point_values):
         """
         Called by the BACnet Proxy to pass the COV value to the driver agent
@@ -800,9 +2333,27 @@ class PlatformDriverAgent(Agent):
         :param point_name: name of the point in the COV notification
         :param point_values: dictionary of updated values sent by the device
         """
-        for driver in self.instances.values():
-            if driver.device_path == source_address:
-                driver.publish_cov_value(point_name, point_values)
+        driver = self._device_path_index.get(source_address)
+        if driver is not None:
+            driver.publish_cov_value(point_name, point_values)
+
+    @RPC.export
+    @sharded(ROUTE_COV)
+    def forward_bacnet_cov_values(self, notifications):
+        """
+        Called by the BACnet Proxy to pass a batch of COV values to the driver agents
+        for publishing. A failure to publish one notification does not prevent the
+        remaining notifications from being published.
+        :param notifications: list of (source_address, point_name, point_values) entries
+            as accepted by forward_bacnet_cov_value
+        :type notifications: list
+        """
+        for source_address, point_name, point_values in notifications:
+            try:
+                self.forward_bacnet_cov_value(source_address, point_name, point_values)
+            except Exception as e:
+                _log.error("Failed to publish COV value for {} {}: {}".format(
+                    source_address, point_name, e))
 
 
 def main(argv=sys.argv):
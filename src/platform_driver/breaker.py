@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Circuit breaker that backs off the scrapes of devices that keep failing."""
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Scrape circuit breaker of one device.
+
+    After threshold consecutive scrape failures the circuit opens and the scheduled scrapes of the
+    device are skipped: 1, 3, 7, ... scrapes for every consecutive time the circuit opens, capped at
+    max_backoff seconds worth of scrapes. The first scrape after the backoff is a half-open probe;
+    success closes the circuit, failure opens it again for twice as long.
+
+    :param threshold: consecutive failures that open the circuit, 0 disables the breaker
+    :type threshold: int
+    :param max_backoff: longest time in seconds scrapes are skipped
+    :type max_backoff: float
+    """
+    __slots__ = ('threshold', 'max_backoff', 'state', 'failures', 'trips', 'skip_remaining',
+                 'skipped')
+
+    def __init__(self, threshold=5, max_backoff=3600.0):
+        self.threshold = threshold
+        self.max_backoff = max_backoff
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.skip_remaining = 0
+        self.skipped = 0
+
+    def allow(self):
+        """Return True if the scheduled scrape should run."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self.skip_remaining <= 0:
+            self.state = HALF_OPEN
+            return True
+        # Skip while open, and while the half-open probe is still running.
+        self.skip_remaining -= 1
+        self.skipped += 1
+        return False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.skip_remaining = 0
+
+    def record_failure(self, interval):
+        """Record a failed scrape of a device scraped every interval seconds."""
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.threshold
+                                       and self.failures >= self.threshold):
+            self.trips += 1
+            self.state = OPEN
+            limit = max(1, int(self.max_backoff // interval)) if interval > 0 else 1
+            self.skip_remaining = min(2**self.trips - 1, limit)
+
+    def reset(self):
+        self.record_success()
+
+    def as_dict(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "scrapes_until_probe": max(self.skip_remaining, 0) if self.state == OPEN else 0,
+            "skipped": self.skipped
+        }
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Cache of the values read by the periodic scrapes, used to answer point reads from memory."""
+
+import time
+from collections import OrderedDict
+
+
+class ValueCache:
+    """Last scraped values of the most recently scraped devices.
+
+    Memory is bounded by keeping at most max_devices devices; the device scraped least recently is
+    evicted first. A max_devices of 0 disables the cache. Every invalidation of a device advances its
+    write generation, so the results of a scrape that began before a write can be told apart and
+    dropped instead of caching the values from before the write.
+
+    :param max_devices: maximum number of devices kept in the cache
+    :type max_devices: int
+    """
+
+    def __init__(self, max_devices=0):
+        self.max_devices = max_devices
+        self._devices = OrderedDict()
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_devices > 0
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, topic):
+        return topic in self._devices
+
+    def generation(self, topic):
+        """Write generation of a device, taken before a scrape and passed back to store."""
+        return self._generations.get(topic, 0)
+
+    def store(self, topic, values, timestamp=None, generation=None):
+        """Replace the cached values of a device with the results of a scrape.
+
+        :param generation: write generation of the device when the scrape began. The values are
+            dropped if the device was invalidated since then.
+        """
+        if not self.enabled:
+            return
+        if generation is not None and generation != self.generation(topic):
+            return
+        self._devices[topic] = (time.monotonic() if timestamp is None else timestamp, dict(values))
+        self._devices.move_to_end(topic)
+        while len(self._devices) > self.max_devices:
+            self._devices.popitem(last=False)
+
+    def lookup(self, topic, point_names, max_age):
+        """Return the cached values of the points that are not older than max_age seconds.
+
+        :return: dictionary of point name to value, missing points are left out.
+        """
+        entry = self._devices.get(topic)
+        if entry is None or max_age <= 0 or time.monotonic() - entry[0] > max_age:
+            self.misses += len(point_names)
+            return {}
+        values = entry[1]
+        found = {point: values[point] for point in point_names if point in values}
+        self.hits += len(found)
+        self.misses += len(point_names) - len(found)
+        return found
+
+    def invalidate(self, topic, point_names=None):
+        """Drop cached values of a device, for example after a write.
+
+        :param point_names: points to drop, every point of the device when None
+        """
+        if self.enabled:
+            self._generations[topic] = self.generation(topic) + 1
+        if point_names is None:
+            self._devices.pop(topic, None)
+            return
+        entry = self._devices.get(topic)
+        if entry is not None:
+            for point in point_names:
+                entry[1].pop(point, None)
+
+    def remove(self, topic):
+        """Forget a device whose driver was removed, its cached values and its write generation."""
+        self._devices.pop(topic, None)
+        self._generations.pop(topic, None)
+
+    def resize(self, max_devices):
+        self.max_devices = max_devices
+        while len(self._devices) > max(max_devices, 0):
+            self._devices.popitem(last=False)
+
+    def clear(self):
+        self._devices.clear()
+
+    def status(self):
+        return {
+            "devices": len(self._devices),
+            "max_devices": self.max_devices,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Coalescing of bursts of single point writes to a device into one device transaction."""
+
+import gevent
+from gevent.event import AsyncResult
+from volttron.driver.base.interfaces import BaseInterface, DriverInterfaceError
+
+from .locks import priority_lane
+
+
+class _Writes:
+    __slots__ = ('writes', 'timer')
+
+    def __init__(self):
+        self.writes = []
+        self.timer = None
+
+
+def _writes_point_by_point(driver):
+    """True when the interface of the driver sets multiple points with one set_point call each."""
+    interface = getattr(driver, "interface", None)
+    return (interface is None or getattr(type(interface), "set_multiple_points",
+                                         None) is BaseInterface.set_multiple_points)
+
+
+class WriteCoalescer:
+    """Merges the set_point calls to a device that arrive within a short window.
+
+    The first write to a device opens a window; writes to the same device arriving before it closes
+    are written together when it closes, in the order they arrived, through the driver registered
+    for the device at that time. Every caller blocks until its write is done and gets what set_point
+    would have returned, or an error for its own point:
+
+    * when the interface of the device has its own set_multiple_points, the window is written with
+      one set_multiple_points call and the points written are read back in one get_multiple_points
+      call; callers get the value read back, or the value they wrote if it could not be read back
+      or was overwritten by a later write to the same point in the window.
+    * otherwise set_multiple_points would call set_point for every point anyway, and the window is
+      written with one set_point call per write, so callers see exactly what the driver returns or
+      raises.
+
+    Every set_multiple_points, get_multiple_points and set_point call counts as a transaction.
+
+    :param drivers: callable returning the driver of a device path
+    :param check: callable taking the device path, called before a window is written, that raises
+        to fail every write of the window (used to re-check overrides)
+    :param window: seconds writes are collected, 0 to write every call immediately
+    :type window: float
+    :param max_size: number of writes that closes a window early, 0 for no limit
+    :type max_size: int
+    """
+
+    def __init__(self, drivers, check=None, window=0.0, max_size=0):
+        self._drivers = drivers
+        self._check = check
+        self.window = window
+        self.max_size = max_size
+        self._pending = {}
+        self.writes = 0
+        self.transactions = 0
+
+    @property
+    def enabled(self):
+        return self.window > 0.0
+
+    def set_point(self, path, point_name, value):
+        """Queue a write of the device at path and wait for its outcome."""
+        batch = self._pending.get(path)
+        if batch is None:
+            batch = self._pending[path] = _Writes()
+            batch.timer = gevent.spawn_later(self.window, self._flush, path, batch)
+        result = AsyncResult()
+        batch.writes.append((point_name, value, result))
+        if self.max_size and len(batch.writes) >= self.max_size:
+            self._flush(path, batch)
+        return result.get()
+
+    def flush(self):
+        """Write every open window now."""
+        for path, batch in list(self._pending.items()):
+            self._flush(path, batch)
+
+    def pending(self):
+        return sum(len(batch.writes) for batch in self._pending.values())
+
+    def status(self):
+        """Number of writes received and of device transactions they were sent in."""
+        return {
+            "enabled": self.enabled,
+            "writes": self.writes,
+            "transactions": self.transactions,
+            "pending": self.pending(),
+            "writes_per_transaction":
+            self.writes / self.transactions if self.transactions else None
+        }
+
+    def _flush(self, path, batch):
+        if self._pending.get(path) is not batch:
+            # Already written by the size limit or an explicit flush.
+            return
+        del self._pending[path]
+        if batch.timer is not None and batch.timer is not gevent.getcurrent():
+            batch.timer.kill(block=False)
+
+        writes = batch.writes
+        self.writes += len(writes)
+        try:
+            if self._check is not None:
+                self._check(path)
+            # Drivers may have been replaced or removed while the window was open.
+            driver = self._drivers(path)
+            # The timer greenlet does not inherit the lane of the callers.
+            with priority_lane():
+                if len(writes) == 1 or _writes_point_by_point(driver):
+                    for point_name, value, result in writes:
+                        self.transactions += 1
+                        try:
+                            result.set(driver.set_point(point_name, value))
+                        except Exception as e:
+                            result.set_exception(e)
+                    return
+                self.transactions += 1
+                errors = driver.set_multiple_points([(point_name, value)
+                                                     for point_name, value, _ in writes])
+                # Errors are keyed by <device path>/<point name>.
+                errors = {key.rpartition('/')[2]: error for key, error in (errors or {}).items()}
+                written = list(
+                    dict.fromkeys(point_name for point_name, _, _ in writes
+                                  if point_name not in errors))
+                values = {}
+                if written:
+                    self.transactions += 1
+                    try:
+                        values, _ = driver.get_multiple_points(written)
+                    except Exception:
+                        # The points were written, only their read back failed.
+                        values = {}
+                values = {key.rpartition('/')[2]: value for key, value in values.items()}
+        except Exception as e:
+            for _, _, result in writes:
+                if not result.ready():
+                    result.set_exception(e)
+            return
+
+        # Only the last write of a point in the window is what was read back.
+        last = {point_name: index for index, (point_name, _, _) in enumerate(writes)}
+        for index, (point_name, value, result) in enumerate(writes):
+            if point_name in errors:
+                result.set_exception(DriverInterfaceError(errors[point_name]))
+            elif last[point_name] == index:
+                result.set(values.get(point_name, value))
+            else:
+                result.set(value)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Deadband publish filter.
+
+With a deadband a scrape only publishes the points whose value moved past the deadband since the
+value last published for them. A deadband is either a number, the absolute change, or a dictionary
+with "absolute" and/or "percent" (of the last published value) keys; a change is published when it
+exceeds the larger of the two. A deadband of 0 publishes every change of value. Non numeric values
+are published whenever they change.
+
+Device configurations set the deadband of all points with "publish_deadband", per point deadbands
+with "publish_deadband_points" and the forced full publish period with "publish_full_interval".
+"""
+
+import numbers
+
+# Every this many scrapes all points are published so subscribers can resync.
+DEFAULT_FULL_INTERVAL = 10
+
+_MISSING = object()
+
+
+def parse_deadband(spec):
+    """Return the (absolute, percent) deadband of a spec, None if spec is None.
+
+    :raises ValueError: if the spec is not a valid deadband
+    """
+    if spec is None:
+        return None
+    if isinstance(spec, dict):
+        unknown = set(spec) - {"absolute", "percent"}
+        if unknown:
+            raise ValueError("Unknown deadband keys {}".format(", ".join(sorted(unknown))))
+        absolute, percent = float(spec.get("absolute", 0.0)), float(spec.get("percent", 0.0))
+    elif isinstance(spec, (numbers.Real, str)) and not isinstance(spec, bool):
+        absolute, percent = float(spec), 0.0
+    else:
+        raise ValueError("Invalid deadband {!r}".format(spec))
+    if absolute < 0.0 or percent < 0.0:
+        raise ValueError("Deadband {!r} is negative".format(spec))
+    return absolute, percent
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+class DeadbandFilter:
+    """Filters the scrape results of a device down to the points that moved past their deadband.
+
+    Only the last published value of the points with a deadband is kept. The first scrape, and then
+    every full_interval-th scrape, publishes every point.
+
+    :param default: (absolute, percent) deadband of points without their own, None to always
+        publish them
+    :type default: tuple
+    :param points: point name -> (absolute, percent) deadband
+    :type points: dict
+    :param full_interval: number of scrapes between full publishes, 0 to only publish the first
+        scrape in full
+    :type full_interval: int
+    """
+    __slots__ = ('default', 'points', 'full_interval', '_last', '_rounds', 'published',
+                 'suppressed')
+
+    def __init__(self, default=None, points=None, full_interval=DEFAULT_FULL_INTERVAL):
+        self.default = default
+        self.points = points or {}
+        self.full_interval = full_interval
+        self._last = {}
+        self._rounds = 0
+        self.published = 0
+        self.suppressed = 0
+
+    @classmethod
+    def from_config(cls, config, publish_deadband=None, full_interval=DEFAULT_FULL_INTERVAL):
+        """Build the filter of a device, None when no deadband applies to it.
+
+        Settings in the device configuration override the platform driver wide publish_deadband
+        and full_interval.
+
+        :raises ValueError: if a deadband or the full interval is invalid
+        """
+        default = parse_deadband(config.get("publish_deadband", publish_deadband))
+        points = {
+            point: parse_deadband(spec)
+            for point, spec in (config.get("publish_deadband_points") or {}).items()
+        }
+        if default is None and not points:
+            return None
+        full_interval = int(config.get("publish_full_interval", full_interval))
+        if full_interval < 0:
+            raise ValueError("publish_full_interval must not be negative")
+        return cls(default, points, full_interval)
+
+    @property
+    def settings(self):
+        return self.default, self.points, self.full_interval
+
+    def filter(self, results):
+        """Return the results to publish for this scrape."""
+        full = self._rounds == 0 or (self.full_interval
+                                     and self._rounds % self.full_interval == 0)
+        self._rounds += 1
+        last = self._last
+        if full:
+            for point, value in results.items():
+                if self.points.get(point, self.default) is not None:
+                    last[point] = value
+            self.published += len(results)
+            return results
+
+        changed = {}
+        for point, value in results.items():
+            deadband = self.points.get(point, self.default)
+            if deadband is not None:
+                previous = last.get(point, _MISSING)
+                if previous is not _MISSING and not self._moved(previous, value, deadband):
+                    continue
+                last[point] = value
+            changed[point] = value
+        self.published += len(changed)
+        self.suppressed += len(results) - len(changed)
+        return changed
+
+    def reset(self):
+        """Publish every point with the next scrape."""
+        self._last.clear()
+        self._rounds = 0
+
+    def as_dict(self):
+        return {
+            "tracked_points": len(self._last),
+            "published": self.published,
+            "suppressed": self.suppressed
+        }
+
+    @staticmethod
+    def _moved(previous, value, deadband):
+        if not (_is_number(previous) and _is_number(value)):
+            return previous != value
+        absolute, percent = deadband
+        return abs(value - previous) > max(absolute, abs(previous) * percent / 100.0)
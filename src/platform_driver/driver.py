@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""DriverAgent used by the platform driver for every configured device."""
+
+import contextlib
+import datetime
+import logging
+import time
+import traceback
+
+import gevent
+from gevent.lock import Semaphore
+from volttron.client.messaging import headers as headers_mod
+from volttron.client.messaging.topics import DRIVER_TOPIC_ALL
+from volttron.client.vip.agent import Core
+from volttron.driver.base.driver import DriverAgent as BaseDriverAgent
+from volttron.utils import format_timestamp, get_aware_utc_now
+
+from .deadband import DEFAULT_FULL_INTERVAL, DeadbandFilter
+from .encoding import ENCODING_COLUMNAR, ENCODING_HEADER
+from .stats import DeviceStats
+
+_log = logging.getLogger(__name__)
+
+
+class DriverAgent(BaseDriverAgent):
+    """DriverAgent that reports scrape, publish and overrun statistics to the platform driver.
+
+    The platform driver replaces stats with the entry it keeps for the device, and sets value_cache
+    to its :class:`~platform_driver.cache.ValueCache` and publish_batcher to its
+    :class:`~platform_driver.publish.PublishBatcher` when the driver is registered. With the
+    columnar publish encoding it also sets encoder to a
+    :class:`~platform_driver.encoding.ColumnarEncoder`, and breaker to the
+    :class:`~platform_driver.breaker.CircuitBreaker` deciding which scheduled scrapes run.
+
+    publish_filter is the :class:`~platform_driver.deadband.DeadbandFilter` of the device, set up
+    with the other publish types from default_publish_deadband and default_publish_full_interval
+    and the device configuration.
+
+    With setup_lead set, the interface of the device is not imported and configured when the driver
+    starts but setup_lead seconds before its first scheduled scrape, or by the first call that needs
+    it, whichever comes first. Only the interface is deferred: the driver itself, with its
+    configuration and registry, is still created and started when the device is configured, and
+    once its interface is set up the driver uses as much memory as without setup_lead.
+    """
+
+    def __init__(self,
+                 *args,
+                 default_publish_deadband=None,
+                 default_publish_full_interval=DEFAULT_FULL_INTERVAL,
+                 **kwargs):
+        self.stats = DeviceStats()
+        self.value_cache = None
+        self.publish_batcher = None
+        self.encoder = None
+        self.breaker = None
+        self.publish_filter = None
+        self.setup_lead = None
+        self.interface = None
+        self.scrape_in_progress = False
+        self._setup_lock = Semaphore()
+        self._setup_event = None
+        super(DriverAgent, self).__init__(*args, **kwargs)
+        self._update_publish_filter(default_publish_deadband, default_publish_full_interval)
+        # Known before the interface is set up so heartbeats can be sent to a device not scraped yet.
+        self.heart_beat_point = self.config.get("heart_beat_point")
+
+    @Core.receiver('onstart')
+    def starting(self, sender, **kwargs):
+        if self.setup_lead is None:
+            super(DriverAgent, self).starting(sender, **kwargs)
+            return
+
+        next_periodic_read = self.find_starting_datetime(get_aware_utc_now())
+        self._setup_event = self.core.schedule(
+            next_periodic_read - datetime.timedelta(seconds=self.setup_lead), self._deferred_setup)
+        self.periodic_read_event = self.core.schedule(next_periodic_read, self.periodic_read,
+                                                      next_periodic_read)
+
+    @property
+    def is_set_up(self):
+        return self.interface is not None and not self._setup_lock.locked()
+
+    def ensure_setup(self):
+        """Import and configure the interface of the device if that has not been done yet."""
+        if self.is_set_up:
+            return
+        with self._setup_lock:
+            if self.interface is not None:
+                return
+            if self._setup_event is not None:
+                self._setup_event.cancel()
+                self._setup_event = None
+            start = time.perf_counter()
+            try:
+                self.setup_device()
+                self.all_path_depth, self.all_path_breadth = self.get_paths_for_point(
+                    DRIVER_TOPIC_ALL)
+            except Exception:
+                self.interface = None
+                raise
+            _log.debug("Set up {} in {:.3f}s".format(self.device_path, time.perf_counter() - start))
+
+    def _deferred_setup(self):
+        self._setup_event = None
+        try:
+            self.ensure_setup()
+        except Exception as e:
+            # Retried by the next scrape or call.
+            _log.error("Failed to set up {}: {}".format(self.device_path, e))
+
+    def update_publish_types(self,
+                             publish_depth_first_all,
+                             publish_breadth_first_all,
+                             publish_depth_first,
+                             publish_breadth_first,
+                             publish_deadband=None,
+                             publish_full_interval=DEFAULT_FULL_INTERVAL):
+        """Setup which publish types happen for a scrape and the deadband filter of the publishes.
+           Values passed in are overridden by settings in the specific device configuration."""
+        super(DriverAgent, self).update_publish_types(publish_depth_first_all,
+                                                      publish_breadth_first_all,
+                                                      publish_depth_first, publish_breadth_first)
+        self._update_publish_filter(publish_deadband, publish_full_interval)
+
+    def _update_publish_filter(self, publish_deadband, publish_full_interval):
+        try:
+            publish_filter = DeadbandFilter.from_config(self.config, publish_deadband,
+                                                        publish_full_interval)
+        except (TypeError, ValueError) as e:
+            _log.warning("Invalid publish deadband for {}, publishing every value: {}".format(
+                self.device_path, e))
+            publish_filter = None
+        if (publish_filter is not None and self.publish_filter is not None
+                and publish_filter.settings == self.publish_filter.settings):
+            # Keep the last published values.
+            return
+        self.publish_filter = publish_filter
+
+    def periodic_read(self, now):
+        #we not use self.core.schedule to prevent drift.
+        next_scrape_time = now + datetime.timedelta(seconds=self.interval)
+        # Sanity check now.
+        # This is specifically for when this is running in a VM that gets
+        # suspended and then resumed.
+        # If we don't make this check a resumed VM will publish one event
+        # per minute of
+        # time the VM was suspended for.
+        test_now = get_aware_utc_now()
+        if test_now - next_scrape_time > datetime.timedelta(seconds=self.interval):
+            next_scrape_time = self.find_starting_datetime(test_now)
+
+        _log.debug("{} next scrape scheduled: {}".format(self.device_path, next_scrape_time))
+
+        self.periodic_read_event = self.core.schedule(next_scrape_time, self.periodic_read,
+                                                      next_scrape_time)
+
+        if self.breaker is not None and not self.breaker.allow():
+            _log.debug("Skipping scrape of {}, circuit open".format(self.device_name))
+            self.parent.scrape_failed(self.device_path)
+            return
+
+        if self.scrape_in_progress:
+            # The previous scrape of this device is still running.
+            self.stats.overruns += 1
+            _log.warning("Scrape of {} started before the previous one finished".format(
+                self.device_name))
+
+        self.scrape_in_progress = True
+        try:
+            self.scrape_and_publish(now)
+        finally:
+            self.scrape_in_progress = False
+
+    def scrape_and_publish(self, now):
+        try:
+            self.ensure_setup()
+        except Exception as e:
+            self.stats.scrape_completed(0.0, error=True)
+            # A device that cannot even be set up backs off like one failing its scrapes.
+            if self.breaker is not None:
+                self.breaker.record_failure(self.interval)
+            _log.error("Failed to set up {}: {}".format(self.device_path, e))
+            self.parent.scrape_failed(self.device_path)
+            return
+        _log.debug("scraping device: " + self.device_name)
+
+        self.parent.scrape_starting(self.device_name)
+
+        generation = None
+        if self.value_cache is not None:
+            generation = self.value_cache.generation(self.device_name)
+        start = time.perf_counter()
+        try:
+            results = self.interface.scrape_all()
+            register_names = self.interface.get_register_names_view()
+            for point in (register_names - results.keys()):
+                depth_first_topic = self.base_topic(point=point)
+                _log.error("Failed to scrape point: " + depth_first_topic)
+        except (Exception, gevent.Timeout) as ex:
+            self.stats.scrape_completed(time.perf_counter() - start, error=True)
+            if self.breaker is not None:
+                self.breaker.record_failure(self.interval)
+            tb = traceback.format_exc()
+            _log.error('Failed to scrape ' + self.device_name + ':\n' + tb)
+            self.parent.scrape_failed(self.device_path)
+            return
+        self.stats.scrape_completed(time.perf_counter() - start)
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+        if self.value_cache is not None:
+            self.value_cache.store(self.device_name, results, generation=generation)
+
+        # XXX: Does a warning need to be printed?
+        if not results:
+            self.parent.scrape_ending(self.device_name)
+            return
+
+        if self.publish_filter is not None:
+            results = self.publish_filter.filter(results)
+            if not results:
+                # Nothing moved past its deadband.
+                self.parent.scrape_ending(self.device_name)
+                return
+
+        utcnow = get_aware_utc_now()
+        utcnow_string = format_timestamp(utcnow)
+        sync_timestamp = format_timestamp(now - datetime.timedelta(seconds=self.time_slot_offset))
+
+        headers = {
+            headers_mod.DATE: utcnow_string,
+            headers_mod.TIMESTAMP: utcnow_string,
+            headers_mod.SYNC_TIMESTAMP: sync_timestamp
+        }
+
+        if self.publish_depth_first or self.publish_breadth_first:
+            for point, value in results.items():
+                depth_first_topic, breadth_first_topic = self.get_paths_for_point(point)
+                message = [value, self.meta_data[point]]
+
+                if self.publish_depth_first:
+                    self._publish_wrapper(depth_first_topic, headers=headers, message=message)
+
+                if self.publish_breadth_first:
+                    self._publish_wrapper(breadth_first_topic, headers=headers, message=message)
+
+        if self.encoder is not None:
+            # Keyed on every register, so rounds thinned out by the deadband filter keep the schema.
+            message = self.encoder.encode(results, self.meta_data, self.meta_data)
+            headers[ENCODING_HEADER] = ENCODING_COLUMNAR
+        else:
+            message = [results, self.meta_data]
+
+        if self.publish_batcher is not None and self.publish_batcher.enabled:
+            # The all publishes of the fleet are coalesced by the platform driver.
+            self.publish_batcher.add(self.device_name, self.group, message, sync_timestamp)
+        else:
+            if self.publish_depth_first_all:
+                self._publish_wrapper(self.all_path_depth, headers=headers, message=message)
+
+            if self.publish_breadth_first_all:
+                self._publish_wrapper(self.all_path_breadth, headers=headers, message=message)
+
+        self.parent.scrape_ending(self.device_name)
+
+    def get_point(self, point_name, **kwargs):
+        self.ensure_setup()
+        return super(DriverAgent, self).get_point(point_name, **kwargs)
+
+    def scrape_all(self):
+        self.ensure_setup()
+        return super(DriverAgent, self).scrape_all()
+
+    def get_multiple_points(self, point_names, **kwargs):
+        self.ensure_setup()
+        return super(DriverAgent, self).get_multiple_points(point_names, **kwargs)
+
+    def set_point(self, point_name, value, **kwargs):
+        self.ensure_setup()
+        with self._invalidating_cache((point_name,)):
+            return super(DriverAgent, self).set_point(point_name, value, **kwargs)
+
+    def set_multiple_points(self, point_names_values, **kwargs):
+        self.ensure_setup()
+        with self._invalidating_cache([point_name for point_name, _ in point_names_values]):
+            return super(DriverAgent, self).set_multiple_points(point_names_values, **kwargs)
+
+    def revert_point(self, point_name, **kwargs):
+        self.ensure_setup()
+        with self._invalidating_cache((point_name,)):
+            super(DriverAgent, self).revert_point(point_name, **kwargs)
+
+    def revert_all(self, **kwargs):
+        self.ensure_setup()
+        with self._invalidating_cache():
+            super(DriverAgent, self).revert_all(**kwargs)
+
+    def publish_cov_value(self, point_name, point_values):
+        self.ensure_setup()
+        super(DriverAgent, self).publish_cov_value(point_name, point_values)
+
+    def _invalidate_cache(self, point_names=None):
+        # Written points must not be served from the values of an earlier scrape.
+        if self.value_cache is not None:
+            self.value_cache.invalidate(self.device_name, point_names)
+
+    @contextlib.contextmanager
+    def _invalidating_cache(self, point_names=None):
+        # Invalidating again once the write is done also drops the results of scrapes that began
+        # while it was in flight.
+        self._invalidate_cache(point_names)
+        try:
+            yield
+        finally:
+            self._invalidate_cache(point_names)
+
+    def _publish_wrapper(self, topic, headers, message):
+        start = time.perf_counter()
+        try:
+            super(DriverAgent, self)._publish_wrapper(topic, headers=headers, message=message)
+        finally:
+            self.stats.publish.record(time.perf_counter() - start)
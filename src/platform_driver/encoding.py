@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Encodings of the all publishes of a device.
+
+The default json encoding publishes [values, meta_data] with point names repeated in every message.
+The columnar encoding publishes the values as a list in the order given by a schema:
+
+    {"schema": 3, "values": [72.0, 1, ...]}
+
+The point names ("points") and the meta data ("meta") are included when they change, on the first
+publish of a device and every header_interval publishes after that, so subscribers that start late
+can pick up the schema. Columnar messages carry the Encoding header; :class:`PublishDecoder` turns
+either encoding back into [values, meta_data].
+
+When the schema is the full register list of the device, a publish carrying only some of the
+points, for example after a deadband filter, keeps the schema and lists the points it carries as a
+hexadecimal bitmap of schema columns, bit 0 being the first point:
+
+    {"schema": 3, "values": [73.0], "present": "4"}
+
+Batched publishes (see :mod:`platform_driver.publish`) map every device path to the message the
+device would have published, in the same encoding, and carry the same Encoding header;
+:meth:`PublishDecoder.decode_batch` decodes them.
+"""
+
+ENCODING_HEADER = "Encoding"
+ENCODING_JSON = "json"
+ENCODING_COLUMNAR = "columnar"
+PUBLISH_ENCODINGS = (ENCODING_JSON, ENCODING_COLUMNAR)
+
+DEFAULT_HEADER_INTERVAL = 10
+
+
+class ColumnarEncoder:
+    """Encoder keeping the schema of one device.
+
+    :param header_interval: number of publishes after which the schema is repeated
+    :type header_interval: int
+    """
+
+    def __init__(self, header_interval=DEFAULT_HEADER_INTERVAL):
+        self.header_interval = header_interval
+        self.schema = 0
+        self._points = None
+        self._meta = None
+        self._since_header = 0
+
+    def encode(self, results, meta_data, columns=None):
+        """Encode the scrape results of the device.
+
+        :param results: point name to value
+        :type results: dict
+        :param meta_data: point name to meta data
+        :type meta_data: dict
+        :param columns: point names of the schema, usually every register of the device, so that
+            results for only some of them do not change the schema. The points of the results if
+            not set, or if the results have points that are not in columns.
+        :type columns: iterable
+        :return: message dictionary
+        """
+        message = None
+        if columns is not None:
+            points = tuple(columns)
+            values = []
+            present = 0
+            for column, point in enumerate(points):
+                if point in results:
+                    values.append(results[point])
+                    present |= 1 << column
+            if len(values) == len(results):
+                message = {"schema": self.schema, "values": values}
+                if len(values) < len(points):
+                    message["present"] = format(present, "x")
+        if message is None:
+            points = tuple(results)
+            message = {"schema": self.schema, "values": list(results.values())}
+        if points != self._points:
+            self.schema += 1
+            message["schema"] = self.schema
+            self._points = points
+            self._since_header = 0
+        if meta_data is not self._meta and meta_data != self._meta:
+            self._meta = meta_data
+            self._since_header = 0
+
+        if self._since_header == 0 or self._since_header >= self.header_interval:
+            message["points"] = list(points)
+            message["meta"] = {point: meta_data.get(point) for point in points}
+            self._since_header = 0
+        self._since_header += 1
+        return message
+
+
+class PublishDecoder:
+    """Decoder for subscribers of device all topics and of batched publishes.
+
+    Keeps the last schema seen on every topic, and for batches on every device path. Messages
+    without the Encoding header are returned unchanged.
+    """
+
+    def __init__(self):
+        self._schemas = {}
+
+    def decode(self, topic, headers, message):
+        """Decode a device publish.
+
+        :return: [values, meta_data]
+        :raises ValueError: if the schema of a columnar message has not been seen yet.
+        """
+        if not self._columnar(headers):
+            return message
+        return self._decode_columnar(topic, message)
+
+    def decode_batch(self, topic, headers, message):
+        """Decode a batched publish.
+
+        Devices whose columnar schema has not been seen yet, because the subscriber started after
+        it was last sent, are left out until the schema is repeated.
+
+        :return: device path to [values, meta_data]
+        """
+        if not self._columnar(headers):
+            return message
+        decoded = {}
+        for device, device_message in message.items():
+            try:
+                decoded[device] = self._decode_columnar(("batch", device), device_message)
+            except ValueError:
+                continue
+        return decoded
+
+    @staticmethod
+    def _columnar(headers):
+        encoding = (headers or {}).get(ENCODING_HEADER, ENCODING_JSON)
+        if encoding not in PUBLISH_ENCODINGS:
+            raise ValueError("Unsupported publish encoding {}".format(encoding))
+        return encoding == ENCODING_COLUMNAR
+
+    def _decode_columnar(self, key, message):
+        schema = self._schemas.get(key)
+        if "points" in message:
+            schema = self._schemas[key] = (message["schema"], message["points"], message["meta"])
+        if schema is None or schema[0] != message["schema"]:
+            raise ValueError("Schema {} of {} not received yet".format(message["schema"], key))
+
+        _, points, meta = schema
+        if "present" in message:
+            present = int(message["present"], 16)
+            points = [point for column, point in enumerate(points) if present >> column & 1]
+        return [dict(zip(points, message["values"])), meta]
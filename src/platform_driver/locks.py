@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Socket lock with a priority lane for control writes.
+
+Interfaces take a socket slot with :func:`volttron.driver.base.driver_locks.socket_lock` for every
+device transaction. :func:`configure_socket_lock` installs a :class:`PrioritySemaphore` as that lock,
+so that greenlets running inside :func:`priority_lane` are handed the next free slot before any
+queued scrape.
+
+The driver base library has no hook for the kind of lock used. Up to volttron-lib-base-driver 0.2,
+the version range pyproject.toml pins, socket_lock acquires the module global _socket_lock on every
+call and configure_socket_lock only fills that global in once. configure_socket_lock here fills it
+in instead of the library, so no other lock is ever installed. It checks the contract before doing
+so and raises RuntimeError if the library no longer keeps its lock in _socket_lock or its
+socket_lock no longer acquires it; tests/test_locks.py checks the contract as well.
+"""
+
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from gevent.event import Event
+from gevent.local import local
+from volttron.driver.base import driver_locks
+
+from .stats import LatencyStats
+
+_lane = local()
+
+
+@contextmanager
+def priority_lane(enabled=True):
+    """Run the block in the priority lane of the socket lock."""
+    if not enabled:
+        yield
+        return
+    depth = getattr(_lane, "depth", 0)
+    _lane.depth = depth + 1
+    try:
+        yield
+    finally:
+        _lane.depth = depth
+
+
+def in_priority_lane():
+    return getattr(_lane, "depth", 0) > 0
+
+
+class PrioritySemaphore:
+    """Bounded semaphore with two FIFO queues of waiters.
+
+    A released slot is handed directly to the longest waiting priority greenlet, or else to the
+    longest waiting normal one, so a newly arriving normal greenlet cannot take a slot ahead of a
+    queued priority greenlet. The time spent waiting for a slot is recorded per lane.
+
+    :param value: number of slots
+    :type value: int
+    """
+
+    def __init__(self, value):
+        self._value = value
+        self._priority = deque()
+        self._normal = deque()
+        self.wait_stats = {"priority": LatencyStats(), "normal": LatencyStats()}
+
+    def waiting(self):
+        return {"priority": len(self._priority), "normal": len(self._normal)}
+
+    def acquire(self):
+        priority = in_priority_lane()
+        queue = self._priority if priority else self._normal
+        start = time.perf_counter()
+        if self._value > 0 and not self._priority and (priority or not self._normal):
+            self._value -= 1
+        else:
+            event = Event()
+            queue.append(event)
+            try:
+                event.wait()
+            except BaseException:
+                if event.is_set():
+                    # The slot was handed over as the wait was interrupted, pass it on.
+                    self.release()
+                else:
+                    queue.remove(event)
+                raise
+        self.wait_stats["priority" if priority else "normal"].record(time.perf_counter() - start)
+        return True
+
+    def release(self):
+        if self._priority:
+            self._priority.popleft().set()
+        elif self._normal:
+            self._normal.popleft().set()
+        else:
+            self._value += 1
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class _ProbeLock:
+    """Stand-in lock recording whether socket_lock of the driver base library acquires it."""
+
+    def __init__(self):
+        self.acquired = False
+
+    def acquire(self):
+        self.acquired = True
+
+    def release(self):
+        pass
+
+
+def _check_driver_locks():
+    if not hasattr(driver_locks, "_socket_lock"):
+        raise RuntimeError(
+            "Unsupported volttron-lib-base-driver: driver_locks._socket_lock is missing")
+    if driver_locks._socket_lock is not None:
+        raise RuntimeError("socket_lock already configured!")
+    probe = driver_locks._socket_lock = _ProbeLock()
+    try:
+        with driver_locks.socket_lock():
+            pass
+    finally:
+        driver_locks._socket_lock = None
+    if not probe.acquired:
+        raise RuntimeError("Unsupported volttron-lib-base-driver: socket_lock does not use "
+                           "driver_locks._socket_lock")
+
+
+def configure_socket_lock(max_connections=0):
+    """Configure the shared socket lock, with a priority lane when the number of sockets is
+    limited.
+
+    Like :func:`volttron.driver.base.driver_locks.configure_socket_lock` it may only be called
+    once.
+
+    :raises RuntimeError: if the lock is already configured, or if the driver base library does
+        not keep its socket lock where the priority lane is installed
+    """
+    if max_connections < 1:
+        driver_locks.configure_socket_lock(max_connections)
+        return
+    _check_driver_locks()
+    driver_locks._socket_lock = PrioritySemaphore(max_connections)
+
+
+def socket_lock_status():
+    """Slot wait times per lane and the number of waiting greenlets, None without a priority lane."""
+    lock = driver_locks._socket_lock
+    if not isinstance(lock, PrioritySemaphore):
+        return None
+    return {
+        "waiting": lock.waiting(),
+        "wait": {lane: stats.as_dict() for lane, stats in lock.wait_stats.items()}
+    }
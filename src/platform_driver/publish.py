@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Coalescing of the per-device all publishes into batched messages."""
+
+import logging
+
+import gevent
+from volttron.client.messaging import headers as headers_mod
+from volttron.utils import format_timestamp, get_aware_utc_now
+
+from .encoding import ENCODING_HEADER, ENCODING_JSON
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_BATCH_TOPIC = "platform_driver/batch"
+
+
+class _Batch:
+    __slots__ = ('devices', 'sync_timestamp', 'timer')
+
+    def __init__(self, sync_timestamp):
+        self.devices = {}
+        self.sync_timestamp = sync_timestamp
+        self.timer = None
+
+
+class PublishBatcher:
+    """Collects the scrape results of many devices and publishes them as one message.
+
+    A batch is published window seconds after the first device was added to it, or as soon as it
+    holds max_size devices. The message maps every device path to the message the device would
+    otherwise have published on its own all topic, encoded as set by encoding.
+
+    :param publish: callable taking topic, headers and message that puts a batch on the bus
+    :param enabled: when False the drivers publish their all topics themselves
+    :type enabled: bool
+    :param window: seconds results are collected before the batch is published
+    :type window: float
+    :param max_size: number of devices that triggers an early publish, 0 for no limit
+    :type max_size: int
+    :param by_group: publish one batch per device group on topic/<group>
+    :type by_group: bool
+    :param topic: topic batches are published on
+    :type topic: str
+    :param encoding: publish encoding of the device messages, see :mod:`platform_driver.encoding`
+    :type encoding: str
+    """
+
+    def __init__(self,
+                 publish,
+                 enabled=False,
+                 window=1.0,
+                 max_size=0,
+                 by_group=False,
+                 topic=DEFAULT_BATCH_TOPIC,
+                 encoding=ENCODING_JSON):
+        self._publish = publish
+        self.enabled = enabled
+        self.window = window
+        self.max_size = max_size
+        self.by_group = by_group
+        self.topic = topic
+        self.encoding = encoding
+        self._batches = {}
+        self.results = 0
+        self.messages = 0
+
+    def add(self, device, group, message, sync_timestamp):
+        """Add the all message of a device to the open batch of its group.
+
+        A newer result of a device replaces the one already in the batch.
+        """
+        key = group if self.by_group else None
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _Batch(sync_timestamp)
+            batch.timer = gevent.spawn_later(self.window, self._flush, key, batch)
+        batch.devices[device] = message
+        self.results += 1
+        if self.max_size and len(batch.devices) >= self.max_size:
+            self._flush(key, batch)
+
+    def flush(self):
+        """Publish every open batch now."""
+        for key, batch in list(self._batches.items()):
+            self._flush(key, batch)
+
+    def pending(self):
+        return sum(len(batch.devices) for batch in self._batches.values())
+
+    def status(self):
+        """Number of device results collected and of batch messages published."""
+        return {
+            "enabled": self.enabled,
+            "results": self.results,
+            "messages": self.messages,
+            "pending": self.pending(),
+            "results_per_message": self.results / self.messages if self.messages else None
+        }
+
+    def _flush(self, key, batch):
+        if self._batches.get(key) is not batch:
+            # Already published by the size limit or an explicit flush.
+            return
+        del self._batches[key]
+        if batch.timer is not None and batch.timer is not gevent.getcurrent():
+            batch.timer.kill(block=False)
+
+        topic = self.topic if key is None else "{}/{}".format(self.topic, key)
+        utcnow_string = format_timestamp(get_aware_utc_now())
+        headers = {
+            headers_mod.DATE: utcnow_string,
+            headers_mod.TIMESTAMP: utcnow_string,
+            headers_mod.SYNC_TIMESTAMP: batch.sync_timestamp
+        }
+        if self.encoding != ENCODING_JSON:
+            headers[ENCODING_HEADER] = self.encoding
+        self.messages += 1
+        try:
+            self._publish(topic, headers, batch.devices)
+        except Exception as e:
+            _log.warning("Failed to publish batch of {} devices to {}: {}".format(
+                len(batch.devices), topic, e))
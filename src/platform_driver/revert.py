@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Failsafe revert of the devices placed under an override."""
+
+import logging
+import time
+from itertools import groupby
+
+import gevent
+from gevent.pool import Pool
+
+from .locks import priority_lane
+
+_log = logging.getLogger(__name__)
+
+
+class RevertJob:
+    """Reverts a set of devices to their default state with bounded concurrency.
+
+    Devices are dispatched in group order from a single work queue. When staggering is enabled, each
+    dispatch waits stagger_interval seconds and each device group starts stagger_interval seconds after
+    the previous group was dispatched, so a building wide override ramps up instead of hitting every
+    device at once.
+
+    :param pattern: override pattern the revert belongs to
+    :type pattern: str
+    :param drivers: list of (device path, driver) pairs to revert
+    :type drivers: list
+    :param concurrency: maximum number of reverts in flight, unbounded if < 1
+    :type concurrency: int
+    :param stagger_interval: delay in seconds between dispatches, 0.0 to dispatch without delay
+    :type stagger_interval: float
+    :param on_complete: callable taking the job, called once every device has been reverted
+    """
+
+    def __init__(self, pattern, drivers, concurrency=10, stagger_interval=0.0, on_complete=None):
+        self.pattern = pattern
+        self.drivers = sorted(drivers, key=lambda item: getattr(item[1], 'group', 0))
+        self.concurrency = concurrency if concurrency and concurrency > 0 else None
+        self.stagger_interval = stagger_interval
+        self.on_complete = on_complete
+        self.done = 0
+        self.failed = {}
+        self.started = None
+        self.finished = None
+
+    @property
+    def complete(self):
+        return self.finished is not None
+
+    def run(self):
+        self.started = time.monotonic()
+        pool = Pool(self.concurrency)
+        first_group = True
+        for group, drivers in groupby(self.drivers, key=lambda item: getattr(item[1], 'group', 0)):
+            if self.stagger_interval and not first_group:
+                gevent.sleep(self.stagger_interval)
+            first_group = False
+            for name, driver in drivers:
+                if self.stagger_interval:
+                    gevent.sleep(self.stagger_interval)
+                pool.spawn(self._revert, name, driver)
+        pool.join()
+        self.finished = time.monotonic()
+        _log.info("Override revert for {}: {} devices reverted, {} failed in {:.2f} seconds".format(
+            self.pattern, self.done, len(self.failed), self.finished - self.started))
+        if self.on_complete is not None:
+            self.on_complete(self)
+
+    def _revert(self, name, driver):
+        try:
+            # A failsafe revert is a control write, do not queue it behind scrapes.
+            with priority_lane():
+                driver.revert_all()
+        except (Exception, gevent.Timeout) as e:
+            _log.error("Failed to revert {} for override {}: {}".format(name, self.pattern, e))
+            self.failed[name] = repr(e)
+        else:
+            self.done += 1
+
+    def status(self):
+        """Progress of the revert as a dictionary suitable for returning over RPC."""
+        if self.started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.finished or time.monotonic()) - self.started
+        return {
+            "pattern": self.pattern,
+            "total": len(self.drivers),
+            "done": self.done,
+            "failed": dict(self.failed),
+            "pending": len(self.drivers) - self.done - len(self.failed),
+            "elapsed": elapsed,
+            "complete": self.complete
+        }
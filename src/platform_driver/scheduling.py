@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Scrape and timer scheduling helpers for the platform driver."""
+
+import heapq
+import itertools
+import logging
+import time
+from collections import defaultdict
+
+import gevent
+from volttron.utils import get_aware_utc_now
+
+_log = logging.getLogger(__name__)
+
+
+class SlotAllocator:
+    """Hands out scrape time slots per device group.
+
+    Freed slots are kept in a min-heap so the lowest free slot is reused first in O(log n). Slots that
+    have never been handed out are taken from a per group high-water mark. The owner of every slot is
+    tracked so that a group can be compacted back to contiguous slots after heavy churn.
+    """
+
+    def __init__(self):
+        self._free = defaultdict(list)
+        self._next = defaultdict(int)
+        self._owners = defaultdict(dict)
+
+    def allocate(self, group, owner):
+        """Reserve the lowest free slot of the group for owner and return it."""
+        free = self._free[group]
+        if free:
+            slot = heapq.heappop(free)
+        else:
+            slot = self._next[group]
+            self._next[group] = slot + 1
+        self._owners[group][slot] = owner
+        return slot
+
+    def release(self, group, slot):
+        owners = self._owners[group]
+        if owners.pop(slot, None) is None:
+            return
+        if not owners:
+            # Nothing left in the group, start from slot 0 again.
+            self._discard(group)
+        elif slot == self._next[group] - 1:
+            self._next[group] = slot
+        else:
+            heapq.heappush(self._free[group], slot)
+
+    def count(self, group):
+        """Number of slots in use in the group."""
+        return len(self._owners.get(group, ()))
+
+    def groups(self):
+        return list(self._owners)
+
+    def fragmentation(self, group):
+        """Fraction of the slots below the high-water mark of the group that are free."""
+        high_water = self._next.get(group, 0)
+        if not high_water:
+            return 0.0
+        return 1.0 - self.count(group) / high_water
+
+    def compact(self, group):
+        """Reassign the slots of the group to 0..n-1, keeping the relative order of their owners.
+
+        :return: list of (owner, new slot) for the owners whose slot changed.
+        """
+        owners = self._owners.get(group)
+        if not owners:
+            return []
+        moved = []
+        compacted = {}
+        for new_slot, old_slot in enumerate(sorted(owners)):
+            owner = owners[old_slot]
+            compacted[new_slot] = owner
+            if new_slot != old_slot:
+                moved.append((owner, new_slot))
+        self._owners[group] = compacted
+        self._free[group] = []
+        self._next[group] = len(compacted)
+        return moved
+
+    def clear(self):
+        self._free.clear()
+        self._next.clear()
+        self._owners.clear()
+
+    def _discard(self, group):
+        self._free.pop(group, None)
+        self._next.pop(group, None)
+        self._owners.pop(group, None)
+
+
+class StartupScheduler:
+    """Brings drivers up in waves instead of all at once.
+
+    Drivers are queued in group order and started wave_size at a time, waiting wave_interval seconds
+    between waves. With by_group set, a wave also ends at every device group boundary. A wave_size < 1
+    without by_group starts every driver as soon as it is submitted.
+
+    Progress of the current ramp is tracked from the first submission until every started driver
+    completed its first scrape, which gives the time to first complete scrape of a cold start. A
+    first scrape that failed, or was skipped, also completes the ramp and is counted separately.
+
+    :param start: callable starting the driver, called with the device topic and the driver
+    :param wave_size: maximum number of drivers started per wave
+    :type wave_size: int
+    :param wave_interval: seconds between waves
+    :type wave_interval: float
+    :param by_group: start one device group per wave
+    :type by_group: bool
+    """
+
+    def __init__(self, start, wave_size=0, wave_interval=1.0, by_group=False):
+        self._start = start
+        self.wave_size = wave_size
+        self.wave_interval = wave_interval
+        self.by_group = by_group
+        self._queue = []
+        self._queued = {}
+        self._sequence = itertools.count()
+        self._runner = None
+        self._awaiting_scrape = set()
+        self._reset_progress()
+
+    @property
+    def staged(self):
+        return self.wave_size > 0 or self.by_group
+
+    def submit(self, topic, driver, group=0):
+        if not self._queued and not self._awaiting_scrape:
+            self._reset_progress()
+            self._ramp_start = time.monotonic()
+        self._submitted += 1
+        if not self.staged:
+            self._launch(topic, driver)
+            self._check_started()
+            return
+        entry = [group, next(self._sequence), topic, driver]
+        self._queued[topic] = entry
+        heapq.heappush(self._queue, entry)
+        if self._runner is None:
+            self._runner = gevent.spawn(self._run)
+
+    def cancel(self, topic):
+        """Drop a driver that has not been started yet.
+
+        :return: True if the driver was still queued.
+        """
+        self._awaiting_scrape.discard(topic)
+        entry = self._queued.pop(topic, None)
+        if entry is None:
+            return False
+        # Lazily removed from the heap by the runner.
+        entry[2] = None
+        self._submitted -= 1
+        return True
+
+    def is_queued(self, topic):
+        return topic in self._queued
+
+    def scrape_completed(self, topic, error=False):
+        if topic not in self._awaiting_scrape:
+            return
+        self._awaiting_scrape.discard(topic)
+        if error:
+            self._first_scrape_failed += 1
+        if not self._awaiting_scrape and not self._queued and self._first_scrape_done is None:
+            self._first_scrape_done = time.monotonic()
+            _log.info("All {} drivers completed their first scrape {:.2f} seconds after startup".format(
+                self._started, self._first_scrape_done - self._ramp_start))
+
+    def status(self):
+        """Progress of the current startup ramp as a dictionary suitable for returning over RPC."""
+        now = time.monotonic()
+
+        def since_start(timestamp):
+            if timestamp is None or self._ramp_start is None:
+                return None
+            return timestamp - self._ramp_start
+
+        return {
+            "submitted": self._submitted,
+            "queued": len(self._queued),
+            "started": self._started,
+            "awaiting_first_scrape": len(self._awaiting_scrape),
+            "first_scrape_failed": self._first_scrape_failed,
+            "elapsed": since_start(now) or 0.0,
+            "time_to_all_started": since_start(self._all_started),
+            "time_to_first_complete_scrape": since_start(self._first_scrape_done)
+        }
+
+    def _reset_progress(self):
+        self._ramp_start = None
+        self._submitted = 0
+        self._started = 0
+        self._all_started = None
+        self._first_scrape_done = None
+        self._first_scrape_failed = 0
+
+    def _launch(self, topic, driver):
+        self._awaiting_scrape.add(topic)
+        self._started += 1
+        try:
+            self._start(topic, driver)
+        except Exception as e:
+            self._awaiting_scrape.discard(topic)
+            _log.error("Failed to start driver {}: {}".format(topic, e))
+
+    def _check_started(self):
+        if not self._queued:
+            self._all_started = time.monotonic()
+
+    def _next_wave(self):
+        wave = []
+        wave_group = None
+        while self._queue:
+            group, _, topic, driver = self._queue[0]
+            if topic is None:
+                heapq.heappop(self._queue)
+                continue
+            if wave and ((self.by_group and group != wave_group) or
+                         (self.wave_size > 0 and len(wave) >= self.wave_size)):
+                break
+            heapq.heappop(self._queue)
+            del self._queued[topic]
+            wave_group = group
+            wave.append((topic, driver))
+        return wave
+
+    def _run(self):
+        try:
+            while True:
+                wave = self._next_wave()
+                if not wave:
+                    break
+                _log.debug("Starting wave of {} drivers, {} still queued".format(
+                    len(wave), len(self._queued)))
+                for topic, driver in wave:
+                    self._launch(topic, driver)
+                if self._queued:
+                    gevent.sleep(self.wave_interval)
+            self._check_started()
+        finally:
+            self._runner = None
+
+
+class ExpiryScheduler:
+    """Expiry times of many keys served by one timer.
+
+    Deadlines are kept in a min-heap and only the earliest one has a timer on the event loop. Moving a
+    deadline later or cancelling it leaves a stale heap entry behind that is skipped when it surfaces,
+    so neither touches the timer; the timer is only replaced when a deadline earlier than the armed
+    one is scheduled.
+
+    :param schedule: callable taking a deadline and a callback and returning an event with a cancel
+        method, such as core.schedule
+    :param expire: callable invoked with the key when its deadline has passed
+    :param now: callable returning the current time in the same type as the deadlines
+    """
+
+    def __init__(self, schedule, expire, now=get_aware_utc_now):
+        self._schedule = schedule
+        self._expire = expire
+        self._now = now
+        self._heap = []
+        self._deadlines = {}
+        self._seq = itertools.count()
+        self._timer = None
+        self._timer_deadline = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def deadline(self, key):
+        return self._deadlines.get(key)
+
+    def schedule(self, key, deadline):
+        """Set or move the deadline of key."""
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._seq), key))
+        if self._timer_deadline is None or deadline < self._timer_deadline:
+            self._arm(deadline)
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._compact()
+
+    def cancel(self, key):
+        """Forget the deadline of key.
+
+        :return: True if key had a deadline.
+        """
+        return self._deadlines.pop(key, None) is not None
+
+    def clear(self):
+        self._deadlines.clear()
+        self._heap.clear()
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = self._timer_deadline = None
+
+    def _arm(self, deadline):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_deadline = deadline
+        self._timer = self._schedule(deadline, self._fire)
+
+    def _fire(self):
+        self._timer = self._timer_deadline = None
+        now = self._now()
+        expired = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(heap)
+            if self._deadlines.get(key) == deadline:
+                del self._deadlines[key]
+                expired.append(key)
+        # Drop stale entries so the timer is armed for a live deadline.
+        while heap and self._deadlines.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+        if heap:
+            self._arm(heap[0][0])
+
+        for key in expired:
+            try:
+                self._expire(key)
+            except Exception:
+                _log.exception("Expiry of {} failed".format(key))
+
+    def _compact(self):
+        self._heap = [(deadline, next(self._seq), key) for key, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
+
+
+class ScrapeIntervalController:
+    """Chooses the scrape slot spacing of a device group from measured scrape durations.
+
+    The spacing tracks the 90th percentile scrape duration of the group plus headroom, so that a
+    device is normally done before the next slot starts without leaving idle time between slots.
+    It is kept within [min_interval, max_interval] and within the limit given by the caller, and is
+    only changed when it is off by more than tolerance to avoid rescheduling on noise.
+
+    :param min_interval: smallest spacing in seconds
+    :type min_interval: float
+    :param max_interval: largest spacing in seconds
+    :type max_interval: float
+    :param headroom: factor applied to the measured scrape duration
+    :type headroom: float
+    :param tolerance: relative change below which the spacing is left alone
+    :type tolerance: float
+    """
+
+    def __init__(self, min_interval=0.0, max_interval=1.0, headroom=1.2, tolerance=0.1):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.headroom = headroom
+        self.tolerance = tolerance
+
+    def recommend(self, current, durations, limit=None):
+        """Return the new spacing for a group, or None to keep the current one.
+
+        :param current: current spacing in seconds
+        :param durations: recent scrape durations of the devices in the group
+        :param limit: largest spacing that still fits every slot of the group in the scrape interval
+        """
+        if not durations:
+            return None
+        durations = sorted(durations)
+        target = durations[int(0.9 * (len(durations) - 1))] * self.headroom
+        upper = self.max_interval if limit is None else min(self.max_interval, limit)
+        target = max(self.min_interval, min(upper, target))
+        if current > 0 and abs(target - current) <= self.tolerance * current:
+            return None
+        if current == target:
+            return None
+        return target
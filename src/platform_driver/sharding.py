@@ -0,0 +1,589 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Partitioning of the devices of the platform driver over worker processes.
+
+With shard_workers set the platform driver becomes a coordinator: it starts that many worker
+processes, each running its own platform driver under the identity <identity>.shard<n>, hands every
+device configuration to the worker owning the device and forwards RPC calls to the workers.
+
+Devices are assigned to workers by device group, so the scrape slots of a group are still allocated
+by a single process, or by a stable hash of the device topic. With groups, whole groups are moved
+from the busiest to the idlest worker when devices are added or removed and the device counts of the
+workers drift apart.
+
+Override patterns are set on every worker and kept, and persisted, by the coordinator, which hands
+them to workers when they start or restart.
+
+Workers are part of the coordinator agent and connect to the platform with its keys, so the
+platform authenticates them through the auth entry of the coordinator, with its capabilities. No
+auth entry is created for the worker identities; a platform with auth enabled accepts them as long
+as it accepts the coordinator.
+"""
+
+import logging
+import os
+import sys
+import zlib
+
+import gevent
+from gevent import subprocess
+
+from .topic_index import DeviceTree
+
+_log = logging.getLogger(__name__)
+
+SHARD_BY_GROUP = "group"
+SHARD_BY_HASH = "hash"
+SHARD_STRATEGIES = (SHARD_BY_GROUP, SHARD_BY_HASH)
+
+# Environment of a worker process: its shard index, the identity of its coordinator and its share
+# of the open socket limit of the coordinator.
+SHARD_INDEX_ENV = "PLATFORM_DRIVER_SHARD"
+SHARD_COORDINATOR_ENV = "PLATFORM_DRIVER_COORDINATOR"
+SHARD_MAX_OPEN_SOCKETS_ENV = "PLATFORM_DRIVER_MAX_OPEN_SOCKETS"
+
+# Main configuration settings that only apply to the coordinator.
+COORDINATOR_CONFIG_KEYS = frozenset(
+    ("shard_workers", "shard_by", "shard_rebalance_threshold", "shard_rpc_timeout"))
+
+# How RPC calls of the coordinator are routed: to the worker owning the device in the first
+# argument, to every worker with the results merged, to every worker with the results keyed by
+# worker identity, for COV notifications to the owners of the source addresses, or, for the bulk
+# RPC methods, to the owners of the device paths in the call with the results merged.
+ROUTE_DEVICE = "device"
+ROUTE_ALL = "all"
+ROUTE_EACH = "each"
+ROUTE_COV = "cov"
+ROUTE_PATHS = "paths"
+
+# Arguments of the bulk RPC methods that may map device paths to per device values.
+PATH_KEYED_ARGS = ("point_names", "point_names_values")
+
+# Seconds between checks for exited worker processes.
+WORKER_CHECK_INTERVAL = 10.0
+
+
+def shard_identity(identity, shard):
+    return "{}.shard{}".format(identity, shard)
+
+
+def split_socket_limit(max_open_sockets, workers):
+    """Share of the open socket limit of the coordinator each of its workers gets.
+
+    Workers get at least one socket each, so with fewer sockets than workers the limit is exceeded.
+
+    :return: sockets per worker, None without a limit
+    """
+    if max_open_sockets is None or max_open_sockets < 1:
+        return None
+    return max(max_open_sockets // workers, 1)
+
+
+def agent_credentials(core):
+    """Environment variables passing the keys of an agent to the workers it starts.
+
+    :return: AGENT_PUBLICKEY, AGENT_SECRETKEY and VOLTTRON_SERVERKEY for the keys the agent has
+    """
+    keys = {
+        "AGENT_PUBLICKEY": getattr(core, "publickey", None),
+        "AGENT_SECRETKEY": getattr(core, "secretkey", None),
+        "VOLTTRON_SERVERKEY": getattr(core, "serverkey", None)
+    }
+    return {name: key for name, key in keys.items() if isinstance(key, str)}
+
+
+def merge_results(results):
+    """Merge the results of an RPC call answered by every worker.
+
+    Dictionaries are merged key by key, numbers are summed and lists concatenated without
+    duplicates; for other values the last one wins.
+    """
+    results = [result for result in results if result is not None]
+    if not results:
+        return None
+    first = results[0]
+    if isinstance(first, dict):
+        merged = {}
+        for result in results:
+            for key, value in result.items():
+                merged[key] = value if key not in merged else merge_results([merged[key], value])
+        return merged
+    if isinstance(first, list):
+        merged = []
+        for result in results:
+            merged.extend(item for item in result if item not in merged)
+        return merged
+    if isinstance(first, (int, float)) and not isinstance(first, bool):
+        return sum(results)
+    return results[-1]
+
+
+def merge_sorted(results):
+    """Merge lists answered by every worker into one sorted list."""
+    merged = merge_results(results)
+    return None if merged is None else sorted(merged)
+
+
+def merge_revert_status(results):
+    """Merge the get_revert_status results of every worker.
+
+    Device counts are summed and failures merged; the revert of a pattern has been running as long
+    as its longest part and is complete once every worker completed its part.
+    """
+    statuses = {}
+    for result in results:
+        for pattern, status in (result or {}).items():
+            statuses.setdefault(pattern, []).append(status)
+    merged = {}
+    for pattern, parts in statuses.items():
+        status = merge_results(parts)
+        status["pattern"] = pattern
+        status["elapsed"] = max(part["elapsed"] for part in parts)
+        status["complete"] = all(part["complete"] for part in parts)
+        merged[pattern] = status
+    return merged
+
+
+class ShardMap:
+    """Assignment of device topics to shards.
+
+    :param shards: number of shards
+    :type shards: int
+    :param strategy: SHARD_BY_GROUP or SHARD_BY_HASH
+    :type strategy: str
+    :param rebalance_threshold: difference between the device counts of the busiest and idlest
+        shards, as a fraction of the mean device count, above which groups are moved
+    :type rebalance_threshold: float
+    """
+
+    def __init__(self, shards, strategy=SHARD_BY_GROUP, rebalance_threshold=0.25):
+        if strategy not in SHARD_STRATEGIES:
+            raise ValueError("Unknown shard strategy {}, expected one of {}".format(
+                strategy, ", ".join(SHARD_STRATEGIES)))
+        self.shards = shards
+        self.strategy = strategy
+        self.rebalance_threshold = rebalance_threshold
+        self._owners = {}
+        self._groups = {}
+        self._group_shards = {}
+        self._group_topics = {}
+        self._loads = [0] * shards
+        self._tree = DeviceTree()
+
+    def __len__(self):
+        return len(self._owners)
+
+    def __contains__(self, topic):
+        return topic in self._owners
+
+    def resolve(self, path):
+        """Return the assigned topic equal to path ignoring case, or None."""
+        if path in self._owners:
+            return path
+        return self._tree.resolve(path)
+
+    def owner(self, path):
+        """Return the shard owning the device path, or None."""
+        topic = self.resolve(path)
+        return None if topic is None else self._owners[topic]
+
+    def topics(self, shard):
+        return [topic for topic, owner in self._owners.items() if owner == shard]
+
+    def loads(self):
+        return list(self._loads)
+
+    def assign(self, topic, group=0):
+        """Assign a device, or reassign it after a change of its group.
+
+        :return: the shard of the device and the (topic, old shard, new shard) moves of other
+            devices made to rebalance the shards
+        """
+        if topic in self._owners:
+            if self._groups[topic] == group:
+                return self._owners[topic], []
+            self._discard(topic)
+        if self.strategy == SHARD_BY_HASH:
+            shard = max(range(self.shards),
+                        key=lambda s: zlib.crc32("{}/{}".format(s, topic).encode("utf-8")))
+        else:
+            shard = self._group_shards.get(group)
+            if shard is None:
+                shard = self._group_shards[group] = min(range(self.shards),
+                                                        key=self._loads.__getitem__)
+            self._group_topics.setdefault(group, set()).add(topic)
+        self._owners[topic] = shard
+        self._groups[topic] = group
+        self._loads[shard] += 1
+        self._tree.add(topic)
+        return shard, self._rebalance()
+
+    def remove(self, topic):
+        """Remove a device.
+
+        :return: the shard that owned the device, None if it was not assigned, and the moves made
+            to rebalance the shards
+        """
+        if topic not in self._owners:
+            return None, []
+        shard = self._discard(topic)
+        return shard, self._rebalance()
+
+    def _discard(self, topic):
+        shard = self._owners.pop(topic)
+        group = self._groups.pop(topic)
+        self._loads[shard] -= 1
+        self._tree.remove(topic)
+        topics = self._group_topics.get(group)
+        if topics is not None:
+            topics.discard(topic)
+            if not topics:
+                del self._group_topics[group]
+                del self._group_shards[group]
+        return shard
+
+    def _rebalance(self):
+        if self.strategy != SHARD_BY_GROUP or self.shards < 2:
+            return []
+        moves = []
+        loads = self._loads
+        while True:
+            high = max(range(self.shards), key=loads.__getitem__)
+            low = min(range(self.shards), key=loads.__getitem__)
+            spread = loads[high] - loads[low]
+            if spread <= max(1.0, self.rebalance_threshold * sum(loads) / self.shards):
+                return moves
+            # Moving a group smaller than the spread always narrows it.
+            candidates = [(len(self._group_topics[group]), group)
+                          for group, shard in self._group_shards.items()
+                          if shard == high and len(self._group_topics[group]) < spread]
+            if not candidates:
+                return moves
+            size, group = max(candidates)
+            self._group_shards[group] = low
+            loads[high] -= size
+            loads[low] += size
+            for topic in sorted(self._group_topics[group]):
+                self._owners[topic] = low
+                moves.append((topic, high, low))
+
+
+class ShardCoordinator:
+    """Hands the device configurations of the platform driver to its workers and routes RPC calls.
+
+    Nothing is sent to a worker that has not announced itself with :meth:`shard_ready` yet, or
+    that was restarted and has not announced itself again: it gets the main configuration, the
+    override state and its devices when it does.
+
+    :param call: callable taking a worker identity, an RPC method name and its arguments that
+        makes a blocking RPC call
+    :param identities: worker identities by shard
+    :type identities: list
+    :param strategy: SHARD_BY_GROUP or SHARD_BY_HASH
+    :type strategy: str
+    :param rebalance_threshold: see :class:`ShardMap`
+    :type rebalance_threshold: float
+    :param overrides: callable returning the override patterns of the coordinator and their
+        remaining durations, handed to workers when they announce themselves
+    """
+
+    def __init__(self,
+                 call,
+                 identities,
+                 strategy=SHARD_BY_GROUP,
+                 rebalance_threshold=0.25,
+                 overrides=None):
+        self._call = call
+        self.identities = identities
+        self.map = ShardMap(len(identities), strategy, rebalance_threshold)
+        self._overrides = overrides
+        self._configs = {}
+        self._ready = [False] * len(identities)
+        self._main_config = None
+
+    def configure(self, config):
+        """Send the main configuration, without the coordinator settings, to the workers."""
+        self._main_config = {
+            key: value
+            for key, value in config.items() if key not in COORDINATOR_CONFIG_KEYS
+        }
+        for shard, ready in enumerate(self._ready):
+            if ready:
+                self._send(shard, "shard_configure", self._main_config)
+
+    def update_device(self, topic, config):
+        old = self.map.owner(topic) if topic in self.map else None
+        shard, moves = self.map.assign(topic, int(config.get("group", 0)))
+        self._configs[topic] = config
+        if old is not None and old != shard:
+            self._send(old, "shard_remove_devices", [topic])
+        self._send(shard, "shard_update_devices", {topic: config})
+        self._move(moves)
+
+    def remove_device(self, topic):
+        topic = self.map.resolve(topic) or topic
+        shard, moves = self.map.remove(topic)
+        if shard is None:
+            return
+        del self._configs[topic]
+        self._send(shard, "shard_remove_devices", [topic])
+        self._move(moves)
+
+    def shard_ready(self, shard):
+        """Record that a worker is up and send it its configuration and devices."""
+        self._ready[shard] = True
+        _log.info("Worker {} ready".format(self.identities[shard]))
+        if self._main_config is not None:
+            self._send(shard, "shard_configure", self._main_config)
+        overrides = self._overrides() if self._overrides is not None else None
+        if overrides:
+            self._send(shard, "shard_set_overrides", overrides)
+        configs = {topic: self._configs[topic] for topic in self.map.topics(shard)}
+        if configs:
+            self._send(shard, "shard_update_devices", configs)
+
+    def shard_down(self, shard):
+        """Record that a worker exited; it is skipped until it announces itself again."""
+        self._ready[shard] = False
+
+    def call(self, method, route, args, kwargs, merge=None):
+        """Route an RPC call to the workers.
+
+        :param merge: callable merging the results of the workers, :func:`merge_results` if not set
+        """
+        merge = merge or merge_results
+        if route == ROUTE_DEVICE:
+            path = args[0] if args else kwargs.get("path")
+            shard = self.map.owner(path)
+            if shard is None:
+                raise KeyError(path)
+            if not self._ready[shard]:
+                raise RuntimeError("Worker {} is not ready".format(self.identities[shard]))
+            return self._call(self.identities[shard], method, *args, **kwargs)
+        if route == ROUTE_COV:
+            return self._forward_cov(method, args, kwargs)
+        if route == ROUTE_PATHS:
+            return self._call_paths(method, kwargs, merge)
+        shards = [shard for shard, ready in enumerate(self._ready) if ready]
+        results = self._broadcast(shards, method, args, kwargs)
+        if route == ROUTE_EACH:
+            return {self.identities[shard]: result for shard, result in zip(shards, results)}
+        return merge(results)
+
+    def status(self):
+        return {
+            identity: {
+                "ready": self._ready[shard],
+                "devices": load
+            }
+            for shard, (identity, load) in enumerate(zip(self.identities, self.map.loads()))
+        }
+
+    def _forward_cov(self, method, args, kwargs):
+        if method == "forward_bacnet_cov_value":
+            shard = self.map.owner(args[0] if args else kwargs.get("source_address"))
+            if shard is not None and self._ready[shard]:
+                self._call(self.identities[shard], method, *args, **kwargs)
+            return
+        notifications = {}
+        for notification in (args[0] if args else kwargs.get("notifications")):
+            shard = self.map.owner(notification[0])
+            if shard is not None and self._ready[shard]:
+                notifications.setdefault(shard, []).append(notification)
+        for shard, batch in notifications.items():
+            self._call(self.identities[shard], method, batch)
+
+    def _call_paths(self, method, kwargs, merge):
+        """Hand every worker only the device paths, and per device values, of the devices it owns.
+
+        Devices matching the pattern of the call are selected by the workers themselves. Paths no
+        worker owns are reported as errors the way a single platform driver reports them.
+        """
+        paths = kwargs.get("paths")
+        pattern = kwargs.get("pattern")
+        keyed = [key for key in PATH_KEYED_ARGS if isinstance(kwargs.get(key), dict)]
+        if paths is None and pattern is None and keyed:
+            targets = list(kwargs[keyed[0]])
+        else:
+            targets = list(paths or ())
+
+        errors = {}
+        owned = {}
+        for path in targets:
+            shard = self.map.owner(path)
+            if shard is None:
+                errors[path] = repr(KeyError(path))
+            elif not self._ready[shard]:
+                errors[path] = repr(
+                    RuntimeError("Worker {} is not ready".format(self.identities[shard])))
+            else:
+                owned.setdefault(shard, []).append(path)
+        if pattern is not None:
+            shards = [shard for shard, ready in enumerate(self._ready) if ready]
+        else:
+            shards = sorted(owned)
+
+        calls = []
+        for shard in shards:
+            shard_kwargs = dict(kwargs)
+            if paths is not None:
+                shard_kwargs["paths"] = owned.get(shard, [])
+            for key in keyed:
+                shard_kwargs[key] = {
+                    path: value
+                    for path, value in kwargs[key].items() if self.map.owner(path) == shard
+                }
+            calls.append(gevent.spawn(self._call, self.identities[shard], method, **shard_kwargs))
+        gevent.joinall(calls)
+
+        results = []
+        for shard, greenlet in zip(shards, calls):
+            if greenlet.exception is None:
+                results.append(greenlet.value)
+            elif owned.get(shard):
+                for path in owned[shard]:
+                    errors[path] = repr(greenlet.exception)
+            else:
+                raise greenlet.exception
+        merged = merge(results) or {"results": {}, "errors": {}}
+        merged["errors"].update(errors)
+        return merged
+
+    def _broadcast(self, shards, method, args, kwargs):
+        greenlets = [
+            gevent.spawn(self._call, self.identities[shard], method, *args, **kwargs)
+            for shard in shards
+        ]
+        gevent.joinall(greenlets)
+        for greenlet in greenlets:
+            if greenlet.exception is not None:
+                raise greenlet.exception
+        return [greenlet.value for greenlet in greenlets]
+
+    def _move(self, moves):
+        batches = {}
+        for topic, old, new in moves:
+            batches.setdefault((old, new), []).append(topic)
+        for (old, new), topics in batches.items():
+            _log.info("Moving {} devices from {} to {}".format(len(topics), self.identities[old],
+                                                               self.identities[new]))
+            self._send(old, "shard_remove_devices", topics)
+            self._send(new, "shard_update_devices", {topic: self._configs[topic] for topic in topics})
+
+    def _send(self, shard, method, *args):
+        if not self._ready[shard]:
+            # Sent along with everything else when the worker announces itself.
+            return
+        try:
+            self._call(self.identities[shard], method, *args)
+        except (Exception, gevent.Timeout) as e:
+            _log.error("{} to {} failed: {}".format(method, self.identities[shard], e))
+
+
+class ShardWorkers:
+    """Worker processes of a sharded platform driver.
+
+    Workers run the platform driver agent with the environment of the coordinator, including its
+    agent configuration, their own VIP identity and SHARD_INDEX_ENV and SHARD_COORDINATOR_ENV set.
+    SHARD_MAX_OPEN_SOCKETS_ENV is set to max_open_sockets when the coordinator limits the number of
+    open sockets. The keys in credentials, normally those of the coordinator, replace the keys of
+    the environment, so workers authenticate as the coordinator even when it loaded its keys from
+    its keystore.
+
+    :param identities: worker identities by shard
+    :type identities: list
+    :param coordinator: identity of the coordinator
+    :type coordinator: str
+    :param command: command starting a worker
+    :type command: list
+    :param max_open_sockets: open socket limit of each worker, None without a limit
+    :type max_open_sockets: int
+    :param credentials: environment variables with the keys workers connect with, see
+        :func:`agent_credentials`
+    :type credentials: dict
+    """
+
+    def __init__(self, identities, coordinator, command=None, max_open_sockets=None,
+                 credentials=None):
+        self.identities = identities
+        self.coordinator = coordinator
+        self.command = command or [sys.executable, "-m", "platform_driver.agent"]
+        self.max_open_sockets = max_open_sockets
+        self.credentials = credentials or {}
+        self._processes = [None] * len(identities)
+        self.restarts = 0
+
+    def start(self):
+        for shard in range(len(self.identities)):
+            self._spawn(shard)
+
+    def check(self):
+        """Restart exited workers.
+
+        :return: the shards that were restarted
+        """
+        restarted = []
+        for shard, process in enumerate(self._processes):
+            if process is not None and process.poll() is not None:
+                _log.error("Worker {} exited with {}, restarting".format(
+                    self.identities[shard], process.returncode))
+                self._spawn(shard)
+                self.restarts += 1
+                restarted.append(shard)
+        return restarted
+
+    def stop(self, timeout=10.0):
+        processes = [process for process in self._processes if process is not None]
+        self._processes = [None] * len(self.identities)
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def status(self):
+        return {
+            identity: {
+                "pid": process.pid if process is not None else None,
+                "running": process is not None and process.poll() is None
+            }
+            for identity, process in zip(self.identities, self._processes)
+        }
+
+    def _spawn(self, shard):
+        env = dict(os.environ)
+        env.pop("AGENT_UUID", None)
+        env["AGENT_VIP_IDENTITY"] = self.identities[shard]
+        env[SHARD_INDEX_ENV] = str(shard)
+        env[SHARD_COORDINATOR_ENV] = self.coordinator
+        env.pop(SHARD_MAX_OPEN_SOCKETS_ENV, None)
+        if self.max_open_sockets is not None:
+            env[SHARD_MAX_OPEN_SOCKETS_ENV] = str(self.max_open_sockets)
+        env.update(self.credentials)
+        self._processes[shard] = subprocess.Popen(self.command, env=env)
+        _log.info("Started worker {} (pid {})".format(self.identities[shard],
+                                                      self._processes[shard].pid))
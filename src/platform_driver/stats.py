@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Runtime statistics kept by the platform driver.
+
+Every structure here has a fixed size per device or per RPC method so the counters can stay on in
+production: a handful of numbers and a short window of recent samples for percentiles.
+"""
+
+import heapq
+import time
+from collections import deque
+
+# Number of recent samples kept for the p95 of an operation.
+DEFAULT_WINDOW = 64
+
+# Longest heartbeat backoff as a multiple of the configured backoff.
+HEARTBEAT_BACKOFF_LIMIT = 32
+
+
+class LatencyStats:
+    """Count, error count and timing of one kind of operation."""
+    __slots__ = ('count', 'errors', 'total', 'last', 'max', '_recent')
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.last = None
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, duration, error=False):
+        self.count += 1
+        if error:
+            self.errors += 1
+        self.total += duration
+        self.last = duration
+        if duration > self.max:
+            self.max = duration
+        self._recent.append(duration)
+
+    def as_dict(self):
+        recent = sorted(self._recent)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "last": self.last,
+            "mean": self.total / self.count if self.count else None,
+            "max": self.max,
+            "p95": recent[int(0.95 * (len(recent) - 1))] if recent else None
+        }
+
+
+class DeviceStats:
+    """Counters of one device: scrapes, publishes, heartbeats and RPC calls.
+
+    Also holds the heartbeat backoff of the device: after consecutive heartbeat failures heartbeats are
+    skipped for an exponentially growing time.
+    """
+    __slots__ = ('scrape', 'publish', 'rpc', 'heartbeat', 'overruns', 'consecutive_errors',
+                 'last_scrape_time', 'heartbeat_failures', 'heartbeat_skip_until')
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.scrape = LatencyStats(window)
+        self.publish = LatencyStats(window)
+        self.rpc = LatencyStats(window)
+        self.heartbeat = LatencyStats(window)
+        self.overruns = 0
+        self.consecutive_errors = 0
+        self.last_scrape_time = None
+        self.heartbeat_failures = 0
+        self.heartbeat_skip_until = 0.0
+
+    def scrape_completed(self, duration, error=False):
+        self.scrape.record(duration, error)
+        if error:
+            self.consecutive_errors += 1
+        else:
+            self.consecutive_errors = 0
+            self.last_scrape_time = time.time()
+
+    def heartbeat_due(self):
+        return time.monotonic() >= self.heartbeat_skip_until
+
+    def heartbeat_completed(self, duration, error=False, backoff=0.0):
+        """Record a heartbeat and, when it failed, back off for backoff seconds doubled for every
+        consecutive failure, up to HEARTBEAT_BACKOFF_LIMIT times backoff."""
+        self.heartbeat.record(duration, error)
+        if not error:
+            self.heartbeat_failures = 0
+            self.heartbeat_skip_until = 0.0
+            return
+        self.heartbeat_failures += 1
+        if backoff > 0.0:
+            factor = min(2**(self.heartbeat_failures - 1), HEARTBEAT_BACKOFF_LIMIT)
+            self.heartbeat_skip_until = time.monotonic() + backoff * factor
+
+    def as_dict(self):
+        return {
+            "scrape": self.scrape.as_dict(),
+            "publish": self.publish.as_dict(),
+            "rpc": self.rpc.as_dict(),
+            "heartbeat": self.heartbeat.as_dict(),
+            "overruns": self.overruns,
+            "consecutive_errors": self.consecutive_errors,
+            "last_scrape_time": self.last_scrape_time,
+            "heartbeat_failures": self.heartbeat_failures
+        }
+
+
+class DriverStats:
+    """Statistics of all devices and of the RPC methods of the platform driver."""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self.devices = {}
+        self.rpc = {}
+        self.writes = LatencyStats(window)
+
+    def device(self, topic):
+        stats = self.devices.get(topic)
+        if stats is None:
+            stats = self.devices[topic] = DeviceStats(self.window)
+        return stats
+
+    def remove(self, topic):
+        self.devices.pop(topic, None)
+
+    def record_rpc(self, method, topic, duration, error=False):
+        stats = self.rpc.get(method)
+        if stats is None:
+            stats = self.rpc[method] = LatencyStats(self.window)
+        stats.record(duration, error)
+        if topic is not None:
+            device = self.devices.get(topic)
+            if device is not None:
+                device.rpc.record(duration, error)
+
+    def summary(self, top=10):
+        """Fleet totals and the devices most likely to be drifting.
+
+        :param top: number of devices listed as slowest, failing and overrunning
+        """
+        devices = self.devices.items()
+        return {
+            "devices": len(self.devices),
+            "scrapes": sum(stats.scrape.count for _, stats in devices),
+            "scrape_errors": sum(stats.scrape.errors for _, stats in devices),
+            "overruns": sum(stats.overruns for _, stats in devices),
+            "slowest": {
+                topic: stats.scrape.last
+                for topic, stats in heapq.nlargest(
+                    top, ((t, s) for t, s in devices if s.scrape.last is not None),
+                    key=lambda item: item[1].scrape.last)
+            },
+            "failing": {
+                topic: stats.consecutive_errors
+                for topic, stats in heapq.nlargest(
+                    top, ((t, s) for t, s in devices if s.consecutive_errors),
+                    key=lambda item: item[1].consecutive_errors)
+            },
+            "overrunning": {
+                topic: stats.overruns
+                for topic, stats in heapq.nlargest(
+                    top, ((t, s) for t, s in devices if s.overruns),
+                    key=lambda item: item[1].overruns)
+            },
+            "rpc": {method: stats.as_dict() for method, stats in self.rpc.items()},
+            "writes": self.writes.as_dict()
+        }
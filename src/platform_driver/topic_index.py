@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+"""Indexes over device topics used by the platform driver.
+
+Device topics (campus/building/device) are kept in a segment trie so that override patterns can be
+resolved against the devices below their literal prefix instead of against the whole fleet. Override
+patterns follow the same bash style filename matching semantics as :func:`fnmatch.fnmatchcase`, in
+particular ``*`` also matches across ``/``.
+
+The device trie is keyed by case folded segments so that device paths can be resolved case
+insensitively; pattern matching is still case sensitive.
+"""
+
+import fnmatch
+import re
+
+_WILDCARD_CHARS = frozenset('*?[')
+
+
+def has_wildcard(segment):
+    return not _WILDCARD_CHARS.isdisjoint(segment)
+
+
+def split_prefix(prefix):
+    """Split a topic prefix such as campus/building1/ into its segments."""
+    prefix = prefix.rstrip('/')
+    return tuple(prefix.split('/')) if prefix else ()
+
+
+class CompiledPattern:
+    """An override pattern split into its literal topic prefix and a precompiled matcher.
+
+    :param pattern: bash style filename pattern, for example campus/building1/*
+    :type pattern: str
+    """
+    __slots__ = ('pattern', 'prefix', 'exact', '_match')
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        segments = pattern.split('/')
+        prefix = []
+        for segment in segments:
+            if has_wildcard(segment):
+                break
+            prefix.append(segment)
+        self.prefix = tuple(prefix)
+        self.exact = len(prefix) == len(segments)
+        if self.exact:
+            # Without wildcards the pattern can only ever match the one topic it spells out.
+            self._match = pattern.__eq__
+        else:
+            self._match = re.compile(fnmatch.translate(pattern)).match
+
+    def matches(self, topic):
+        return bool(self._match(topic))
+
+
+class _Node:
+    __slots__ = ('children', 'topics', 'patterns')
+
+    def __init__(self):
+        self.children = {}
+        self.topics = None
+        self.patterns = None
+
+
+class DeviceTree:
+    """Segment trie of device topics.
+
+    Lookups by literal prefix are proportional to the depth of the topic, and pattern matching and
+    subtree iteration only visit the subtree below the prefix. Topics that differ only by case share
+    a node.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, topic):
+        node = self._find(topic.split('/'))
+        return node is not None and node.topics is not None and topic in node.topics
+
+    def __iter__(self):
+        return self._walk(self._root)
+
+    def add(self, topic):
+        node = self._root
+        for segment in topic.casefold().split('/'):
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = _Node()
+            node = child
+        if node.topics is None:
+            node.topics = []
+        if topic not in node.topics:
+            node.topics.append(topic)
+            self._count += 1
+
+    def remove(self, topic):
+        """Remove a topic from the tree, pruning branches that no longer lead to a device.
+
+        :return: True if the topic was present.
+        """
+        path = [self._root]
+        segments = topic.casefold().split('/')
+        for segment in segments:
+            node = path[-1].children.get(segment)
+            if node is None:
+                return False
+            path.append(node)
+        node = path[-1]
+        if node.topics is None or topic not in node.topics:
+            return False
+        node.topics.remove(topic)
+        if not node.topics:
+            node.topics = None
+        self._count -= 1
+        for segment, parent, node in zip(reversed(segments), reversed(path[:-1]),
+                                         reversed(path[1:])):
+            if node.topics is not None or node.children:
+                break
+            del parent.children[segment]
+        return True
+
+    def resolve(self, topic):
+        """Return the registered topic equal to topic ignoring case, or None.
+
+        An exact match is preferred when several registered topics differ only by case.
+        """
+        node = self._find(topic.split('/'))
+        if node is None or node.topics is None:
+            return None
+        return topic if topic in node.topics else node.topics[0]
+
+    def subtree(self, prefix=()):
+        """Iterate over every topic at or below the prefix.
+
+        :param prefix: segments of the prefix, or a prefix string such as campus/building1
+        :type prefix: tuple or str
+        """
+        if isinstance(prefix, str):
+            prefix = split_prefix(prefix)
+        node = self._find(prefix)
+        if node is None:
+            return iter(())
+        return self._walk(node)
+
+    def match(self, pattern):
+        """Iterate over the topics matching the override pattern.
+
+        :param pattern: pattern string or :class:`CompiledPattern`
+        """
+        if not isinstance(pattern, CompiledPattern):
+            pattern = CompiledPattern(pattern)
+        if pattern.exact:
+            if pattern.pattern in self:
+                yield pattern.pattern
+            return
+        for topic in self.subtree(pattern.prefix):
+            if pattern.matches(topic):
+                yield topic
+
+    def _find(self, segments):
+        node = self._root
+        for segment in segments:
+            node = node.children.get(segment.casefold())
+            if node is None:
+                return None
+        return node
+
+    @staticmethod
+    def _walk(node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.topics is not None:
+                yield from node.topics
+            stack.extend(node.children.values())
+
+
+class PatternIndex:
+    """Override patterns keyed by their literal topic prefix.
+
+    Finding the patterns that cover a device only tests the patterns registered along the path of
+    the device topic.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._patterns = {}
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def __contains__(self, pattern):
+        return pattern in self._patterns
+
+    def __iter__(self):
+        return iter(self._patterns)
+
+    def get(self, pattern):
+        return self._patterns.get(pattern)
+
+    def add(self, pattern):
+        """Register a pattern and return its :class:`CompiledPattern`."""
+        compiled = self._patterns.get(pattern)
+        if compiled is not None:
+            return compiled
+        compiled = self._patterns[pattern] = CompiledPattern(pattern)
+        node = self._root
+        for segment in compiled.prefix:
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = _Node()
+            node = child
+        if node.patterns is None:
+            node.patterns = {}
+        node.patterns[pattern] = compiled
+        return compiled
+
+    def discard(self, pattern):
+        compiled = self._patterns.pop(pattern, None)
+        if compiled is None:
+            return None
+        path = [self._root]
+        for segment in compiled.prefix:
+            path.append(path[-1].children[segment])
+        node = path[-1]
+        del node.patterns[pattern]
+        if not node.patterns:
+            node.patterns = None
+        for segment, parent, node in zip(reversed(compiled.prefix), reversed(path[:-1]),
+                                         reversed(path[1:])):
+            if node.patterns or node.children:
+                break
+            del parent.children[segment]
+        return compiled
+
+    def clear(self):
+        self._root = _Node()
+        self._patterns.clear()
+
+    def covering(self, topic):
+        """Iterate over the patterns that match the device topic."""
+        node = self._root
+        segments = iter(topic.split('/'))
+        while node is not None:
+            if node.patterns:
+                for pattern, compiled in node.patterns.items():
+                    if compiled.matches(topic):
+                        yield pattern
+            segment = next(segments, None)
+            if segment is None:
+                return
+            node = node.children.get(segment)
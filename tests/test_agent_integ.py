@@ -56,3 +56,27 @@ def test_platform_driver_agent_successful_install_on_volttron_platform(
 
     assert publish_agent.vip.rpc.call(
         pdriver_id, "health.get_status").get(timeout=10).get('status') == STATUS_GOOD
+
+
+def test_platform_driver_agent_shard_workers_should_report_ready(
+        publish_agent: Agent, volttron_instance: PlatformWrapper):
+    agent_dir = Path(__file__).parent.parent.resolve().as_posix()
+    config = {"driver_scrape_interval": 0.05, "max_open_sockets": 100, "shard_workers": 2}
+    pdriver_id = "pdriver_shard_id"
+
+    pdriver_uuid = volttron_instance.install_agent(agent_dir=agent_dir,
+                                                   config_file=config,
+                                                   start=True,
+                                                   vip_identity=pdriver_id)
+    assert pdriver_uuid is not None
+
+    # Workers run python -m platform_driver.agent with the coordinator keys and call shard_ready.
+    status = {}
+    for _ in range(30):
+        gevent.sleep(1)
+        status = publish_agent.vip.rpc.call(pdriver_id, "get_shard_status").get(timeout=10)
+        if status and all(worker["ready"] for worker in status.values()):
+            break
+    assert set(status) == {pdriver_id + ".shard0", pdriver_id + ".shard1"}
+    assert all(worker["ready"] and worker["running"] for worker in status.values())
+    volttron_instance.stop_agent(pdriver_uuid)
@@ -24,12 +24,16 @@
 
 import json
 import contextlib
+import time
 from datetime import datetime
+from unittest import mock
 
+import gevent
 import pytest
 
 from platform_driver.agent import PlatformDriverAgent
 from platform_driver.agent import OverrideError
+from platform_driver.locks import in_priority_lane
 from volttrontesting.utils import AgentMock
 from volttron.client.vip.agent import Agent
 
@@ -45,6 +49,8 @@ def test_set_override_on_should_succeed(pattern, expected_device_override):
 
         assert len(platform_driver_agent._override_patterns) == 1
         assert len(platform_driver_agent._override_devices) == expected_device_override
+        platform_driver_agent.vip.config.set.assert_not_called()
+        platform_driver_agent._flush_overrides()
         platform_driver_agent.vip.config.set.assert_called_once()
 
 
@@ -73,9 +79,412 @@ def test_set_override_off_should_succeed():
         platform_driver_agent.set_override_off(pattern)
 
         assert len(platform_driver_agent._override_patterns) == override_patterns_count - 1
+        platform_driver_agent._flush_overrides()
         platform_driver_agent.vip.config.set.assert_called_once()
 
 
+def test_set_override_off_should_keep_devices_covered_by_other_patterns():
+    with pdriver(override_interval_events={}) as platform_driver_agent:
+        platform_driver_agent._register_instance("campus/building1/ahu1",
+                                                 MockedInstance("campus/building1/ahu1"))
+        platform_driver_agent.set_override_on("campus/building1/*", failsafe_revert=False)
+        platform_driver_agent.set_override_on("campus/*/ahu1", failsafe_revert=False)
+
+        platform_driver_agent.set_override_off("campus/building1/*")
+
+        assert platform_driver_agent.get_override_devices() == ["campus/building1/ahu1"]
+        assert platform_driver_agent._override_devices["campus/building1/ahu1"] == {"campus/*/ahu1"}
+
+
+def test_update_override_state_should_track_added_and_removed_devices():
+    with pdriver(override_interval_events={}) as platform_driver_agent:
+        platform_driver_agent.set_override_on("campus/building1/*", failsafe_revert=False)
+        platform_driver_agent._register_instance("campus/building1/ahu1",
+                                                 MockedInstance("campus/building1/ahu1"))
+
+        platform_driver_agent._update_override_state("campus/building1/ahu1", "add")
+        assert "campus/building1/ahu1" in platform_driver_agent._override_devices
+
+        platform_driver_agent._update_override_state("campus/building1/ahu1", "remove")
+        assert "campus/building1/ahu1" not in platform_driver_agent._override_devices
+        assert platform_driver_agent._override_pattern_devices["campus/building1/*"] == {
+            "campus/building1/"
+        }
+
+
+def test_forward_bacnet_cov_values_should_publish_to_matching_devices():
+    with pdriver() as platform_driver_agent:
+        device = platform_driver_agent.instances["campus/building1/"]
+
+        platform_driver_agent.forward_bacnet_cov_values([
+            ["campus/building1/", "fails", {"fails": 0}],
+            ["campus/building1/", "temp", {"temp": 72.0}],
+            ["campus/unknown", "temp", {"temp": 70.0}],
+        ])
+
+        assert device.cov_values == [("temp", {"temp": 72.0})]
+
+
+def test_scrape_many_should_return_per_device_results_and_errors():
+    with pdriver() as platform_driver_agent:
+        platform_driver_agent._register_instance("campus/building2/ahu1",
+                                                 MockedInstance("campus/building2/ahu1"))
+        platform_driver_agent._register_instance("campus/building2/broken",
+                                                 MockedInstance("campus/building2/broken"))
+
+        result = platform_driver_agent.scrape_many(paths=["campus/building1/", "missing"],
+                                                   pattern="campus/building2/*")
+
+        assert set(result["results"]) == {"campus/building1/", "campus/building2/ahu1"}
+        assert set(result["errors"]) == {"campus/building2/broken", "missing"}
+        assert result["results"]["campus/building2/ahu1"] == {"temp": 72.0}
+
+
+def test_get_multiple_points_bulk_should_limit_concurrency():
+    with pdriver() as platform_driver_agent:
+        for i in range(6):
+            platform_driver_agent._register_instance(f"campus/building2/vav{i}",
+                                                     MockedInstance(f"campus/building2/vav{i}"))
+
+        result = platform_driver_agent.get_multiple_points_bulk(["temp"],
+                                                                pattern="campus/building2/*",
+                                                                concurrency=2)
+
+        assert len(result["results"]) == 6
+        assert result["results"]["campus/building2/vav0"] == ({"temp": 72.0}, {})
+        assert MockedInstance.max_active == 2
+
+
+def test_get_multiple_points_bulk_should_coerce_concurrency_from_rpc():
+    with pdriver() as platform_driver_agent:
+        for i in range(6):
+            platform_driver_agent._register_instance(f"campus/building2/vav{i}",
+                                                     MockedInstance(f"campus/building2/vav{i}"))
+
+        MockedInstance.max_active = 0
+        result = platform_driver_agent.get_multiple_points_bulk(["temp"],
+                                                                pattern="campus/building2/*",
+                                                                concurrency="3")
+        assert len(result["results"]) == 6
+        assert MockedInstance.max_active == 3
+
+        result = platform_driver_agent.get_multiple_points_bulk(["temp"],
+                                                                pattern="campus/building2/*",
+                                                                concurrency="abc")
+        assert len(result["results"]) == 6
+        assert result["errors"] == {}
+
+
+def test_set_multiple_points_bulk_should_skip_overridden_devices():
+    with pdriver(override_interval_events={}) as platform_driver_agent:
+        platform_driver_agent._register_instance("campus/building2/vav1",
+                                                 MockedInstance("campus/building2/vav1"))
+        platform_driver_agent.set_override_on("campus/building1/*", failsafe_revert=False)
+
+        result = platform_driver_agent.set_multiple_points_bulk(
+            {
+                "campus/building1/": [("setpoint", 70)],
+                "campus/building2/vav1": [("setpoint", 68)]
+            })
+
+        assert result["results"] == {"campus/building2/vav1": {}}
+        assert "OverrideError" in result["errors"]["campus/building1/"]
+        assert platform_driver_agent.instances["campus/building2/vav1"].written == [("setpoint",
+                                                                                    68)]
+        assert platform_driver_agent.instances["campus/building1/"].written == []
+
+
+def test_set_point_should_coalesce_burst_to_one_device():
+    with pdriver() as platform_driver_agent:
+        platform_driver_agent._write_coalescer.window = 0.01
+        instance = platform_driver_agent.instances["campus/building1/"]
+        instance.interface = BulkInterface()
+        greenlets = [
+            gevent.spawn(platform_driver_agent.set_point, "campus/building1/", point_name, value)
+            for point_name, value in [("a", 1), ("b", 2), ("c", 3)]
+        ]
+        gevent.joinall(greenlets)
+
+        # Callers get the values read back after the write.
+        assert [greenlet.value for greenlet in greenlets] == [72.0, 72.0, 72.0]
+        assert instance.written == [("a", 1), ("b", 2), ("c", 3)]
+        assert instance.reads == ["a", "b", "c"]
+        assert instance.priority_writes == [True]
+        assert platform_driver_agent.get_driver_stats()["write_coalescing"]["transactions"] == 2
+
+
+def test_set_point_should_fail_coalesced_writes_when_override_is_set():
+    with pdriver(override_interval_events={}) as platform_driver_agent:
+        platform_driver_agent._write_coalescer.window = 0.01
+        greenlet = gevent.spawn(platform_driver_agent.set_point, "campus/building1/", "a", 1)
+        gevent.sleep(0)
+        platform_driver_agent.set_override_on("campus/building1/", failsafe_revert=False)
+        greenlet.join()
+
+        assert isinstance(greenlet.exception, OverrideError)
+        assert platform_driver_agent.instances["campus/building1/"].written == []
+        with pytest.raises(OverrideError):
+            platform_driver_agent.set_point("campus/building1/", "a", 1)
+
+
+def test_coordinator_should_hand_devices_and_calls_to_workers():
+    calls = []
+
+    def call_shard(identity, method, *args, **kwargs):
+        calls.append((identity, method) + args)
+        return {"sent": 1, "failed": [], "skipped": []} if method == "heart_beat" else 72.0
+
+    agent = PlatformDriverAgent(json.dumps({}), shard_workers=2)
+    agent.core.identity = "platform.driver"
+    identities = agent._shards.identities
+    agent._shards._call = call_shard
+    agent._shards.shard_ready(0)
+    agent._shards.shard_ready(1)
+
+    agent.update_driver("devices/campus/ahu1", "NEW", {"group": 0})
+    agent.update_driver("devices/campus/ahu2", "NEW", {"group": 1})
+
+    assert agent.instances == {}
+    assert calls[-1] == (identities[1], "shard_update_devices", {"campus/ahu2": {"group": 1}})
+    assert agent.get_point("campus/ahu2", "temp") == 72.0
+    assert calls[-1] == (identities[1], "get_point", "campus/ahu2", "temp")
+    assert agent.heart_beat()["sent"] == 2
+    assert agent.get_shard_status()[identities[0]]["devices"] == 1
+
+    agent.remove_driver("devices/campus/ahu1", "DELETE", None)
+    assert calls[-1] == (identities[0], "shard_remove_devices", ["campus/ahu1"])
+
+
+def test_coordinator_should_start_workers_with_their_share_of_the_socket_limit(monkeypatch):
+    lock_limits = []
+    monkeypatch.setattr("platform_driver.agent.configure_socket_lock", lambda *args: lock_limits.append(args))
+    monkeypatch.setattr("platform_driver.agent.configure_publish_lock", lambda limit: None)
+
+    agent = PlatformDriverAgent(json.dumps({}), shard_workers=4)
+    agent._shard_workers = mock.Mock()
+    agent._override_patterns = set()
+    agent.configure_main("config", "NEW", {"max_open_sockets": 1000})
+    assert agent._shard_workers.max_open_sockets == 250
+    agent._shard_workers.start.assert_called_once_with()
+
+    worker = PlatformDriverAgent(json.dumps({}), shard_index="1", shard_coordinator="platform.driver",
+                                 shard_max_open_sockets="250")
+    worker.configure_main("config", "NEW", {"max_open_sockets": 1000})
+    assert lock_limits == [(1000, ), (250, )]
+
+
+def test_coordinator_should_split_bulk_calls_and_keep_overrides():
+    calls = []
+
+    def call_shard(identity, method, *args, **kwargs):
+        calls.append((identity, method, kwargs))
+        paths = kwargs.get("paths") or list(kwargs.get("point_names_values") or ())
+        return {"results": {path: identity for path in paths}, "errors": {}}
+
+    agent = PlatformDriverAgent(json.dumps({}), shard_workers=2)
+    agent.core.identity = "platform.driver"
+    agent._override_patterns = set()
+    identities = agent._shards.identities
+    agent._shards._call = call_shard
+    agent._shards.shard_ready(0)
+    agent._shards.shard_ready(1)
+    agent.update_driver("devices/campus/ahu1", "NEW", {"group": 0})
+    agent.update_driver("devices/campus/ahu2", "NEW", {"group": 1})
+    calls.clear()
+
+    outcome = agent.scrape_many(["campus/ahu1", "campus/ahu2"])
+    assert outcome == {
+        "results": {
+            "campus/ahu1": identities[0],
+            "campus/ahu2": identities[1]
+        },
+        "errors": {}
+    }
+    outcome = agent.set_multiple_points_bulk({"campus/ahu2": [("temp", 70)]})
+    assert outcome == {"results": {"campus/ahu2": identities[1]}, "errors": {}}
+    assert calls[-1] == (identities[1], "set_multiple_points_bulk", {
+        "point_names_values": {
+            "campus/ahu2": [("temp", 70)]
+        }
+    })
+
+    # The coordinator keeps the override state and hands it to restarted workers.
+    agent.set_override_on("campus/*", failsafe_revert=False)
+    assert agent._override_patterns == {"campus/*"}
+    agent._flush_overrides()
+    agent.vip.config.set.assert_called_once_with("override_patterns", json.dumps({"campus/*": "0.0"}))
+    agent.vip.reset_mock()
+    agent._shards.shard_down(1)
+    calls.clear()
+    agent._shards.shard_ready(1)
+    assert calls[0][:2] == (identities[1], "shard_set_overrides")
+
+
+def test_worker_should_take_overrides_from_coordinator_without_persisting_them():
+    with pdriver(override_patterns=set(), override_interval_events={}) as platform_driver_agent:
+        platform_driver_agent.shard_coordinator = "platform.driver"
+        platform_driver_agent.override_persist_interval = 0.0
+
+        platform_driver_agent.shard_set_overrides({"campus/building1/*": 0.0})
+
+        assert platform_driver_agent._override_patterns == {"campus/building1/*"}
+        assert "campus/building1/" in platform_driver_agent._override_devices
+        assert platform_driver_agent._revert_jobs == {}
+        platform_driver_agent.vip.config.set.assert_not_called()
+
+
+def test_set_multiple_points_bulk_should_write_in_priority_lane():
+    with pdriver() as platform_driver_agent:
+        platform_driver_agent._register_instance("campus/building2/vav1",
+                                                 MockedInstance("campus/building2/vav1"))
+
+        platform_driver_agent.set_multiple_points_bulk({
+            "campus/building1/": [("setpoint", 70)],
+            "campus/building2/vav1": [("setpoint", 68)]
+        })
+        platform_driver_agent.get_multiple_points("campus/building1/", ["temp"])
+
+        assert not in_priority_lane()
+        for instance in platform_driver_agent.instances.values():
+            assert instance.priority_writes == [True]
+        stats = platform_driver_agent.get_driver_stats()
+        assert stats["writes"]["count"] == 1
+        assert stats["rpc"]["get_multiple_points"]["count"] == 1
+
+
+def test_set_override_on_should_revert_in_background():
+    with pdriver(override_interval_events={}) as platform_driver_agent:
+        platform_driver_agent.set_override_on("campus/building1/*")
+
+        job = platform_driver_agent._revert_jobs["campus/building1/*"]
+        platform_driver_agent.core.spawn.assert_called_with(job.run)
+        status = platform_driver_agent.get_revert_status("campus/building1/*")
+        assert status["campus/building1/*"]["pending"] == 1
+
+        job.run()
+        assert platform_driver_agent.get_revert_status()["campus/building1/*"]["done"] == 1
+
+
+def test_set_override_on_should_not_start_revert_without_failsafe():
+    with pdriver(override_interval_events={}) as platform_driver_agent:
+        platform_driver_agent.set_override_on("campus/building1/*", failsafe_revert=False)
+
+        assert platform_driver_agent._revert_jobs == {}
+        assert platform_driver_agent.get_revert_status() == {}
+        assert platform_driver_agent.get_revert_status("campus/building1/*") == {}
+
+
+def test_set_override_off_should_drop_revert_job_when_it_completes():
+    with pdriver(override_interval_events={}) as platform_driver_agent:
+        platform_driver_agent.set_override_on("campus/building1/*")
+        job = platform_driver_agent._revert_jobs["campus/building1/*"]
+
+        platform_driver_agent.set_override_off("campus/building1/*")
+        assert platform_driver_agent.get_revert_status()["campus/building1/*"]["pending"] == 1
+
+        job.run()
+        assert platform_driver_agent._revert_jobs == {}
+
+
+def test_rebalance_scrape_slots_should_only_reschedule_moved_devices():
+    with pdriver() as platform_driver_agent:
+        for i in range(4):
+            topic = f"campus/building2/vav{i}"
+            device = MockedInstance(topic)
+            device.time_slot = platform_driver_agent._slot_allocator.allocate(0, topic)
+            platform_driver_agent._register_instance(topic, device)
+        platform_driver_agent._slot_allocator.release(0, 0)
+        platform_driver_agent._slot_allocator.release(0, 1)
+
+        assert platform_driver_agent.rebalance_scrape_slots() == {0: 2}
+        assert platform_driver_agent.instances["campus/building2/vav2"].time_slot == 0
+        assert platform_driver_agent.instances["campus/building2/vav3"].time_slot == 1
+
+
+def test_update_driver_should_apply_publish_and_interval_changes_in_place():
+    with pdriver() as platform_driver_agent:
+        device = platform_driver_agent.instances["campus/building1/"]
+        device.config = {"driver_type": "fake", "registry_config": [], "interval": 60}
+
+        platform_driver_agent.update_driver("devices/campus/building1/", "UPDATE", {
+            "driver_type": "fake",
+            "registry_config": [],
+            "interval": 30,
+            "publish_depth_first": True
+        })
+
+        assert platform_driver_agent.instances["campus/building1/"] is device
+        assert device.interval == 30
+        assert device.publish_types_updated
+        assert device.config["publish_depth_first"] is True
+
+
+def test_register_instance_should_defer_driver_setup_when_lazy():
+    with pdriver() as platform_driver_agent:
+        platform_driver_agent._register_instance("campus/building1/ahu1",
+                                                 MockedInstance("campus/building1/ahu1"))
+        platform_driver_agent.lazy_driver_setup = True
+        platform_driver_agent.lazy_driver_setup_lead = 2.0
+        platform_driver_agent._register_instance("campus/building1/ahu2",
+                                                 MockedInstance("campus/building1/ahu2"))
+
+        assert platform_driver_agent.instances["campus/building1/ahu1"].setup_lead is None
+        assert platform_driver_agent.instances["campus/building1/ahu2"].setup_lead == 2.0
+
+
+def test_configure_main_should_send_publish_deadband_to_running_drivers():
+    with pdriver() as platform_driver_agent:
+        device = platform_driver_agent.instances["campus/building1/"]
+        # Normally set when the NEW configuration is processed.
+        platform_driver_agent.max_open_sockets = None
+        platform_driver_agent.max_concurrent_publishes = 10000
+
+        platform_driver_agent.configure_main("config", "UPDATE", {"publish_deadband": 0.5})
+        assert device.publish_deadband == 0.5
+
+        platform_driver_agent.configure_main("config", "UPDATE", {"publish_deadband": [1]})
+        assert platform_driver_agent.publish_deadband == 0.5
+
+
+def test_update_driver_in_place_should_refuse_registry_changes():
+    with pdriver() as platform_driver_agent:
+        device = platform_driver_agent.instances["campus/building1/"]
+        device.config = {"driver_type": "fake", "registry_config": []}
+
+        assert not platform_driver_agent._update_driver_in_place(
+            "campus/building1/", device, {
+                "driver_type": "fake",
+                "registry_config": [{
+                    "Volttron Point Name": "temp"
+                }]
+            })
+        assert device.config == {"driver_type": "fake", "registry_config": []}
+
+
+def test_get_driver_stats_should_count_device_rpc_calls():
+    with pdriver() as platform_driver_agent:
+        platform_driver_agent.scrape_all("campus/building1/")
+        with pytest.raises(KeyError):
+            platform_driver_agent.scrape_all("campus/missing")
+
+        stats = platform_driver_agent.get_driver_stats()
+        assert stats["rpc"]["scrape_all"]["count"] == 2
+        assert stats["rpc"]["scrape_all"]["errors"] == 1
+        device_stats = platform_driver_agent.get_driver_stats(path="campus/building1/")
+        assert device_stats["campus/building1/"]["rpc"]["count"] == 1
+
+
+def test_get_driver_stats_should_count_case_variants_against_the_registered_device():
+    with pdriver() as platform_driver_agent:
+        platform_driver_agent.scrape_all("Campus/Building1/")
+        with pytest.raises(KeyError):
+            platform_driver_agent.scrape_all("campus/missing")
+
+        assert set(platform_driver_agent._stats.devices) == {"campus/building1/"}
+        device_stats = platform_driver_agent.get_driver_stats(path="campus/building1/")
+        assert device_stats["campus/building1/"]["rpc"]["count"] == 1
+
+
 def test_set_override_off_should_raise_override_error():
     with pytest.raises(OverrideError):
         with pdriver() as platform_driver_agent:
@@ -149,6 +558,214 @@ def test_clear_overrides():
         assert len(platform_driver_agent._override_patterns) == 0
 
 
+def test_open_publish_batches_should_be_published_on_stop():
+    with pdriver() as platform_driver_agent:
+        published = []
+        batcher = platform_driver_agent._publish_batcher
+        batcher._publish = lambda topic, headers, message: published.append((topic, message))
+        batcher.enabled = True
+        batcher.window = 60.0
+        batcher.add("campus/building1/", 0, [{"temp": 72.0}, {}], "2026-10-18T00:00:00")
+
+        platform_driver_agent._flush_publishes_on_stop(None)
+
+        assert published == [("platform_driver/batch", {"campus/building1/": [{"temp": 72.0}, {}]})]
+        assert batcher.pending() == 0
+
+
+def test_override_changes_should_be_persisted_in_one_write():
+    with pdriver(override_interval_events={}) as platform_driver_agent:
+        for i in range(20):
+            platform_driver_agent.set_override_on(f"campus/building{i}/*", failsafe_revert=False)
+        platform_driver_agent.set_override_off("campus/building3/*")
+
+        platform_driver_agent.vip.config.set.assert_not_called()
+        event = platform_driver_agent._override_persist_event
+        assert event is not None
+
+        platform_driver_agent._flush_overrides_on_stop(None)
+
+        platform_driver_agent.vip.config.set.assert_called_once()
+        name, contents = platform_driver_agent.vip.config.set.call_args[0]
+        assert name == "override_patterns"
+        assert len(json.loads(contents)) == 19
+        event.cancel.assert_called()
+        assert platform_driver_agent._override_persist_event is None
+
+
+def test_extending_override_should_move_its_deadline():
+    with pdriver(override_interval_events={}) as platform_driver_agent:
+        platform_driver_agent.set_override_on("campus/building1/*", duration=10,
+                                              failsafe_revert=False)
+        first = platform_driver_agent._override_expiry.deadline("campus/building1/*")
+
+        platform_driver_agent.set_override_on("campus/building1/*", duration=60,
+                                              failsafe_revert=False)
+
+        assert platform_driver_agent._override_expiry.deadline("campus/building1/*") > first
+        assert len(platform_driver_agent._override_expiry) == 1
+        assert platform_driver_agent._override_interval_events["campus/building1/*"] == \
+            platform_driver_agent._override_expiry.deadline("campus/building1/*")
+
+        platform_driver_agent.set_override_off("campus/building1/*")
+        assert "campus/building1/*" not in platform_driver_agent._override_expiry
+
+
+def test_heart_beat_should_time_out_and_back_off_failing_devices():
+    with pdriver() as platform_driver_agent:
+        platform_driver_agent.heartbeat_timeout = 0.05
+        platform_driver_agent.heartbeat_concurrency = 2
+        devices = {}
+        for name in ("ahu1", "ahu2", "slow", "broken"):
+            topic = f"campus/building2/{name}"
+            devices[name] = MockedInstance(topic)
+            devices[name].heart_beat_point = "Heartbeat"
+            platform_driver_agent._register_instance(topic, devices[name])
+
+        start = time.perf_counter()
+        result = platform_driver_agent.heart_beat()
+
+        assert time.perf_counter() - start < 0.5
+        assert result == {
+            "sent": 2,
+            "failed": ["campus/building2/broken", "campus/building2/slow"],
+            "skipped": []
+        }
+        assert devices["ahu1"].heart_beats == 1
+        assert devices["ahu1"].priority_writes == [True]
+        assert devices["broken"].stats.heartbeat_failures == 1
+
+        result = platform_driver_agent.heart_beat()
+        assert result["skipped"] == ["campus/building2/broken", "campus/building2/slow"]
+        assert devices["ahu1"].heart_beats == 2
+        stats = platform_driver_agent.get_driver_stats("campus/building2/ahu1")
+        assert stats["campus/building2/ahu1"]["heartbeat"]["count"] == 2
+
+
+def test_breaker_rpcs_should_report_and_reset_open_circuits():
+    with pdriver() as platform_driver_agent:
+        platform_driver_agent._register_instance("campus/building2/ahu1",
+                                                 MockedInstance("campus/building2/ahu1"))
+        breaker = platform_driver_agent.instances["campus/building2/ahu1"].breaker
+        for _ in range(platform_driver_agent.scrape_breaker_threshold):
+            breaker.record_failure(60)
+
+        status = platform_driver_agent.get_breaker_status()
+        assert list(status) == ["campus/building2/ahu1"]
+        assert status["campus/building2/ahu1"]["state"] == "open"
+        assert platform_driver_agent.get_breaker_status(
+            pattern="campus/*")["campus/building1/"]["state"] == "closed"
+
+        assert platform_driver_agent.reset_breaker("campus/building2/ahu1") == [
+            "campus/building2/ahu1"
+        ]
+        assert platform_driver_agent.get_breaker_status() == {}
+
+
+def test_adjust_scrape_intervals_should_follow_group_scrape_durations():
+    with pdriver() as platform_driver_agent:
+        platform_driver_agent._interval_controller.max_interval = 2.0
+        devices = []
+        for i in range(10):
+            topic = f"campus/building2/vav{i}"
+            device = MockedInstance(topic)
+            device.group = 1
+            device.time_slot = platform_driver_agent._slot_allocator.allocate(1, topic)
+            platform_driver_agent._register_instance(topic, device)
+            device.stats.scrape.record(0.5)
+            devices.append(device)
+
+        assert platform_driver_agent._adjust_scrape_intervals() == {1: pytest.approx(0.6)}
+        assert all(device.driver_scrape_interval == pytest.approx(0.6) for device in devices)
+        assert platform_driver_agent._adjust_scrape_intervals() == {}
+
+        # Ten slots of 60 second devices cannot be spaced more than 6 seconds apart.
+        for device in devices:
+            device.stats.scrape.record(30.0)
+        platform_driver_agent._interval_controller.max_interval = 100.0
+        assert platform_driver_agent._adjust_scrape_intervals() == {1: pytest.approx(6.0)}
+        assert platform_driver_agent.get_driver_stats()["scrape_intervals"][1] == pytest.approx(6.0)
+
+
+def test_get_point_should_read_through_value_cache():
+    with pdriver() as platform_driver_agent:
+        device = platform_driver_agent.instances["campus/building1/"]
+        platform_driver_agent._value_cache.resize(10)
+        platform_driver_agent._value_cache.store("campus/building1/", {"temp": 68.0})
+
+        assert platform_driver_agent.get_point("campus/building1/", "temp", max_age=60) == 68.0
+        assert platform_driver_agent.get_point("campus/building1/", "temp") == 72.0
+        assert platform_driver_agent.get_point("campus/building1/", "humidity", max_age=60) == 72.0
+        assert device.reads == ["temp", "humidity"]
+
+        device.config = {"cache_max_age": 60}
+        assert platform_driver_agent.get_point("campus/building1/", "temp") == 68.0
+
+
+def test_get_multiple_points_should_only_read_uncached_points():
+    with pdriver() as platform_driver_agent:
+        device = MockedInstance("campus/building1/ahu1")
+        platform_driver_agent._register_instance("campus/building1/ahu1", device)
+        platform_driver_agent._value_cache.resize(10)
+        platform_driver_agent._value_cache.store("campus/building1/ahu1", {"temp": 68.0})
+
+        results, errors = platform_driver_agent.get_multiple_points("campus/building1/ahu1",
+                                                                    ["temp", "humidity"],
+                                                                    max_age=60)
+
+        assert results["campus/building1/ahu1/temp"] == 68.0
+        assert len(results) == 2
+        assert errors == {}
+        assert device.reads == ["humidity"]
+
+
+def test_stop_driver_should_evict_cached_values():
+    with pdriver() as platform_driver_agent:
+        platform_driver_agent._value_cache.resize(10)
+        platform_driver_agent._value_cache.store("campus/building1/", {"temp": 68.0})
+        platform_driver_agent._value_cache.invalidate("campus/building1/", ["humidity"])
+
+        platform_driver_agent.stop_driver("campus/building1/")
+
+        assert "campus/building1/" not in platform_driver_agent._value_cache
+        assert platform_driver_agent._value_cache._generations == {}
+
+
+def test_subtree_rpcs_should_only_visit_devices_below_prefix():
+    with pdriver() as platform_driver_agent:
+        for topic in ("Campus/Building2/ahu1", "campus/building2/broken", "campus/building20/ahu1"):
+            platform_driver_agent._register_instance(topic, MockedInstance(topic))
+        platform_driver_agent._add_override_coverage("campus/building2/*",
+                                                     "campus/building2/broken")
+
+        assert platform_driver_agent.list_devices("CAMPUS/building2") == [
+            "Campus/Building2/ahu1", "campus/building2/broken"
+        ]
+        assert len(platform_driver_agent.list_devices()) == 4
+
+        scraped = platform_driver_agent.scrape_subtree("campus/building2/")
+        assert list(scraped["results"]) == ["Campus/Building2/ahu1"]
+        assert list(scraped["errors"]) == ["campus/building2/broken"]
+
+        reverted = platform_driver_agent.revert_subtree("campus/building2")
+        assert list(reverted["results"]) == ["Campus/Building2/ahu1"]
+        assert "OverrideError" in reverted["errors"]["campus/building2/broken"]
+
+
+def test_rpc_paths_should_resolve_case_insensitively():
+    with pdriver() as platform_driver_agent:
+        platform_driver_agent._register_instance("Campus/Building2/AHU1",
+                                                 MockedInstance("Campus/Building2/AHU1"))
+        platform_driver_agent._add_override_coverage("Campus/*", "Campus/Building2/AHU1")
+
+        assert platform_driver_agent.scrape_all("campus/building2/ahu1") == {"temp": 72.0}
+        with pytest.raises(OverrideError):
+            platform_driver_agent.set_point("campus/building2/ahu1", "temp", 70.0)
+
+        platform_driver_agent.stop_driver("CAMPUS/building2/ahu1")
+        assert "Campus/Building2/AHU1" not in platform_driver_agent.instances
+
+
 @contextlib.contextmanager
 def pdriver(override_patterns: set = set(),
             override_interval_events: dict = {},
@@ -170,7 +787,7 @@ def pdriver(override_patterns: set = set(),
         platform_driver_agent = PlatformDriverAgent(driver_config)
 
     platform_driver_agent._override_patterns = override_patterns
-    platform_driver_agent.instances = {"campus/building1/": MockedInstance()}
+    platform_driver_agent._register_instance("campus/building1/", MockedInstance())
     platform_driver_agent.core.spawn_return_value = None
     platform_driver_agent._override_interval_events = override_interval_events
     platform_driver_agent._cancel_override_events_return_value = None
@@ -190,7 +807,86 @@ def pdriver(override_patterns: set = set(),
         platform_driver_agent._override_patterns.clear()
 
 
+class BulkInterface:
+    """Interface writing many points in one transaction."""
+
+    def set_multiple_points(self, path, point_names_values, **kwargs):
+        raise NotImplementedError()
+
+
 class MockedInstance:
+    active = 0
+    max_active = 0
+
+    def __init__(self, device_path="campus/building1/"):
+        self.device_path = device_path
+        self.cov_values = []
+        self.written = []
+        self.group = 0
+        self.time_slot = 0
+        self.config = {}
+        self.interval = 60
+        self.publish_types_updated = False
+        self.reads = []
+        self.heart_beat_point = None
+        self.heart_beats = 0
+        self.priority_writes = []
+
+    def update_publish_types(self,
+                             publish_depth_first_all,
+                             publish_breadth_first_all,
+                             publish_depth_first,
+                             publish_breadth_first,
+                             publish_deadband=None,
+                             publish_full_interval=10):
+        self.publish_types_updated = True
+        self.publish_deadband = publish_deadband
+
+    def update_scrape_schedule(self, time_slot, driver_scrape_interval, group,
+                               group_offset_interval):
+        self.time_slot = time_slot
+        self.group = group
+        self.driver_scrape_interval = driver_scrape_interval
+
+    def scrape_all(self):
+        if self.device_path.endswith("broken"):
+            raise RuntimeError("device offline")
+        return {"temp": 72.0}
+
+    def heart_beat(self):
+        if self.device_path.endswith("broken"):
+            raise RuntimeError("device offline")
+        if self.device_path.endswith("slow"):
+            gevent.sleep(1.0)
+        self.heart_beats += 1
+        self.priority_writes.append(in_priority_lane())
+
+    def get_point(self, point_name, **kwargs):
+        self.reads.append(point_name)
+        return 72.0
+
+    def get_multiple_points(self, point_names, **kwargs):
+        self.reads.extend(point_names)
+        MockedInstance.active += 1
+        MockedInstance.max_active = max(MockedInstance.max_active, MockedInstance.active)
+        gevent.sleep(0.01)
+        MockedInstance.active -= 1
+        return {name: 72.0 for name in point_names}, {}
+
+    def set_point(self, point_name, value, **kwargs):
+        self.written.append((point_name, value))
+        self.priority_writes.append(in_priority_lane())
+        return value
+
+    def set_multiple_points(self, point_names_values, **kwargs):
+        self.written.extend(point_names_values)
+        self.priority_writes.append(in_priority_lane())
+        return {}
 
     def revert_all(self):
         pass
+
+    def publish_cov_value(self, point_name, point_values):
+        if point_name == "fails":
+            raise RuntimeError("publish failed")
+        self.cov_values.append((point_name, point_values))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+
+from platform_driver.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def run_cycles(breaker, cycles, fail=True, interval=60):
+    allowed = 0
+    for _ in range(cycles):
+        if breaker.allow():
+            allowed += 1
+            if fail:
+                breaker.record_failure(interval)
+            else:
+                breaker.record_success()
+    return allowed
+
+
+def test_breaker_should_open_after_threshold_and_back_off_exponentially():
+    breaker = CircuitBreaker(threshold=3)
+
+    assert run_cycles(breaker, 3) == 3
+    assert breaker.state == OPEN
+
+    # Skip 1, probe, skip 3, probe, skip 7, probe.
+    assert [breaker.allow() for _ in range(2)] == [False, True]
+    assert breaker.state == HALF_OPEN
+    breaker.record_failure(60)
+    assert [breaker.allow() for _ in range(4)] == [False, False, False, True]
+    breaker.record_failure(60)
+    assert breaker.as_dict()["scrapes_until_probe"] == 7
+    assert breaker.as_dict()["skipped"] == 4
+
+
+def test_breaker_should_close_after_successful_probe():
+    breaker = CircuitBreaker(threshold=1)
+    run_cycles(breaker, 1)
+
+    assert not breaker.allow()
+    assert breaker.allow()
+    breaker.record_success()
+
+    assert breaker.state == CLOSED
+    assert breaker.trips == 0
+    assert run_cycles(breaker, 5, fail=False) == 5
+
+
+def test_breaker_backoff_should_be_capped_by_max_backoff():
+    breaker = CircuitBreaker(threshold=1, max_backoff=300.0)
+    for _ in range(10):
+        run_cycles(breaker, 1000)
+
+    assert breaker.skip_remaining <= 300 // 60
+
+
+def test_disabled_breaker_should_never_open():
+    breaker = CircuitBreaker(threshold=0)
+
+    assert run_cycles(breaker, 100) == 100
+    assert breaker.state == CLOSED
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+
+from unittest import mock
+
+from platform_driver.cache import ValueCache
+
+
+def test_lookup_should_return_fresh_values_only():
+    cache = ValueCache(10)
+    with mock.patch("platform_driver.cache.time.monotonic", return_value=100.0):
+        cache.store("campus/building1/ahu1", {"temp": 72.0, "fan": 1})
+
+    with mock.patch("platform_driver.cache.time.monotonic", return_value=105.0):
+        assert cache.lookup("campus/building1/ahu1", ["temp", "missing"], 10) == {"temp": 72.0}
+        assert cache.lookup("campus/building1/ahu1", ["temp"], 2) == {}
+        assert cache.lookup("campus/building1/ahu1", ["temp"], 0) == {}
+    assert cache.hits == 1
+    assert cache.misses == 3
+
+
+def test_store_should_evict_least_recently_scraped_device():
+    cache = ValueCache(2)
+    cache.store("a", {"p": 1})
+    cache.store("b", {"p": 2})
+    cache.store("a", {"p": 3})
+    cache.store("c", {"p": 4})
+
+    assert "b" not in cache
+    assert len(cache) == 2
+
+    cache.resize(1)
+    assert "a" not in cache
+    assert "c" in cache
+
+
+def test_invalidate_should_drop_points_or_device():
+    cache = ValueCache(10)
+    cache.store("a", {"p": 1, "q": 2})
+
+    cache.invalidate("a", ["p"])
+    assert cache.lookup("a", ["p", "q"], 60) == {"q": 2}
+
+    cache.invalidate("a")
+    assert "a" not in cache
+
+
+def test_store_should_drop_scrapes_that_began_before_an_invalidation():
+    cache = ValueCache(10)
+    generation = cache.generation("a")
+
+    cache.invalidate("a", ["p"])
+    cache.store("a", {"p": 1}, generation=generation)
+    assert "a" not in cache
+
+    cache.store("a", {"p": 2}, generation=cache.generation("a"))
+    assert cache.lookup("a", ["p"], 60) == {"p": 2}
+
+
+def test_remove_should_forget_values_and_generation():
+    cache = ValueCache(10)
+    cache.store("a", {"p": 1})
+    cache.invalidate("a", ["q"])
+
+    cache.remove("a")
+    assert "a" not in cache
+    assert cache.generation("a") == 0
+    assert cache._generations == {}
+
+
+def test_disabled_cache_should_not_store():
+    cache = ValueCache(0)
+    cache.store("a", {"p": 1})
+
+    assert not cache.enabled
+    assert len(cache) == 0
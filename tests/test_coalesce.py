@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+
+import gevent
+import pytest
+from volttron.driver.base.interfaces import BaseInterface, DriverInterfaceError
+
+from platform_driver.coalesce import WriteCoalescer
+
+
+class BulkInterface:
+    """Interface writing many points in one transaction."""
+
+    def set_multiple_points(self, path, point_names_values, **kwargs):
+        raise NotImplementedError()
+
+
+class PointInterface(BaseInterface):
+    """Interface with the default set_multiple_points calling set_point for every point."""
+    configure = get_point = set_point = scrape_all = revert_all = revert_point = None
+
+
+class FakeDriver:
+
+    def __init__(self, interface=None):
+        self.interface = interface or BulkInterface()
+        self.transactions = []
+        self.reads = []
+        self.values = {}
+
+    def set_point(self, point_name, value):
+        if point_name == "readonly":
+            raise ValueError("read only")
+        self.transactions.append([(point_name, value)])
+        self.values[point_name] = value + 0.5
+        return value + 0.5
+
+    def set_multiple_points(self, point_names_values):
+        self.transactions.append(list(point_names_values))
+        for point_name, value in point_names_values:
+            self.values[point_name] = value + 0.5
+        return {
+            "campus/building1/ahu1/" + point_name: "ValueError('read only')"
+            for point_name, _ in point_names_values if point_name == "readonly"
+        }
+
+    def get_multiple_points(self, point_names):
+        self.reads.append(list(point_names))
+        return {"campus/building1/ahu1/" + point: self.values[point] for point in point_names}, {}
+
+
+def write_all(coalescer, writes):
+    greenlets = [
+        gevent.spawn(coalescer.set_point, "campus/building1/ahu1", point_name, value)
+        for point_name, value in writes
+    ]
+    gevent.joinall(greenlets)
+    return greenlets
+
+
+def test_burst_should_be_written_in_one_transaction_and_read_back():
+    driver = FakeDriver()
+    coalescer = WriteCoalescer(lambda path: driver, window=0.01)
+
+    greenlets = write_all(coalescer, [("a", 1), ("readonly", 2), ("b", 3), ("a", 4)])
+
+    assert driver.transactions == [[("a", 1), ("readonly", 2), ("b", 3), ("a", 4)]]
+    assert driver.reads == [["a", "b"]]
+    assert greenlets[2].value == 3.5
+    assert isinstance(greenlets[1].exception, DriverInterfaceError)
+    # The write and the read back are two transactions.
+    assert coalescer.status()["transactions"] == 2
+    assert coalescer.status()["writes_per_transaction"] == 2
+
+
+def test_duplicate_point_writes_should_each_get_their_own_result():
+    driver = FakeDriver()
+    coalescer = WriteCoalescer(lambda path: driver, window=0.01)
+
+    greenlets = write_all(coalescer, [("a", 1), ("b", 2), ("a", 4)])
+
+    assert driver.transactions == [[("a", 1), ("b", 2), ("a", 4)]]
+    # The first write of a was overwritten in the same transaction, the read back is the second's.
+    assert [greenlet.value for greenlet in greenlets] == [1, 2.5, 4.5]
+
+
+def test_burst_should_be_written_point_by_point_without_bulk_interface():
+    driver = FakeDriver(PointInterface())
+    coalescer = WriteCoalescer(lambda path: driver, window=0.01)
+
+    greenlets = write_all(coalescer, [("a", 1), ("readonly", 2), ("b", 3)])
+
+    assert driver.transactions == [[("a", 1)], [("b", 3)]]
+    assert driver.reads == []
+    assert [greenlets[0].value, greenlets[2].value] == [1.5, 3.5]
+    assert isinstance(greenlets[1].exception, ValueError)
+    assert coalescer.status()["transactions"] == 3
+
+
+def test_flush_should_write_through_current_driver():
+    drivers = {"campus/building1/ahu1": FakeDriver()}
+    coalescer = WriteCoalescer(drivers.__getitem__, window=0.01)
+
+    writer = gevent.spawn(coalescer.set_point, "campus/building1/ahu1", "a", 1)
+    gevent.sleep(0)
+    replaced = drivers["campus/building1/ahu1"] = FakeDriver()
+    writer.join()
+
+    assert replaced.transactions == [[("a", 1)]]
+
+    writer = gevent.spawn(coalescer.set_point, "campus/building1/ahu1", "a", 1)
+    gevent.sleep(0)
+    del drivers["campus/building1/ahu1"]
+    writer.join()
+
+    assert isinstance(writer.exception, KeyError)
+
+
+def test_single_write_should_use_set_point():
+    driver = FakeDriver()
+    coalescer = WriteCoalescer(lambda path: driver, window=0.01)
+
+    greenlets = write_all(coalescer, [("a", 1)])
+
+    assert driver.transactions == [[("a", 1)]]
+    assert greenlets[0].value == 1.5
+
+
+def test_size_limit_should_close_window_early():
+    driver = FakeDriver()
+    coalescer = WriteCoalescer(lambda path: driver, window=10.0, max_size=2)
+
+    with gevent.Timeout(1.0):
+        write_all(coalescer, [("a", 1), ("b", 2), ("c", 3), ("d", 4)])
+
+    assert driver.transactions == [[("a", 1), ("b", 2)], [("c", 3), ("d", 4)]]
+    assert coalescer.pending() == 0
+
+
+def test_failed_check_should_fail_every_write():
+
+    def check(path):
+        raise RuntimeError("overridden")
+
+    driver = FakeDriver()
+    coalescer = WriteCoalescer(lambda path: driver, check, window=0.01)
+
+    greenlets = write_all(coalescer, [("a", 1), ("b", 2)])
+
+    assert driver.transactions == []
+    assert all(isinstance(greenlet.exception, RuntimeError) for greenlet in greenlets)
+    with pytest.raises(RuntimeError):
+        greenlets[0].get()
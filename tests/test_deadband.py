@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+
+import pytest
+
+from platform_driver.deadband import DeadbandFilter, parse_deadband
+
+
+def test_parse_deadband():
+    assert parse_deadband(None) is None
+    assert parse_deadband(0.5) == (0.5, 0.0)
+    assert parse_deadband({"percent": 2}) == (0.0, 2.0)
+    for spec in (-1, True, [1], {"relative": 1}):
+        with pytest.raises(ValueError):
+            parse_deadband(spec)
+
+
+def test_filter_should_publish_changes_past_larger_deadband():
+    publish_filter = DeadbandFilter(points={"temp": (1.0, 5.0), "fan": (0.0, 0.0)},
+                                    full_interval=0)
+
+    assert publish_filter.filter({"temp": 100.0, "fan": True, "name": "ahu"}) == {
+        "temp": 100.0,
+        "fan": True,
+        "name": "ahu"
+    }
+    # 5% of 100 is the larger deadband; points without a deadband are always published.
+    assert publish_filter.filter({"temp": 104.0, "fan": True, "name": "ahu"}) == {"name": "ahu"}
+    assert publish_filter.filter({"temp": 95.5, "fan": False, "name": "ahu"}) == {
+        "fan": False,
+        "name": "ahu"
+    }
+    assert publish_filter.filter({"temp": 94.9, "fan": False}) == {"temp": 94.9}
+    assert publish_filter.as_dict() == {"tracked_points": 2, "published": 7, "suppressed": 4}
+
+
+def test_filter_should_publish_everything_every_full_interval():
+    publish_filter = DeadbandFilter((1.0, 0.0), full_interval=3)
+    results = {"temp": 72.0}
+
+    assert [bool(publish_filter.filter(results)) for _ in range(7)] == [
+        True, False, False, True, False, False, True
+    ]
+    publish_filter.reset()
+    assert publish_filter.filter(results) == results
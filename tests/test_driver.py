@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+
+import datetime
+from unittest import mock
+
+import gevent
+import pytest
+from volttron.driver.base.driver import DriverAgent as BaseDriverAgent
+from volttron.driver.base.driver_locks import configure_publish_lock
+from volttron.utils import get_aware_utc_now
+
+from platform_driver.breaker import CLOSED, OPEN, CircuitBreaker
+from platform_driver.cache import ValueCache
+from platform_driver.driver import DriverAgent
+from platform_driver.encoding import ColumnarEncoder, PublishDecoder
+
+
+@pytest.fixture(scope="module", autouse=True)
+def publish_lock():
+    try:
+        configure_publish_lock()
+    except RuntimeError:
+        pass
+
+
+class FakeInterface:
+
+    def __init__(self, delay=0.0, fail=False, values=None):
+        self.delay = delay
+        self.fail = fail
+        self.values = values
+
+    def scrape_all(self):
+        gevent.sleep(self.delay)
+        if self.fail:
+            raise IOError("device offline")
+        if self.values:
+            return self.values.pop(0)
+        return {"temp": 72.0}
+
+    def get_register_names_view(self):
+        return {"temp": None}.keys()
+
+    def set_point(self, point_name, value):
+        return value
+
+
+def make_driver(interface, config=None, **kwargs):
+    parent = mock.MagicMock()
+    driver = DriverAgent(parent, config or {"interval": 1}, 0, 0.0, "campus/building1/ahu1", 0,
+                         0.0, True, False, False, False, **kwargs)
+    driver.interface = interface
+    driver.meta_data = {"temp": {"units": "F", "type": "float", "tz": ""}}
+    driver.device_name = "campus/building1/ahu1"
+    driver.all_path_depth = "devices/campus/building1/ahu1/all"
+    driver.core.schedule = mock.MagicMock()
+    return driver
+
+
+def test_scrape_and_publish_should_record_success_and_publish():
+    driver = make_driver(FakeInterface())
+
+    driver.periodic_read(get_aware_utc_now())
+
+    assert driver.stats.scrape.count == 1
+    assert driver.stats.scrape.errors == 0
+    assert driver.stats.publish.count == 1
+    driver.parent.scrape_ending.assert_called_once_with("campus/building1/ahu1")
+
+
+def test_scrape_and_publish_should_record_errors():
+    driver = make_driver(FakeInterface(fail=True))
+
+    driver.periodic_read(get_aware_utc_now())
+    driver.periodic_read(get_aware_utc_now())
+
+    assert driver.stats.scrape.errors == 2
+    assert driver.stats.consecutive_errors == 2
+    assert driver.stats.publish.count == 0
+    driver.parent.scrape_ending.assert_not_called()
+    assert driver.parent.scrape_failed.call_count == 2
+    driver.parent.scrape_failed.assert_called_with("campus/building1/ahu1")
+
+
+def test_empty_scrape_should_still_end_the_scrape():
+    driver = make_driver(FakeInterface(values=[{}]))
+    driver.base_topic = lambda point: "devices/campus/building1/ahu1/" + point
+
+    driver.periodic_read(get_aware_utc_now())
+
+    assert driver.stats.publish.count == 0
+    driver.parent.scrape_ending.assert_called_once_with("campus/building1/ahu1")
+
+
+def test_scrape_overlapping_a_write_should_not_cache_pre_write_values():
+    driver = make_driver(FakeInterface(delay=0.01))
+    driver.value_cache = ValueCache(10)
+
+    scrape = gevent.spawn(driver.periodic_read, get_aware_utc_now())
+    gevent.sleep(0)
+    driver.set_point("temp", 68.0)
+    scrape.join()
+
+    assert driver.stats.publish.count == 1
+    assert "campus/building1/ahu1" not in driver.value_cache
+
+
+def test_periodic_read_should_count_overruns():
+    driver = make_driver(FakeInterface(delay=0.02))
+
+    first = gevent.spawn(driver.periodic_read, get_aware_utc_now())
+    gevent.sleep(0.005)
+    second = gevent.spawn(driver.periodic_read, get_aware_utc_now())
+    gevent.joinall([first, second])
+
+    assert driver.stats.overruns == 1
+    assert not driver.scrape_in_progress
+
+
+def test_scrape_and_publish_should_hand_results_to_publish_batcher():
+    driver = make_driver(FakeInterface())
+    driver.publish_batcher = mock.MagicMock(enabled=True)
+
+    driver.periodic_read(get_aware_utc_now())
+
+    assert driver.stats.publish.count == 0
+    args = driver.publish_batcher.add.call_args[0]
+    assert args[:3] == ("campus/building1/ahu1", 0, [{"temp": 72.0}, driver.meta_data])
+
+
+def test_scrape_and_publish_should_encode_columnar_messages():
+    driver = make_driver(FakeInterface())
+    driver.encoder = ColumnarEncoder()
+
+    with mock.patch.object(BaseDriverAgent, "_publish_wrapper") as publish:
+        driver.periodic_read(get_aware_utc_now())
+
+    topic = publish.call_args[0][0]
+    headers, message = publish.call_args[1]["headers"], publish.call_args[1]["message"]
+    assert topic == "devices/campus/building1/ahu1/all"
+    assert headers["Encoding"] == "columnar"
+    assert PublishDecoder().decode(topic, headers, message) == [{"temp": 72.0}, driver.meta_data]
+
+
+def test_periodic_read_should_skip_scrapes_while_breaker_is_open():
+    interface = FakeInterface(fail=True)
+    driver = make_driver(interface)
+    driver.breaker = CircuitBreaker(threshold=2)
+
+    for _ in range(4):
+        driver.periodic_read(get_aware_utc_now())
+    assert driver.stats.scrape.count == 3
+    assert driver.breaker.state == OPEN
+    # Skipped scrapes are reported like failed ones.
+    assert driver.parent.scrape_failed.call_count == 4
+
+    interface.fail = False
+    for _ in range(4):
+        driver.periodic_read(get_aware_utc_now())
+    assert driver.breaker.state == CLOSED
+    assert driver.stats.scrape.errors == 3
+
+
+def test_scrape_and_publish_should_only_publish_values_past_deadband():
+    values = [{"temp": 72.0, "mode": "cool"}, {"temp": 72.3, "mode": "cool"},
+              {"temp": 73.0, "mode": "cool"}, {"temp": 73.1, "mode": "heat"}]
+    driver = make_driver(FakeInterface(values=values), default_publish_deadband=0.5)
+
+    with mock.patch.object(BaseDriverAgent, "_publish_wrapper") as publish:
+        for _ in range(4):
+            driver.scrape_and_publish(get_aware_utc_now())
+
+    assert [call.kwargs["message"][0] for call in publish.call_args_list] == [{
+        "temp": 72.0,
+        "mode": "cool"
+    }, {
+        "temp": 73.0
+    }, {
+        "mode": "heat"
+    }]
+    assert driver.parent.scrape_ending.call_count == 4
+
+
+def test_deadband_rounds_should_keep_the_columnar_schema():
+    values = [{"temp": 72.0, "mode": "cool"}, {"temp": 73.0, "mode": "cool"},
+              {"temp": 73.1, "mode": "heat"}, {"temp": 74.0, "mode": "heat"},
+              {"temp": 74.1, "mode": "cool"}, {"temp": 75.0, "mode": "heat"}]
+    driver = make_driver(FakeInterface(values=list(values)), default_publish_deadband=0.5)
+    driver.meta_data = {"temp": {"units": "F"}, "mode": {"units": "Enum"}}
+    driver.encoder = ColumnarEncoder(header_interval=100)
+    decoder = PublishDecoder()
+
+    with mock.patch.object(BaseDriverAgent, "_publish_wrapper") as publish:
+        for _ in values:
+            driver.scrape_and_publish(get_aware_utc_now())
+
+    messages = [call.kwargs["message"] for call in publish.call_args_list]
+    assert [message["schema"] for message in messages] == [1] * 6
+    assert [("points" in message) for message in messages] == [True] + [False] * 5
+    assert [
+        decoder.decode(call.args[0], call.kwargs["headers"], call.kwargs["message"])[0]
+        for call in publish.call_args_list
+    ] == [{
+        "temp": 72.0,
+        "mode": "cool"
+    }, {
+        "temp": 73.0
+    }, {
+        "mode": "heat"
+    }, {
+        "temp": 74.0
+    }, {
+        "mode": "cool"
+    }, {
+        "temp": 75.0,
+        "mode": "heat"
+    }]
+
+
+def test_update_publish_types_should_apply_device_deadband_settings():
+    driver = make_driver(FakeInterface(), {
+        "interval": 1,
+        "publish_deadband_points": {
+            "temp": {
+                "percent": 1
+            }
+        },
+        "publish_full_interval": 5
+    })
+    assert driver.publish_filter.settings == (None, {"temp": (0.0, 1.0)}, 5)
+
+    publish_filter = driver.publish_filter
+    driver.update_publish_types(True, False, False, False, publish_deadband=2.0)
+    assert driver.publish_filter.settings == ((2.0, 0.0), {"temp": (0.0, 1.0)}, 5)
+
+    driver.update_publish_types(True, False, False, False, publish_deadband=2.0)
+    assert driver.publish_filter is not publish_filter
+    publish_filter = driver.publish_filter
+    driver.update_publish_types(True, False, False, False, publish_deadband=2.0)
+    assert driver.publish_filter is publish_filter
+
+    driver.config = {"interval": 1, "publish_deadband": "wide"}
+    driver.update_publish_types(True, False, False, False)
+    assert driver.publish_filter is None
+
+
+def make_lazy_driver(interface, lead=5.0):
+    driver = make_driver(None, {"interval": 60, "heart_beat_point": "heartbeat"})
+    driver.setup_lead = lead
+    driver.all_path_depth = None
+
+    def setup_device():
+        driver.interface = interface
+        driver.base_topic = lambda point: "devices/campus/building1/ahu1/" + point
+
+    driver.setup_device = mock.MagicMock(side_effect=setup_device)
+    return driver
+
+
+def test_starting_should_defer_setup_until_before_the_first_scrape():
+    driver = make_lazy_driver(FakeInterface())
+
+    driver.starting(None)
+
+    driver.setup_device.assert_not_called()
+    assert not driver.is_set_up
+    assert driver.heart_beat_point == "heartbeat"
+    (setup_at, setup), (read_at, read, _) = [c.args for c in driver.core.schedule.call_args_list]
+    assert setup == driver._deferred_setup
+    assert read == driver.periodic_read
+    assert read_at - setup_at == datetime.timedelta(seconds=5.0)
+
+    setup()
+
+    driver.setup_device.assert_called_once_with()
+    assert driver.is_set_up
+    assert driver.all_path_depth == "devices/campus/building1/ahu1/all"
+
+
+def test_first_call_should_set_up_a_lazy_driver_once():
+    driver = make_lazy_driver(FakeInterface())
+    driver.starting(None)
+    setup_event = driver._setup_event
+
+    driver.periodic_read(get_aware_utc_now())
+    driver.scrape_all()
+
+    driver.setup_device.assert_called_once_with()
+    setup_event.cancel.assert_called_once_with()
+    assert driver.stats.scrape.count == 1
+    assert driver.stats.scrape.errors == 0
+
+
+def test_scrape_should_record_an_error_when_lazy_setup_fails():
+    driver = make_lazy_driver(FakeInterface())
+    driver.setup_device.side_effect = ValueError("no such module")
+
+    driver.periodic_read(get_aware_utc_now())
+
+    assert driver.stats.scrape.errors == 1
+    assert not driver.is_set_up
+    driver.parent.scrape_starting.assert_not_called()
+
+
+def test_failed_lazy_setup_should_open_the_breaker():
+    driver = make_lazy_driver(FakeInterface())
+    driver.setup_device.side_effect = ValueError("unreachable")
+    driver.breaker = CircuitBreaker(threshold=2)
+
+    for _ in range(3):
+        driver.periodic_read(get_aware_utc_now())
+
+    assert driver.breaker.state == OPEN
+    assert driver.breaker.skipped == 1
+    assert driver.setup_device.call_count == 2
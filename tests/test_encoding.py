@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+
+import pytest
+
+from platform_driver.encoding import ColumnarEncoder, PublishDecoder
+from platform_driver.publish import PublishBatcher
+
+META = {"temp": {"units": "F"}, "fan": {"units": "Enum"}}
+COLUMNAR = {"Encoding": "columnar"}
+
+
+def test_columnar_round_trip_should_only_send_schema_when_needed():
+    encoder = ColumnarEncoder(header_interval=3)
+    decoder = PublishDecoder()
+
+    messages = [encoder.encode({"temp": 70.0 + i, "fan": 1}, META) for i in range(4)]
+
+    assert [("points" in message) for message in messages] == [True, False, False, True]
+    assert messages[1] == {"schema": 1, "values": [71.0, 1]}
+    for i, message in enumerate(messages):
+        assert decoder.decode("devices/ahu1/all", COLUMNAR, message) == [{
+            "temp": 70.0 + i,
+            "fan": 1
+        }, META]
+
+
+def test_changed_points_or_meta_should_resend_schema():
+    encoder = ColumnarEncoder()
+    encoder.encode({"temp": 70.0, "fan": 1}, META)
+
+    fewer = encoder.encode({"temp": 70.0}, META)
+    assert fewer["schema"] == 2
+    assert fewer["points"] == ["temp"]
+
+    changed_meta = encoder.encode({"temp": 70.0}, {"temp": {"units": "C"}})
+    assert changed_meta["schema"] == 2
+    assert changed_meta["meta"] == {"temp": {"units": "C"}}
+
+
+def test_subsets_of_columns_should_keep_the_schema():
+    encoder = ColumnarEncoder()
+    decoder = PublishDecoder()
+    rounds = [{"temp": 70.0, "fan": 1}, {"fan": 0}, {"temp": 71.0}, {"temp": 72.0, "fan": 1}]
+
+    messages = [encoder.encode(results, META, META) for results in rounds]
+
+    assert [message["schema"] for message in messages] == [1, 1, 1, 1]
+    assert [("points" in message) for message in messages] == [True, False, False, False]
+    assert messages[1] == {"schema": 1, "values": [0], "present": "2"}
+    assert "present" not in messages[3]
+    for results, message in zip(rounds, messages):
+        assert decoder.decode("devices/ahu1/all", COLUMNAR, message) == [results, META]
+
+
+def test_decoder_should_decode_columnar_batches():
+    published = []
+    batcher = PublishBatcher(lambda topic, headers, message: published.append((headers, message)),
+                             enabled=True,
+                             window=60.0,
+                             encoding="columnar")
+    encoders = {"ahu1": ColumnarEncoder(), "ahu2": ColumnarEncoder()}
+    decoder = PublishDecoder()
+
+    for i in range(2):
+        for device, encoder in encoders.items():
+            batcher.add(device, 0, encoder.encode({"temp": 70.0 + i, "fan": 1}, META), "now")
+        batcher.flush()
+
+    for i, (headers, message) in enumerate(published):
+        assert headers["Encoding"] == "columnar"
+        assert decoder.decode_batch("platform_driver/batch", headers, message) == {
+            "ahu1": [{"temp": 70.0 + i, "fan": 1}, META],
+            "ahu2": [{"temp": 70.0 + i, "fan": 1}, META]
+        }
+
+    # A late subscriber skips devices until their schema is repeated.
+    assert PublishDecoder().decode_batch("platform_driver/batch", *published[1]) == {}
+    json_batch = {"ahu1": [{"temp": 70.0}, META]}
+    assert decoder.decode_batch("platform_driver/batch", {}, json_batch) == json_batch
+
+
+def test_decoder_should_reject_unknown_schema_and_pass_json_through():
+    encoder = ColumnarEncoder()
+    decoder = PublishDecoder()
+    encoder.encode({"temp": 70.0}, META)
+
+    with pytest.raises(ValueError):
+        decoder.decode("devices/ahu1/all", COLUMNAR, encoder.encode({"temp": 71.0}, META))
+    assert decoder.decode("devices/ahu1/all", {}, [{"temp": 70.0}, META]) == [{
+        "temp": 70.0
+    }, META]
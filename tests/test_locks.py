@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+
+import gevent
+import pytest
+from gevent.lock import DummySemaphore
+from volttron.driver.base import driver_locks
+
+from platform_driver import locks
+from platform_driver.locks import PrioritySemaphore, in_priority_lane, priority_lane
+
+
+def test_priority_lane_should_nest():
+    assert not in_priority_lane()
+    with priority_lane():
+        with priority_lane():
+            assert in_priority_lane()
+        assert in_priority_lane()
+        with priority_lane(False):
+            assert in_priority_lane()
+    assert not in_priority_lane()
+
+
+def test_priority_lane_should_be_greenlet_local():
+    with priority_lane():
+        assert gevent.spawn(in_priority_lane).get() is False
+
+
+def test_priority_waiters_should_be_served_before_queued_scrapes():
+    lock = PrioritySemaphore(1)
+    order = []
+
+    def use(name, priority):
+        with priority_lane(priority):
+            with lock:
+                order.append(name)
+                gevent.sleep(0.01)
+
+    lock.acquire()
+    greenlets = [gevent.spawn(use, "scrape{}".format(i), False) for i in range(3)]
+    gevent.sleep(0)
+    greenlets.append(gevent.spawn(use, "write", True))
+    gevent.sleep(0)
+    assert lock.waiting() == {"priority": 1, "normal": 3}
+
+    lock.release()
+    gevent.joinall(greenlets)
+
+    assert order == ["write", "scrape0", "scrape1", "scrape2"]
+    assert lock.wait_stats["priority"].count == 1
+    assert lock.wait_stats["normal"].count == 4
+    assert lock.waiting() == {"priority": 0, "normal": 0}
+
+
+def test_killed_waiter_should_leave_queue():
+    lock = PrioritySemaphore(1)
+    lock.acquire()
+    waiter = gevent.spawn(lock.acquire)
+    gevent.sleep(0)
+    waiter.kill()
+    assert lock.waiting() == {"priority": 0, "normal": 0}
+
+    lock.release()
+    assert lock.acquire()
+
+
+def test_configure_socket_lock_should_install_priority_semaphore(monkeypatch):
+    monkeypatch.setattr(driver_locks, "_socket_lock", None)
+    locks.configure_socket_lock(2)
+
+    with driver_locks.socket_lock():
+        status = locks.socket_lock_status()
+    assert status["waiting"] == {"priority": 0, "normal": 0}
+    assert status["wait"]["normal"]["count"] == 1
+
+    with pytest.raises(RuntimeError):
+        locks.configure_socket_lock(2)
+
+
+def test_socket_lock_of_driver_base_should_use_installed_lock(monkeypatch):
+    # The contract with the driver base library configure_socket_lock relies on.
+    monkeypatch.setattr(driver_locks, "_socket_lock", None)
+    locks.configure_socket_lock(1)
+    lock = driver_locks._socket_lock
+    assert isinstance(lock, PrioritySemaphore)
+
+    def write():
+        with priority_lane():
+            with driver_locks.socket_lock():
+                pass
+
+    with driver_locks.socket_lock():
+        writer = gevent.spawn(write)
+        gevent.sleep(0)
+        assert lock.waiting() == {"priority": 1, "normal": 0}
+    writer.join()
+    assert lock.wait_stats["priority"].count == 1
+
+
+def test_configure_socket_lock_should_reject_unsupported_driver_base(monkeypatch):
+    monkeypatch.delattr(driver_locks, "_socket_lock")
+    with pytest.raises(RuntimeError, match="_socket_lock is missing"):
+        locks.configure_socket_lock(2)
+
+    # A library whose socket_lock no longer acquires the module global.
+    monkeypatch.setattr(driver_locks, "_socket_lock", None, raising=False)
+    monkeypatch.setattr(driver_locks, "socket_lock", lambda: DummySemaphore())
+    with pytest.raises(RuntimeError, match="does not use"):
+        locks.configure_socket_lock(2)
+    assert driver_locks._socket_lock is None
+
+
+def test_configure_socket_lock_without_limit_should_use_library_lock(monkeypatch):
+    monkeypatch.setattr(driver_locks, "_socket_lock", None)
+    locks.configure_socket_lock(0)
+
+    assert not isinstance(driver_locks._socket_lock, PrioritySemaphore)
+    assert locks.socket_lock_status() is None
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+
+import gevent
+
+from platform_driver.publish import PublishBatcher
+
+
+class Recorder:
+
+    def __init__(self):
+        self.published = []
+
+    def __call__(self, topic, headers, message):
+        self.published.append((topic, headers, dict(message)))
+
+
+def test_batch_should_publish_when_window_expires():
+    recorder = Recorder()
+    batcher = PublishBatcher(recorder, True, window=0.01)
+
+    batcher.add("campus/building1/ahu1", 0, [{"temp": 72.0}, {"temp": {}}], "sync")
+    batcher.add("campus/building1/ahu2", 0, [{"temp": 70.0}, {"temp": {}}], "sync")
+    assert recorder.published == []
+    gevent.sleep(0.05)
+
+    assert len(recorder.published) == 1
+    topic, headers, message = recorder.published[0]
+    assert topic == "platform_driver/batch"
+    assert headers["SynchronizedTimeStamp"] == "sync"
+    assert "Encoding" not in headers
+    assert message["campus/building1/ahu2"] == [{"temp": 70.0}, {"temp": {}}]
+    assert batcher.status()["results_per_message"] == 2
+
+
+def test_batch_should_publish_when_full_and_per_group():
+    recorder = Recorder()
+    batcher = PublishBatcher(recorder, True, window=60.0, max_size=2, by_group=True,
+                             encoding="columnar")
+
+    batcher.add("a", 0, {"schema": 1, "values": []}, "sync")
+    batcher.add("b", 1, {"schema": 1, "values": []}, "sync")
+    batcher.add("c", 0, {"schema": 1, "values": []}, "sync")
+
+    assert [(topic, list(message)) for topic, _, message in recorder.published] == [
+        ("platform_driver/batch/0", ["a", "c"])
+    ]
+    assert recorder.published[0][1]["Encoding"] == "columnar"
+    assert batcher.pending() == 1
+
+    batcher.flush()
+    gevent.sleep(0)
+    assert recorder.published[-1][0] == "platform_driver/batch/1"
+    assert batcher.status()["messages"] == 2
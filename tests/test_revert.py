@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+
+import gevent
+
+from platform_driver.locks import in_priority_lane
+from platform_driver.revert import RevertJob
+
+
+class Device:
+    active = 0
+    max_active = 0
+
+    def __init__(self, group=0, fail=False):
+        self.group = group
+        self.fail = fail
+        self.reverted_at = None
+        self.priority = None
+
+    def revert_all(self):
+        self.priority = in_priority_lane()
+        Device.active += 1
+        Device.max_active = max(Device.max_active, Device.active)
+        gevent.sleep(0.01)
+        Device.active -= 1
+        if self.fail:
+            raise RuntimeError("device offline")
+        self.reverted_at = len([d for d in DEVICES if d.reverted_at is not None])
+
+
+DEVICES = []
+
+
+def test_revert_job_should_bound_concurrency_and_report_failures():
+    DEVICES[:] = [Device(fail=(i == 3)) for i in range(8)]
+    job = RevertJob("campus/*", [(f"dev{i}", d) for i, d in enumerate(DEVICES)], concurrency=3)
+
+    assert job.status()["pending"] == 8
+    job.run()
+    status = job.status()
+
+    assert Device.max_active == 3
+    assert status["complete"]
+    assert status["done"] == 7
+    assert list(status["failed"]) == ["dev3"]
+    assert status["pending"] == 0
+    assert status["elapsed"] > 0
+    assert all(device.priority for device in DEVICES)
+
+
+def test_revert_job_should_revert_groups_in_order_when_staggered():
+    DEVICES[:] = [Device(group=1), Device(group=0), Device(group=1), Device(group=0)]
+    job = RevertJob("campus/*", [(f"dev{i}", d) for i, d in enumerate(DEVICES)],
+                    concurrency=1,
+                    stagger_interval=0.001)
+
+    job.run()
+
+    order = sorted(DEVICES, key=lambda d: d.reverted_at)
+    assert [d.group for d in order] == [0, 0, 1, 1]
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+
+from unittest import mock
+
+import gevent
+import pytest
+
+from platform_driver.scheduling import (
+    ExpiryScheduler,
+    ScrapeIntervalController,
+    SlotAllocator,
+    StartupScheduler,
+)
+
+
+def test_slot_allocator_should_reuse_lowest_freed_slot():
+    allocator = SlotAllocator()
+    slots = [allocator.allocate(0, f"dev{i}") for i in range(5)]
+    allocator.release(0, 3)
+    allocator.release(0, 1)
+
+    assert slots == [0, 1, 2, 3, 4]
+    assert allocator.allocate(0, "new1") == 1
+    assert allocator.allocate(0, "new2") == 3
+    assert allocator.allocate(0, "new3") == 5
+    assert allocator.allocate(1, "other") == 0
+
+
+def test_slot_allocator_should_shrink_when_highest_slot_is_released():
+    allocator = SlotAllocator()
+    for i in range(3):
+        allocator.allocate(0, f"dev{i}")
+    allocator.release(0, 2)
+
+    assert allocator.fragmentation(0) == 0.0
+    assert allocator.allocate(0, "dev3") == 2
+
+
+def test_slot_allocator_compact_should_keep_order_and_only_report_moves():
+    allocator = SlotAllocator()
+    for i in range(6):
+        allocator.allocate(0, f"dev{i}")
+    for slot in (0, 2, 3):
+        allocator.release(0, slot)
+
+    assert allocator.fragmentation(0) == 0.5
+    assert allocator.compact(0) == [("dev1", 0), ("dev4", 1), ("dev5", 2)]
+    assert allocator.fragmentation(0) == 0.0
+    assert allocator.allocate(0, "dev6") == 3
+    assert allocator.count(0) == 4
+
+
+def test_startup_scheduler_should_start_immediately_when_not_staged():
+    started = []
+    scheduler = StartupScheduler(lambda topic, driver: started.append(topic))
+    scheduler.submit("dev0", None)
+    scheduler.submit("dev1", None)
+
+    assert started == ["dev0", "dev1"]
+    assert scheduler.status()["awaiting_first_scrape"] == 2
+
+    scheduler.scrape_completed("dev0")
+    scheduler.scrape_completed("dev1")
+    status = scheduler.status()
+    assert status["awaiting_first_scrape"] == 0
+    assert status["time_to_first_complete_scrape"] is not None
+
+
+def test_failed_first_scrapes_should_still_complete_the_ramp():
+    scheduler = StartupScheduler(lambda topic, driver: None)
+    scheduler.submit("dev0", None)
+    scheduler.submit("dev1", None)
+
+    scheduler.scrape_completed("dev0", error=True)
+    scheduler.scrape_completed("dev0")
+    assert scheduler.status()["time_to_first_complete_scrape"] is None
+    scheduler.scrape_completed("dev1")
+
+    status = scheduler.status()
+    assert status["first_scrape_failed"] == 1
+    assert status["time_to_first_complete_scrape"] is not None
+
+
+def test_startup_scheduler_should_start_drivers_in_waves():
+    started = []
+    scheduler = StartupScheduler(lambda topic, driver: started.append(topic),
+                                 wave_size=2,
+                                 wave_interval=0.02)
+    for i in range(5):
+        scheduler.submit(f"dev{i}", None, group=1 if i % 2 else 0)
+    scheduler.cancel("dev4")
+    assert scheduler.status()["queued"] == 4
+
+    gevent.sleep(0.01)
+    assert started == ["dev0", "dev2"]
+
+    gevent.sleep(0.05)
+    assert started == ["dev0", "dev2", "dev1", "dev3"]
+    assert scheduler.status()["time_to_all_started"] is not None
+
+
+def test_startup_scheduler_should_end_waves_at_group_boundaries():
+    started = []
+    scheduler = StartupScheduler(lambda topic, driver: started.append(topic),
+                                 wave_interval=0.02,
+                                 by_group=True)
+    scheduler.submit("b", None, group=1)
+    scheduler.submit("a", None, group=0)
+    scheduler.submit("c", None, group=1)
+
+    gevent.sleep(0.01)
+    assert started == ["a"]
+
+    gevent.sleep(0.05)
+    assert started == ["a", "b", "c"]
+
+
+class FakeTimers:
+
+    def __init__(self):
+        self.now = 0
+        self.armed = []
+
+    def schedule(self, deadline, callback):
+        event = mock.Mock(deadline=deadline, callback=callback)
+        self.armed.append(event)
+        return event
+
+    def fire(self, now):
+        self.now = now
+        event = self.armed[-1]
+        event.callback()
+
+
+def test_expiry_scheduler_should_use_one_timer_for_the_earliest_deadline():
+    timers = FakeTimers()
+    expired = []
+    scheduler = ExpiryScheduler(timers.schedule, expired.append, lambda: timers.now)
+
+    scheduler.schedule("a", 10)
+    scheduler.schedule("b", 20)
+    # Extending deadlines does not touch the armed timer.
+    for deadline in range(11, 60):
+        scheduler.schedule("a", deadline)
+    assert [event.deadline for event in timers.armed] == [10]
+
+    scheduler.schedule("c", 5)
+    assert [event.deadline for event in timers.armed] == [10, 5]
+    timers.armed[0].cancel.assert_called_once()
+
+    timers.fire(5)
+    assert expired == ["c"]
+    assert timers.armed[-1].deadline == 20
+
+    scheduler.cancel("b")
+    timers.fire(20)
+    assert expired == ["c"]
+    assert timers.armed[-1].deadline == 59
+
+    timers.fire(59)
+    assert expired == ["c", "a"]
+    assert len(scheduler) == 0
+
+
+def test_expiry_scheduler_should_compact_stale_entries():
+    timers = FakeTimers()
+    scheduler = ExpiryScheduler(timers.schedule, lambda key: None, lambda: timers.now)
+    for deadline in range(1000):
+        scheduler.schedule("a", deadline + 1)
+
+    assert len(scheduler._heap) < 100
+    assert scheduler.deadline("a") == 1000
+
+
+def test_interval_controller_should_track_scrape_duration_within_bounds():
+    controller = ScrapeIntervalController(min_interval=0.01, max_interval=0.5, headroom=1.2)
+    durations = [0.1] * 9 + [5.0]
+
+    assert controller.recommend(0.02, durations) == pytest.approx(0.12)
+    # Within tolerance of the current spacing.
+    assert controller.recommend(0.115, durations) is None
+    assert controller.recommend(0.02, [1.0]) == 0.5
+    assert controller.recommend(0.02, [1.0], limit=0.3) == 0.3
+    assert controller.recommend(0.5, [0.001]) == 0.01
+    assert controller.recommend(0.5, []) is None
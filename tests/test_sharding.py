@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+
+import json
+import sys
+
+import pytest
+
+from platform_driver.sharding import (
+    ROUTE_ALL,
+    ROUTE_COV,
+    ROUTE_DEVICE,
+    ROUTE_EACH,
+    ROUTE_PATHS,
+    SHARD_BY_HASH,
+    ShardCoordinator,
+    ShardMap,
+    ShardWorkers,
+    agent_credentials,
+    merge_results,
+    merge_revert_status,
+    merge_sorted,
+    split_socket_limit,
+)
+
+
+class FakeWorkers:
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, identity, method, *args, **kwargs):
+        self.calls.append((identity, method) + args + ((kwargs, ) if kwargs else ()))
+        if "paths" in kwargs:
+            # Like a worker, fails every path it does not own.
+            paths = kwargs["paths"]
+            if paths is None:
+                paths = list(kwargs.get("point_names_values") or ())
+            owned = identity + "/"
+            return {
+                "results": {path: identity
+                            for path in paths if path.lower().startswith(owned)},
+                "errors": {path: "KeyError"
+                           for path in paths if not path.lower().startswith(owned)}
+            }
+        if method == "list_devices":
+            return [identity + "/device"]
+        if method == "heart_beat":
+            return {"sent": 1, "failed": [], "skipped": [identity]}
+        return identity
+
+
+def test_shard_map_should_keep_groups_together_and_balance_them():
+    shards = ShardMap(2)
+    assert [shards.assign("group0/d{}".format(i), 0)[0] for i in range(4)] == [0, 0, 0, 0]
+    assert shards.assign("group1/d0", 1) == (1, [])
+    assert shards.assign("group2/d0", 2) == (1, [])
+    assert shards.loads() == [4, 2]
+    assert shards.owner("GROUP1/D0") == 1
+
+    # Removing group 0 devices leaves shard 0 idle, group 2 is moved over.
+    for i in range(3):
+        shards.remove("group0/d{}".format(i))
+    assert shards.remove("group0/d3") == (0, [("group2/d0", 1, 0)])
+    assert shards.loads() == [1, 1]
+
+
+def test_shard_map_should_move_device_with_its_group():
+    shards = ShardMap(2)
+    shards.assign("a", 0)
+    shards.assign("b", 1)
+    assert shards.assign("b", 1) == (1, [])
+    assert shards.assign("b", 0) == (0, [])
+    assert shards.loads() == [2, 0]
+
+
+def test_shard_map_should_hash_topics_stably():
+    shards = ShardMap(4, SHARD_BY_HASH)
+    owners = {topic: shards.assign(topic)[0] for topic in ("campus/b{}".format(i) for i in range(200))}
+    assert all(load > 20 for load in shards.loads())
+
+    again = ShardMap(4, SHARD_BY_HASH)
+    assert {topic: again.assign(topic)[0] for topic in owners} == owners
+
+    with pytest.raises(ValueError):
+        ShardMap(2, "random")
+
+
+def test_merge_results():
+    assert merge_results([None, None]) is None
+    assert merge_results([{
+        "results": {
+            "a": 1
+        },
+        "errors": {},
+        "sent": 2,
+        "failed": ["x"]
+    }, None, {
+        "results": {
+            "b": 2
+        },
+        "errors": {
+            "c": "e"
+        },
+        "sent": 3,
+        "failed": ["x", "y"]
+    }]) == {
+        "results": {
+            "a": 1,
+            "b": 2
+        },
+        "errors": {
+            "c": "e"
+        },
+        "sent": 5,
+        "failed": ["x", "y"]
+    }
+
+
+def test_split_socket_limit_should_share_the_limit_between_workers():
+    assert split_socket_limit(None, 4) is None
+    assert split_socket_limit(0, 4) is None
+    assert split_socket_limit(1000, 4) == 250
+    assert split_socket_limit(10, 3) == 3
+    assert split_socket_limit(2, 4) == 1
+
+
+def test_agent_credentials_should_pass_the_keys_of_the_agent():
+
+    class Core:
+        publickey = "public"
+        secretkey = "secret"
+        serverkey = None
+
+    assert agent_credentials(Core()) == {"AGENT_PUBLICKEY": "public", "AGENT_SECRETKEY": "secret"}
+
+
+def test_workers_should_run_with_their_identity_and_the_coordinator_keys(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_UUID", "coordinator-uuid")
+    monkeypatch.setenv("AGENT_PUBLICKEY", "stale")
+    names = ("AGENT_UUID", "AGENT_VIP_IDENTITY", "AGENT_PUBLICKEY", "AGENT_SECRETKEY",
+             "PLATFORM_DRIVER_SHARD", "PLATFORM_DRIVER_COORDINATOR",
+             "PLATFORM_DRIVER_MAX_OPEN_SOCKETS")
+    script = ("import json, os, sys; "
+              "json.dump({{n: os.environ.get(n) for n in {!r}}}, open(sys.argv[1], 'w'))")
+    output = tmp_path / "env.json"
+    workers = ShardWorkers(["pd.shard0"],
+                           "pd",
+                           command=[sys.executable, "-c", script.format(names), str(output)],
+                           max_open_sockets=250,
+                           credentials={"AGENT_PUBLICKEY": "public", "AGENT_SECRETKEY": "secret"})
+
+    workers.start()
+    workers._processes[0].wait(timeout=30)
+
+    assert json.loads(output.read_text()) == {
+        "AGENT_UUID": None,
+        "AGENT_VIP_IDENTITY": "pd.shard0",
+        "AGENT_PUBLICKEY": "public",
+        "AGENT_SECRETKEY": "secret",
+        "PLATFORM_DRIVER_SHARD": "0",
+        "PLATFORM_DRIVER_COORDINATOR": "pd",
+        "PLATFORM_DRIVER_MAX_OPEN_SOCKETS": "250"
+    }
+    workers.stop()
+
+
+def test_coordinator_should_sync_devices_when_worker_is_ready():
+    workers = FakeWorkers()
+    coordinator = ShardCoordinator(workers, ["pd.shard0", "pd.shard1"])
+
+    coordinator.update_device("campus/ahu1", {"group": 0})
+    coordinator.update_device("campus/ahu2", {"group": 1})
+    coordinator.configure({"driver_scrape_interval": 0.1, "shard_workers": 2})
+    assert workers.calls == []
+
+    coordinator.shard_ready(1)
+    assert workers.calls == [("pd.shard1", "shard_configure", {
+        "driver_scrape_interval": 0.1
+    }), ("pd.shard1", "shard_update_devices", {
+        "campus/ahu2": {
+            "group": 1
+        }
+    })]
+
+    coordinator.remove_device("CAMPUS/AHU2")
+    assert workers.calls[-1] == ("pd.shard1", "shard_remove_devices", ["campus/ahu2"])
+    assert coordinator.status()["pd.shard1"] == {"ready": True, "devices": 0}
+
+
+def test_coordinator_should_move_groups_between_workers():
+    workers = FakeWorkers()
+    coordinator = ShardCoordinator(workers, ["pd.shard0", "pd.shard1"])
+    coordinator.shard_ready(0)
+    coordinator.shard_ready(1)
+    for topic, group in (("a1", 0), ("a2", 0), ("b1", 1), ("c1", 2)):
+        coordinator.update_device(topic, {"group": group})
+    workers.calls.clear()
+
+    coordinator.remove_device("a1")
+    coordinator.remove_device("a2")
+
+    assert workers.calls[-2:] == [("pd.shard1", "shard_remove_devices", ["c1"]),
+                                  ("pd.shard0", "shard_update_devices", {
+                                      "c1": {
+                                          "group": 2
+                                      }
+                                  })]
+
+
+def test_coordinator_should_route_calls():
+    workers = FakeWorkers()
+    coordinator = ShardCoordinator(workers, ["pd.shard0", "pd.shard1"])
+    coordinator.shard_ready(0)
+    coordinator.shard_ready(1)
+    coordinator.update_device("campus/ahu1", {"group": 0})
+    coordinator.update_device("campus/ahu2", {"group": 1})
+
+    assert coordinator.call("get_point", ROUTE_DEVICE, ("campus/ahu2", "temp"), {}) == "pd.shard1"
+    with pytest.raises(KeyError):
+        coordinator.call("get_point", ROUTE_DEVICE, ("campus/missing", "temp"), {})
+    assert coordinator.call("list_devices", ROUTE_ALL, (), {}) == [
+        "pd.shard0/device", "pd.shard1/device"
+    ]
+    assert coordinator.call("heart_beat", ROUTE_ALL, (), {})["sent"] == 2
+    assert coordinator.call("get_startup_status", ROUTE_EACH, (), {}) == {
+        "pd.shard0": "pd.shard0",
+        "pd.shard1": "pd.shard1"
+    }
+
+    workers.calls.clear()
+    coordinator.call("forward_bacnet_cov_values", ROUTE_COV,
+                     ([("campus/ahu1", "temp", {}), ("campus/ahu2", "temp", {}),
+                       ("campus/missing", "temp", {})], ), {})
+    assert workers.calls == [("pd.shard0", "forward_bacnet_cov_values", [("campus/ahu1", "temp", {})]),
+                             ("pd.shard1", "forward_bacnet_cov_values", [("campus/ahu2", "temp", {})])]
+
+
+def test_coordinator_should_split_bulk_calls_by_owner():
+    workers = FakeWorkers()
+    coordinator = ShardCoordinator(workers, ["pd.shard0", "pd.shard1"])
+    coordinator.shard_ready(0)
+    coordinator.shard_ready(1)
+    coordinator.update_device("pd.shard0/ahu1", {"group": 0})
+    coordinator.update_device("pd.shard1/ahu2", {"group": 1})
+    workers.calls.clear()
+
+    outcome = coordinator.call("scrape_many", ROUTE_PATHS, (), {
+        "paths": ["pd.shard0/ahu1", "PD.SHARD1/AHU2", "campus/missing"],
+        "pattern": None,
+        "concurrency": None
+    })
+
+    assert outcome == {
+        "results": {
+            "pd.shard0/ahu1": "pd.shard0",
+            "PD.SHARD1/AHU2": "pd.shard1"
+        },
+        "errors": {
+            "campus/missing": repr(KeyError("campus/missing"))
+        }
+    }
+    assert sorted(call[2]["paths"] for call in workers.calls) == [["PD.SHARD1/AHU2"],
+                                                                   ["pd.shard0/ahu1"]]
+
+    outcome = coordinator.call("set_multiple_points_bulk", ROUTE_PATHS, (), {
+        "point_names_values": {
+            "pd.shard0/ahu1": [("temp", 70)],
+            "pd.shard1/ahu2": [("temp", 72)]
+        },
+        "paths": None,
+        "pattern": None,
+        "concurrency": None
+    })
+
+    assert outcome == {
+        "results": {
+            "pd.shard0/ahu1": "pd.shard0",
+            "pd.shard1/ahu2": "pd.shard1"
+        },
+        "errors": {}
+    }
+    assert workers.calls[-2:] == [("pd.shard0", "set_multiple_points_bulk", {
+        "point_names_values": {
+            "pd.shard0/ahu1": [("temp", 70)]
+        },
+        "paths": None,
+        "pattern": None,
+        "concurrency": None
+    }), ("pd.shard1", "set_multiple_points_bulk", {
+        "point_names_values": {
+            "pd.shard1/ahu2": [("temp", 72)]
+        },
+        "paths": None,
+        "pattern": None,
+        "concurrency": None
+    })]
+
+
+def test_coordinator_should_skip_restarted_workers_until_ready():
+    workers = FakeWorkers()
+    coordinator = ShardCoordinator(workers, ["pd.shard0", "pd.shard1"],
+                                   overrides=lambda: {"campus/*": 0.0})
+    coordinator.shard_ready(0)
+    coordinator.shard_ready(1)
+    coordinator.update_device("campus/ahu1", {"group": 0})
+    coordinator.shard_down(0)
+    workers.calls.clear()
+
+    coordinator.update_device("campus/ahu1", {"group": 0, "interval": 30})
+    with pytest.raises(RuntimeError):
+        coordinator.call("get_point", ROUTE_DEVICE, ("campus/ahu1", "temp"), {})
+    assert coordinator.call("get_startup_status", ROUTE_EACH, (), {}) == {"pd.shard1": "pd.shard1"}
+    assert workers.calls == [("pd.shard1", "get_startup_status")]
+
+    coordinator.shard_ready(0)
+    assert workers.calls[1:] == [("pd.shard0", "shard_set_overrides", {
+        "campus/*": 0.0
+    }), ("pd.shard0", "shard_update_devices", {
+        "campus/ahu1": {
+            "group": 0,
+            "interval": 30
+        }
+    })]
+
+
+def test_merge_sorted_and_revert_status():
+    assert merge_sorted([["b", "c"], None, ["a"]]) == ["a", "b", "c"]
+    status = {"pattern": "campus/*", "total": 2, "done": 1, "failed": {}, "pending": 1}
+    assert merge_revert_status([{
+        "campus/*": dict(status, elapsed=3.0, complete=False)
+    }, {
+        "campus/*": dict(status, done=2, pending=0, elapsed=1.0, complete=True)
+    }, {}]) == {
+        "campus/*": {
+            "pattern": "campus/*",
+            "total": 4,
+            "done": 3,
+            "failed": {},
+            "pending": 1,
+            "elapsed": 3.0,
+            "complete": False
+        }
+    }
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+
+from unittest import mock
+
+from platform_driver.stats import HEARTBEAT_BACKOFF_LIMIT, DeviceStats, DriverStats, LatencyStats
+
+
+def test_latency_stats_should_keep_a_bounded_window():
+    stats = LatencyStats(window=4)
+    for duration in (1.0, 2.0, 3.0, 4.0, 5.0, 6.0):
+        stats.record(duration, error=duration == 6.0)
+
+    result = stats.as_dict()
+    assert result["count"] == 6
+    assert result["errors"] == 1
+    assert result["last"] == 6.0
+    assert result["max"] == 6.0
+    assert result["mean"] == 3.5
+    assert len(stats._recent) == 4
+
+
+def test_driver_stats_summary_should_list_drifting_devices():
+    stats = DriverStats()
+    stats.device("campus/building1/ahu1").scrape_completed(0.5)
+    stats.device("campus/building1/ahu2").scrape_completed(2.0, error=True)
+    stats.device("campus/building1/ahu2").scrape_completed(2.0, error=True)
+    stats.device("campus/building1/ahu3").overruns = 3
+    stats.record_rpc("get_point", "campus/building1/ahu1", 0.01)
+    stats.record_rpc("get_point", "missing", 0.02, error=True)
+
+    summary = stats.summary(top=1)
+
+    assert summary["devices"] == 3
+    assert summary["scrapes"] == 3
+    assert summary["scrape_errors"] == 2
+    assert summary["slowest"] == {"campus/building1/ahu2": 2.0}
+    assert summary["failing"] == {"campus/building1/ahu2": 2}
+    assert summary["overrunning"] == {"campus/building1/ahu3": 3}
+    assert summary["rpc"]["get_point"]["count"] == 2
+    assert stats.devices["campus/building1/ahu1"].rpc.count == 1
+
+    stats.remove("campus/building1/ahu1")
+    assert "campus/building1/ahu1" not in stats.devices
+
+
+def test_heartbeat_backoff_should_double_and_reset():
+    device = DeviceStats()
+    with mock.patch("platform_driver.stats.time.monotonic", return_value=100.0):
+        device.heartbeat_completed(0.1, error=True, backoff=10.0)
+        assert device.heartbeat_skip_until == 110.0
+        device.heartbeat_completed(0.1, error=True, backoff=10.0)
+        assert device.heartbeat_skip_until == 120.0
+        assert not device.heartbeat_due()
+        for _ in range(10):
+            device.heartbeat_completed(0.1, error=True, backoff=10.0)
+        assert device.heartbeat_skip_until == 100.0 + 10.0 * HEARTBEAT_BACKOFF_LIMIT
+
+        device.heartbeat_completed(0.1)
+        assert device.heartbeat_due()
+        assert device.heartbeat_failures == 0
+    assert device.as_dict()["heartbeat"]["errors"] == 12
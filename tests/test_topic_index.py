@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+
+import fnmatch
+
+import pytest
+
+from platform_driver.topic_index import DeviceTree, PatternIndex
+
+DEVICES = [
+    "campus/building1/", "campus/building1/ahu1", "campus/building1/ahu2", "campus/building1/vav/1",
+    "campus/building2/ahu1", "campus/building2/vav/1", "othercampus/building1/ahu1"
+]
+
+PATTERNS = [
+    "campus/building1/*", "campus/building1/", "campus/*/ahu1", "campus/building?/ahu[12]",
+    "*/building1/*", "*", "campus/building1/ahu1", "campus/building1/ahu", "wrongcampus/building",
+    "campus/building1"
+]
+
+
+@pytest.fixture()
+def device_tree():
+    tree = DeviceTree()
+    for device in DEVICES:
+        tree.add(device)
+    return tree
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_device_tree_match_should_agree_with_fnmatch(device_tree, pattern):
+    expected = {device for device in DEVICES if fnmatch.fnmatchcase(device, pattern)}
+
+    assert set(device_tree.match(pattern)) == expected
+
+
+@pytest.mark.parametrize("device", DEVICES)
+def test_pattern_index_covering_should_agree_with_fnmatch(device):
+    index = PatternIndex()
+    for pattern in PATTERNS:
+        index.add(pattern)
+    expected = {pattern for pattern in PATTERNS if fnmatch.fnmatchcase(device, pattern)}
+
+    assert set(index.covering(device)) == expected
+
+
+def test_device_tree_remove_should_prune_empty_branches(device_tree):
+    assert device_tree.remove("campus/building1/vav/1")
+    assert not device_tree.remove("campus/building1/vav/1")
+
+    assert "campus/building1/vav/1" not in device_tree
+    assert len(device_tree) == len(DEVICES) - 1
+    assert list(device_tree.subtree(("campus", "building1", "vav"))) == []
+
+
+def test_pattern_index_discard_should_stop_matching():
+    index = PatternIndex()
+    index.add("campus/building1/*")
+    index.add("campus/*")
+    index.discard("campus/building1/*")
+
+    assert list(index.covering("campus/building1/ahu1")) == ["campus/*"]
+    assert "campus/building1/*" not in index
+    assert index.discard("campus/building1/*") is None
+
+
+def test_device_tree_should_resolve_and_list_subtrees_ignoring_case(device_tree):
+    device_tree.add("Campus/Building3/AHU1")
+
+    assert device_tree.resolve("campus/BUILDING1/ahu1") == "campus/building1/ahu1"
+    assert device_tree.resolve("campus/building3/ahu1") == "Campus/Building3/AHU1"
+    assert device_tree.resolve("campus/building1/ahu9") is None
+    assert set(device_tree.subtree("CAMPUS/building1/")) == {
+        "campus/building1/", "campus/building1/ahu1", "campus/building1/ahu2",
+        "campus/building1/vav/1"
+    }
+    assert list(device_tree.subtree("campus/build")) == []
+    assert "campus/building3/ahu1" not in device_tree
+    assert "Campus/Building3/AHU1" not in set(device_tree.match("campus/*/ahu1"))
+
+
+def test_device_tree_should_keep_topics_differing_only_by_case(device_tree):
+    device_tree.add("Campus/building1/ahu1")
+
+    assert len(device_tree) == len(DEVICES) + 1
+    assert device_tree.resolve("Campus/building1/ahu1") == "Campus/building1/ahu1"
+    assert device_tree.remove("campus/building1/ahu1")
+    assert device_tree.resolve("campus/building1/ahu1") == "Campus/building1/ahu1"